@@ -15,6 +15,14 @@ Created on Thu Apr 20 11:20:14 2023
 
 import random
 
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+import graphs
+
+MAX_REPAIR_ATTEMPTS = 10000 #random links tried to repair one pair of free ports before giving up
+
 class Jellyfish:
     
     def __init__(self, n, tau, capacity):
@@ -26,76 +34,162 @@ class Jellyfish:
         self.capacity = capacity #the capacity of links in the fat-tree in Gbit/s.
         self.switches = {i: [] for i in range(self.S)} #initialize as a dictionary: key is the index, the values are the neighbor
         self.servers = (n ** 3) // 4 #number of servers
+        self.adjacency = None #CSR adjacency matrix, set by build_sparse_structure
+        self._hop_histogram = None #cached (hops, servers) from the main server, reset on every build
         
     def build_structure(self): 
         
         """
-        |CONSTRUCTION PROCEDURE PART 1|
+        Builds the structure like build_sparse_structure, with a generator
+        seeded from the random module, so random.seed still reproduces it.
+        """
+        return self.build_sparse_structure(np.random.default_rng(random.getrandbits(64)))
+
+    def build_sparse_structure(self, rng=None):
+        
+        """
+        |SPARSE CONSTRUCTION PROCEDURE|
         
-        1. Create a list of switches with free ports
+        1. Pair the free ports of all switches in bulk (graphs.pair_stubs),
+           rejecting self-loops and duplicate links with a hashed edge set
         
-        2. Until there are free ports: 
+        2. Until no two free ports are left, say (p1,p2):
             
-                a. choice 2 random switch from the list; 
-                b. if they are not connected and they are not the same switch: 
+                a. if p1 and p2 are different switches and not connected:
                     
-                        -connect them adding them to the list of neighbor;
+                        -connect them;
                         
-                c. if one of them reach the maximum number of neighbor r: 
+                b. otherwise choose a random link (x,y) not touching p1 or p2
+                   such that (p1,x) and (p2,y) are new links:
                     
-                        -remove from the list of switches with free ports
+                        -replace (x,y) with (p1,x) and (p2,y)
+                        
+                   and raise a ValueError if MAX_REPAIR_ATTEMPTS random links
+                   are not enough
+                        
+        3. Store the links as a scipy.sparse CSR adjacency matrix and fill
+           the switches dictionary from it
         """
-        switches_with_free_ports = list(range(self.S)) #indexes of switches with free port
+        rng = np.random.default_rng() if rng is None else rng
+        self._hop_histogram = None
+        
+        edges, free_ports = graphs.pair_stubs(np.full(self.S, self.r), rng)
+        free_ports = rng.permutation(free_ports).tolist()
         
-        while switches_with_free_ports != []:
+        if len(free_ports) >= 2:
             
-            switch1 = random.choice(switches_with_free_ports) #random choices
-            switch2 = random.choice(switches_with_free_ports)
+            keys = set((edges.min(axis=1) * self.S + edges.max(axis=1)).tolist()) #hashed edge set for duplicate checks
+            edges = [tuple(edge) for edge in edges.tolist()]
+        
+        while len(free_ports) >= 2:
+            
+            p1, p2 = free_ports.pop(), free_ports.pop()
             
-            if switch1 != switch2 and switch1 not in self.switches[switch2]:#check if they are the same or already connected
+            if p1 != p2 and self._link_key(p1, p2) not in keys:
                 
-                self.switches[switch1].append(switch2) #connect them
-                self.switches[switch2].append(switch1)
+                edges.append((p1, p2))
+                keys.add(self._link_key(p1, p2))
+                continue
                 
-                if len(self.switches[switch1]) == self.r: #check maximum number of neighbor
-                    
-                    switches_with_free_ports.remove(switch1) #no more free ports
-                    
-                if len(self.switches[switch2]) == self.r:
-                    
-                    switches_with_free_ports.remove(switch2)
-                    
-        """
-        |CONSTRUCTION PROCEDURE PART 2|
+            for _ in range(MAX_REPAIR_ATTEMPTS if edges else 0): #edge-swap repair
+                
+                i = int(rng.integers(len(edges)))
+                x, y = edges[i] if rng.random() < 0.5 else edges[i][::-1]
+                
+                if {x, y} & {p1, p2}:
+                    continue
+                if self._link_key(p1, x) in keys or self._link_key(p2, y) in keys:
+                    continue
+                
+                keys.remove(self._link_key(x, y))
+                keys.update((self._link_key(p1, x), self._link_key(p2, y)))
+                edges[i] = (p1, x)
+                edges.append((p2, y))
+                break
+            
+            else:
+                raise ValueError(f"No link could be replaced to connect the free ports of switches {p1} and {p2} "
+                                 f"after {MAX_REPAIR_ATTEMPTS} attempts.")
+        
+        edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+        rows = np.concatenate((edges[:, 0], edges[:, 1]))
+        cols = np.concatenate((edges[:, 1], edges[:, 0]))
+        self.adjacency = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)),
+                                           shape=(self.S, self.S))
         
-        1. Check if a switch has >= 2 free ports left, say (p1,p2)
+        indptr, indices = self.adjacency.indptr, self.adjacency.indices.tolist()
+        self.switches = {i: indices[indptr[i]:indptr[i + 1]] for i in range(self.S)}
         
-        2. Choose a random link (x,y)
+        return self.adjacency
+    
+    def hop_histogram(self):
         
-        3. Remove the link
+        """
+        Counts the servers at every hop distance from the main server, which
+        is attached to switch 0. A server on a switch at distance d from
+        switch 0 is d + 2 hops away. The distances come from one BFS over the
+        sparse adjacency and are cached until the structure is rebuilt.
         
-        4. Replace the link with (p1,x) and (p2,x)
+        Every switch gets servers // S servers and the remainder, which does
+        not fill a whole switch, is counted at the farthest distance. The
+        servers of switches that can not be reached are left out.
         
-        """    
-
-        for i in range(self.S): #iterate over the switches
+        :return
+        (hops, servers) - np.arrays with the hop counts and the number of
+        servers, excluding the main server, at each hop count.
+        """
+        if self._hop_histogram is None:
             
-            if len(self.switches[i]) <= self.r - 2: #check for >= 2 free ports 
-                
-                #choose random link
-                x = random.choice(list(self.switches.keys()))  #choose one random switch
-                y = random.choice(self.switches[x]) #choose one random link
-                
-                #remove link
-                self.switches[x].remove(y) #remove y from the neighbor of x
-                self.switches[y].remove(x) #remove x from the neighbor of y
-                
-                p1,p2 = i #set p1,p2 as two port of the switch
-                
-                #add the new link
-                self.switches[p1].append(x)
-                self.switches[x].append(p1)
-                self.switches[p2].append(y)
-                self.switches[y].append(p2)
-                
-        
\ No newline at end of file
+            distances = csgraph.shortest_path(self.to_sparse(), unweighted=True, indices=0)
+            switches = np.bincount(distances[np.isfinite(distances)].astype(int)) #switches at each distance
+            
+            servers = switches * (self.servers // self.S)
+            servers[-1] += self.servers % self.S #the remainder on the farthest switches
+            servers[0] -= 1 #the main server itself
+            
+            self._hop_histogram = (np.arange(len(servers)) + 2, servers)
+            
+        return self._hop_histogram
+    
+    def allocate(self, n_servers):
+        
+        """
+        Assigns numbers of servers to hop distances, closest to the main
+        server first.
+        
+        :arg
+        n_servers - an iterable of numbers of servers.
+        
+        :return
+        (hops, counts) - an np.array of hop counts and an np.array with one
+        row per number of servers and one column per hop count.
+        """
+        hops, servers = self.hop_histogram()
+        n_servers = np.asarray(n_servers).reshape(-1, 1)
+        
+        if np.any(n_servers > servers.sum()):
+            raise ValueError(f"Only {servers.sum()} servers are reachable from the main server, "
+                             f"{n_servers.max()} were requested.")
+        
+        counts = np.clip(n_servers - (np.cumsum(servers) - servers), 0, servers)
+        
+        return hops, counts
+    
+    def to_sparse(self):
+        
+        """
+        Returns the CSR adjacency matrix of the switches, built from the
+        switches dictionary if the structure was not built sparsely.
+        """
+        return self.adjacency if self.adjacency is not None else self._adjacency_from_switches()
+    
+    def _adjacency_from_switches(self):
+        
+        rows = np.repeat(np.arange(self.S), [len(self.switches[i]) for i in range(self.S)])
+        cols = np.array([j for i in range(self.S) for j in self.switches[i]], dtype=int)
+        
+        return sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(self.S, self.S))
+    
+    def _link_key(self, x, y):
+        
+        return min(x, y) * self.S + max(x, y)
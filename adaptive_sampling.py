@@ -0,0 +1,131 @@
+"""Module for estimating expected response times with adaptive replica allocation.
+
+Every number of servers starts with a small pilot batch of replicas. The spread of the replicas so far predicts how
+many are needed for a confidence interval of the requested relative half width, and further batches are only spent on
+the numbers of servers that have not reached it, so the replicas go where the variance is high. The batches are drawn
+with the variance reduction schemes of the response_time simulators.
+"""
+import argparse
+import functools
+from collections import namedtuple
+
+import numpy as np
+
+from fat_tree import FatTree
+from response_time import control_variate_estimate, simulate_fat_tree_response_times, TopologySimulation, \
+    VARIANCE_REDUCTIONS
+
+ResponseTimeEstimate = namedtuple("ResponseTimeEstimate", "servers mean ci_low ci_high replicas")
+
+
+def estimate_response_times(simulate, servers, relative_half_width: float = 0.01, variance_reduction=(),
+                            initial_sims: int = 16, max_sims: int = 10000, z: float = 1.96, rng=None):
+    """Estimates the expected response time of every number of servers to a relative precision.
+
+    With the control scheme the batches return their unadjusted replicas and controls, and the control variate is
+    fitted once on all replicas of a number of servers, so small top-up batches do not shrink the confidence interval.
+
+    :arg
+    simulate - a function like simulate_fat_tree_response_times with its sim and topology bound, called as
+    simulate(servers, n_sims, rng, variance_reduction, return_controls).
+    servers - an iterable of numbers of servers.
+    relative_half_width - the half width of the confidence interval, relative to the mean, at which a number of
+    servers stops.
+    variance_reduction - an iterable of names from response_time.VARIANCE_REDUCTIONS used for every batch.
+    initial_sims - the number of replicas of the pilot batch.
+    max_sims - the maximum number of replicas of every number of servers.
+    z - the standard normal quantile of the confidence level, the intervals use the matching Student t quantile.
+    rng - an optional np.random.Generator.
+
+    :return
+    a ResponseTimeEstimate namedtuple with np.arrays of the means, the confidence intervals and the number of replicas.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    servers = np.asarray(servers, dtype=int)
+    variance_reduction = tuple(variance_reduction)
+    antithetic = "antithetic" in variance_reduction
+    control = "control" in variance_reduction
+    # antithetic replicas are only independent in pairs, so batches are kept even
+    step = 2 if antithetic else 1
+    initial_sims = max(4 * step, initial_sims + initial_sims % step)
+
+    def draw(points, n_sims):
+        """Simulates a batch and groups it into independent units, with their controls if needed."""
+        batch = simulate(servers[points], n_sims, rng, variance_reduction, control)
+        if not control:
+            return [(_units(replicas, antithetic), None, None) for replicas in batch]
+        return [(_units(replicas, antithetic), _units(controls, antithetic), expected)
+                for replicas, controls, expected in zip(*batch)]
+
+    units = draw(slice(None), initial_sims)
+    replicas = np.full(len(servers), initial_sims)
+
+    while True:
+        means, standard_errors, degrees = np.transpose([_estimate(*point_units) for point_units in units])
+        half_widths = _t_quantile(z, degrees) * standard_errors
+        n_units = np.array([len(point_units[0]) for point_units in units])
+        needed = np.ceil(n_units * (half_widths / (relative_half_width * np.abs(means))) ** 2) * step
+        open_points = np.flatnonzero((needed > replicas) & (replicas < max_sims))
+        if len(open_points) == 0:
+            break
+
+        for i in open_points:
+            # at most doubling per round, the spread of a few pilot replicas can be far off
+            n_sims = int(min(needed[i] - replicas[i], replicas[i], max_sims - replicas[i]))
+            n_sims += n_sims % step
+            (batch_units, batch_controls, _), = draw(slice(i, i + 1), n_sims)
+            point_units, point_controls, expected = units[i]
+            units[i] = (np.concatenate((point_units, batch_units)),
+                        None if point_controls is None else np.concatenate((point_controls, batch_controls)),
+                        expected)
+            replicas[i] += n_sims
+
+    return ResponseTimeEstimate(servers, means, means - half_widths, means + half_widths, replicas)
+
+
+def _units(replicas, antithetic):
+    """Groups the replicas of one batch into independent units, the means of the antithetic pairs 2k and 2k + 1."""
+    if not antithetic:
+        return replicas
+    half = len(replicas) // 2
+    return (replicas[0:2 * half:2] + replicas[1:2 * half:2]) / 2
+
+
+def _estimate(units, controls=None, expected_control=None):
+    """Estimates the mean of independent units, its standard error and the degrees of freedom of the error.
+
+    With controls the mean is a control variate estimate, whose fit costs one more degree of freedom.
+    """
+    if controls is None:
+        return units.mean(), units.std(ddof=1) / np.sqrt(len(units)), len(units) - 1
+
+    means, standard_errors = control_variate_estimate(units[None], controls[None], np.array([expected_control]))
+    return means[0], standard_errors[0], len(units) - 2
+
+
+def _t_quantile(z, degrees):
+    """Converts a standard normal quantile into the Student t quantile of the same level."""
+    from scipy import stats
+
+    return stats.t.ppf(stats.norm.cdf(z), degrees)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the replicas needed by the variance reduction schemes.")
+    parser.add_argument("--servers", type=int, nargs="+", default=[1, 10, 100, 1000, 10000],
+                        help="the numbers of servers.")
+    parser.add_argument("--half-width", type=float, default=0.01,
+                        help="the relative half width of the confidence intervals.")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the simulations.")
+    args = parser.parse_args()
+
+    tree = FatTree(64, 0.000005, 10)
+    sim = TopologySimulation(None, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+    simulate = functools.partial(simulate_fat_tree_response_times, sim, tree)
+    rng = np.random.default_rng(args.seed)
+
+    schemes = [(), ("antithetic",), ("stratified",), ("control",), VARIANCE_REDUCTIONS]
+    print(f"{'scheme':<32}" + "".join(f"{k:>10}" for k in args.servers))
+    for scheme in schemes:
+        estimate = estimate_response_times(simulate, args.servers, args.half_width, scheme, rng=rng)
+        print(f"{'+'.join(scheme) or 'plain':<32}" + "".join(f"{n:>10}" for n in estimate.replicas))
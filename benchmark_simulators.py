@@ -0,0 +1,117 @@
+"""Script for benchmarking the response time and job running cost simulators.
+
+Measures the per-call latency and peak memory of every simulator for numbers of servers from 1 to 10^5, and the wall
+time of a full part 2 sweep. The results are saved as JSON and can be compared against the baseline stored in
+benchmarks/simulators_baseline.json, which was recorded on a single core.
+"""
+import argparse
+import functools
+import importlib.util
+import json
+import time
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+
+import numpy as np
+
+import complexity
+import fat_tree
+import sweep
+from response_time import expected_fat_tree_response_time, simulate_fat_tree_response_time, \
+    simulate_fat_tree_response_times, stream_fat_tree_response_time, TopologySimulation
+
+BASELINE = Path(__file__).parent / "benchmarks" / "simulators_baseline.json"
+
+N_SERVERS = [1, 10, 100, 1000, 10000, 100000]
+
+
+def load_job_running_cost():
+    """Imports the job_running_cost script as a module."""
+    path = str(Path(__file__).parent / "job_running_cost")
+    loader = SourceFileLoader("job_running_cost", path)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader("job_running_cost", loader))
+    loader.exec_module(module)
+    return module
+
+
+def benchmark_calls(sim, tree, n_exec, n_servers):
+    """Measures the per-call latency and peak memory of every simulator.
+
+    :return
+    a list of result dictionaries.
+    """
+    job_running_cost = load_job_running_cost()
+
+    rng = np.random.default_rng(0)
+    simulators = {
+        "simulate_fat_tree_response_time": lambda s: simulate_fat_tree_response_time(s, tree),
+        "stream_fat_tree_response_time": lambda s: stream_fat_tree_response_time(s, tree, rng),
+        "simulate_fat_tree_response_times_100": lambda s: simulate_fat_tree_response_times(s, tree, [s.n_servers],
+                                                                                           100, rng),
+        "expected_fat_tree_response_time": lambda s: expected_fat_tree_response_time(s, tree),
+        "simulate_job_running_cost_10": lambda s: job_running_cost.simulate_job_running_cost(s.n_servers, 10, s, tree,
+                                                                                            0.1, rng),
+    }
+
+    results = []
+    for name, simulate in simulators.items():
+        for k in n_servers:
+            point = sim._replace(n_servers=k)
+            measurement = complexity.measure(lambda: simulate(point), n_exec)
+            results.append(dict(name=name, n_servers=k, **measurement._asdict()))
+            print(f"{name:40} {k:>7} {measurement.median * 1e3:10.3f} ms {measurement.peak_memory / 1e6:8.2f} MB")
+
+    return results
+
+
+def benchmark_sweeps(sim, tree, servers, n_sims):
+    """Measures the wall time of a full part 2 sweep with the Monte Carlo and the quadrature method.
+
+    :return
+    a list of result dictionaries.
+    """
+    sims = [sim._replace(n_servers=k) for k in servers]
+    sweeps = {
+        "part2_sweep_monte_carlo": lambda: sweep.run_sweep(
+            functools.partial(sweep.fat_tree_response_times, tree=tree, n_sims=n_sims), sims, seed=0, progress=False),
+        "part2_sweep_quadrature": lambda: [expected_fat_tree_response_time(s, tree) for s in sims],
+    }
+
+    results = []
+    for name, run in sweeps.items():
+        start = time.perf_counter()
+        run()
+        wall_time = time.perf_counter() - start
+        results.append(dict(name=name, n_servers=len(sims), mean=wall_time, median=wall_time, std=0.0, min=wall_time,
+                            peak_memory=0))
+        print(f"{name:40} {len(sims):>7} {wall_time:10.3f} s")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the response time and job running cost simulators.")
+    parser.add_argument("--n-exec", type=int, default=5, help="the number of timed calls for each measurement.")
+    parser.add_argument("--quick", action="store_true", help="sweep every 100th instead of every 10th server count.")
+    parser.add_argument("--save", type=Path, default=None, help="the path of a JSON file for the results.")
+    parser.add_argument("--compare", type=Path, nargs="?", const=BASELINE, default=None,
+                        help="a JSON file with results to compare against, by default the stored baseline.")
+    args = parser.parse_args()
+
+    tau_s = 0.000005
+    capacity_gbit = 10
+    sim = TopologySimulation(1, tau_s, capacity_gbit, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+
+    # n = 128 has 524288 servers, enough for 10^5 servers
+    results = benchmark_calls(sim, fat_tree.FatTree(128, tau_s, capacity_gbit), args.n_exec, N_SERVERS)
+    results += benchmark_sweeps(sim, fat_tree.FatTree(64, tau_s, capacity_gbit),
+                                range(1, 10001, 100 if args.quick else 10), 100)
+
+    if args.save is not None:
+        with open(args.save, "w") as file:
+            json.dump(dict(commit=complexity.git_commit(), timestamp=time.time(), results=results), file, indent=2)
+
+    if args.compare is not None:
+        ratios = complexity.compare_results(complexity.load_results(args.compare), results, "median", "n_servers")
+        for (name, k), ratio in ratios.items():
+            print(f"{name:40} {k:>7} {ratio:8.2f}x baseline")
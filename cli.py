@@ -0,0 +1,365 @@
+"""Command line interface for the simulations, e.g. python -m cli sweep --topology jellyfish --seed 0.
+
+The subcommands write their results as data files, which the plot subcommand turns into figures, so batch jobs never
+load matplotlib. Only the standard library is imported at module load. numpy, scipy, networkx, tqdm and matplotlib
+are imported inside the subcommands that need them, which keeps the start of every worker process of a sweep cheap.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# modules that a headless sweep worker should never have to import
+HEAVY_MODULES = ["matplotlib", "networkx", "pandas", "tqdm", "scipy.integrate", "scipy.sparse"]
+
+
+def main(argv=None):
+    """Parses the command line and runs the chosen subcommand."""
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    if args.profile is None:
+        return args.run(args)
+
+    import instrument
+
+    with instrument.profile(args.profile):
+        return args.run(args)
+
+
+def save_data(path, kind: str, meta: dict, **arrays):
+    """Saves arrays and a JSON serialisable dictionary of metadata to an .npz file.
+
+    :arg
+    path - the path of the file, its directory is created if missing.
+    kind - the kind of the results, which decides how they are plotted.
+    meta - the parameters of the results.
+    arrays - the np.arrays to save.
+    """
+    import numpy as np
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, meta=json.dumps(dict(meta, kind=kind)), **arrays)
+
+
+def load_data(path):
+    """Loads a file saved with save_data.
+
+    :return
+    (meta, arrays) - the dictionary of metadata, including the kind, and a dictionary of np.arrays.
+    """
+    import numpy as np
+
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files if key != "meta"}
+        return json.loads(str(data["meta"])), arrays
+
+
+def run_sweep(args):
+    """Sweeps the response time over numbers of servers and saves the means and, for Monte Carlo, all replicas."""
+    import functools
+
+    import numpy as np
+
+    import response_time
+    import sweep
+    from replica_store import ReplicaStore
+    from sweep_cache import SweepCache
+
+    sim = response_time.TopologySimulation(None, args.tau, args.capacity, args.expected_job_time, args.fixed_job_time,
+                                           args.input_size, args.output_size, args.overhead)
+    servers = np.arange(*args.servers)
+    baseline = args.expected_job_time + args.fixed_job_time
+    topology, expected, simulate = _topology(args)
+
+    if args.method == "quadrature":
+        means = np.array([expected(sim._replace(n_servers=int(k)), topology) for k in servers])
+        replicas = means[:, None]
+    else:
+        # run_cached_sweep skips the cache for unseeded sweeps, which also covers unseeded Jellyfish structures
+        cache = None if args.no_cache else SweepCache(args.cache_dir)
+        params = dict(topology=args.topology.replace("-", "_"), n=args.n, tau=args.tau, capacity=args.capacity)
+        simulate = functools.partial(simulate, **{"tree" if args.topology == "fat-tree" else "jellyfish": topology})
+        store = None
+        if args.store is not None:
+            store = ReplicaStore.create(args.store, servers, args.n_sims, dict(vars(args), run=None, baseline=baseline))
+        replicas = sweep.run_cached_sweep(simulate, sim, servers, args.n_sims, cache, params, args.workers, args.seed,
+                                          store)
+        means = store.mean() if store is not None else replicas.mean(axis=1)
+        # the replicas are already on disk in the store, the data file only keeps the means
+        replicas = np.zeros((len(servers), 0)) if store is not None else replicas
+
+    meta = dict(vars(args), run=None, baseline=baseline)
+    save_data(args.output, "sweep", meta, servers=servers, means=means, replicas=replicas)
+    print(f"optimal number of servers {servers[np.argmin(means)]}, results in {args.output}")
+
+
+def _topology(args):
+    """Builds the topology of a sweep with its expectation and its sweep point simulator."""
+    import numpy as np
+
+    import response_time
+    import sweep
+
+    if args.topology == "fat-tree":
+        from fat_tree import FatTree
+
+        return (FatTree(args.n, args.tau, args.capacity), response_time.expected_fat_tree_response_time,
+                sweep.fat_tree_response_times)
+
+    from Jellyfish import Jellyfish
+
+    jellyfish = Jellyfish(args.n, args.tau, args.capacity)
+    jellyfish.build_sparse_structure(np.random.default_rng(args.seed))
+    return jellyfish, response_time.expected_jellyfish_response_time, sweep.jellyfish_response_times
+
+
+def run_connectivity(args):
+    """Estimates connectivity probabilities of ER or r-random graphs and saves them.
+
+    The graphs are counted in blocks on args.workers processes with montecarlo. With a half width every value stops
+    once its confidence interval is that narrow, or at args.max_repeats graphs, otherwise it uses args.repeats graphs.
+    """
+    import numpy as np
+
+    import connectivity
+    import montecarlo
+
+    if args.coupled and args.graph != "er":
+        raise ValueError("only the ER graphs can be coupled across edge probabilities")
+
+    # a half width of 0 is never reached, so every value runs to max_repeats
+    half_width, max_repeats = (0, args.repeats) if args.half_width is None else (args.half_width, args.max_repeats)
+
+    if args.graph == "er":
+        x = np.linspace(*args.probs[:2], int(args.probs[2]))
+        if args.coupled:
+            # the coupled replicas cover all edge probabilities at once and are sized for the widest interval
+            repeats = max_repeats
+            if half_width > 0:
+                repeats = min(max_repeats, montecarlo.repeats_for_half_width(half_width))
+            result = connectivity.er_connectivity_coupled(args.n_nodes, x, repeats, np.random.default_rng(args.seed))
+        else:
+            result = montecarlo.parallel_er_connectivity(args.n_nodes, x, half_width, max_repeats,
+                                                         workers=args.workers, seed=args.seed)
+        label, xlabel = f"{args.n_nodes} nodes", "p"
+    else:
+        x = np.arange(args.sizes[0], args.sizes[1] + 1)
+        # an r-random graph needs an even number of stubs
+        x = x[x * args.degree % 2 == 0]
+        result = montecarlo.parallel_r_random_connectivity(x, args.degree, half_width, max_repeats,
+                                                           workers=args.workers, seed=args.seed)
+        label, xlabel = f"r = {args.degree}", "Number of Nodes"
+
+    meta = dict(vars(args), run=None, label=label, xlabel=xlabel)
+    save_data(args.output, "connectivity", meta, **result._asdict())
+    print(f"results in {args.output}")
+
+
+def run_complexity(args):
+    """Benchmarks connectivity checks on r-random graphs and saves the measurements with complexity.save_results."""
+    import complexity
+    import connectivity
+    import graphs
+
+    checks = dict(irreducibility=connectivity.check_irreducibility, laplacian=connectivity.check_laplacian,
+                  bfs=connectivity.check_bfs, irreducibility_sparse=connectivity.check_irreducibility_sparse,
+                  laplacian_sparse=connectivity.check_laplacian_sparse, bfs_sparse=connectivity.check_bfs_sparse)
+
+    benchmarks = []
+    for name in args.checks:
+        # the sparse checks run on sparse graphs, so that large graphs do not need networkx
+        create_graph = graphs.create_regular_sparse_graph if name.endswith("_sparse") else graphs.create_regular_graph
+        benchmark = complexity.ConnectivityBenchmark(checks[name], create_graph, args.degree, name)
+        benchmark.run(complexity.log_sizes(*args.sizes), args.n_exec)
+        benchmarks.append(benchmark)
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    complexity.save_results(benchmarks, args.output)
+    print(f"results in {args.output}")
+
+
+def run_plot(args):
+    """Plots data files of the same kind into one figure."""
+    import plot
+
+    if args.output is None:
+        args.output = str(Path(args.inputs[0]).with_suffix(".eps"))
+
+    if all(Path(path).suffix in (".json", ".csv") for path in args.inputs):
+        fig, _ = plot.plot_time_complexity(*_complexity_curves(args.inputs), title="Connectivity Algorithm Complexity")
+    elif all(Path(path).suffix == ".replicas" for path in args.inputs):
+        from replica_store import ReplicaStore
+
+        stores = [ReplicaStore(path) for path in args.inputs]
+        labels = [store.meta["topology"].replace("-", " ").title() for store in stores]
+        fig, _ = plot.plot_response_time_percentiles(stores, labels, args.percentiles, stores[0].meta["baseline"])
+    else:
+        loaded = [load_data(path) for path in args.inputs]
+        kinds = {meta["kind"] for meta, _ in loaded}
+        if len(kinds) > 1:
+            raise ValueError(f"can not plot different kinds of results together: {sorted(kinds)}")
+
+        if kinds == {"sweep"}:
+            fig, _ = _plot_sweeps(plot, loaded)
+        else:
+            fig, _ = _plot_connectivity(plot, loaded)
+
+    fig.savefig(args.output, format=Path(args.output).suffix[1:] or None)
+    print(f"figure in {args.output}")
+
+
+def _complexity_curves(paths):
+    """Groups complexity results by benchmark into curves with the n_nodes and times of TimeComplexity."""
+    from types import SimpleNamespace
+
+    import numpy as np
+
+    import complexity
+
+    records = [record for path in paths for record in complexity.load_results(path)]
+    names = list(dict.fromkeys(record["name"] for record in records))
+    curves = [SimpleNamespace(n_nodes=np.array([r["n_nodes"] for r in records if r["name"] == name]),
+                              times=np.array([r["check_median"] for r in records if r["name"] == name]))
+              for name in names]
+
+    return curves, names
+
+
+def _plot_sweeps(plot, loaded):
+    import numpy as np
+
+    servers = loaded[0][1]["servers"]
+    if any(not np.array_equal(arrays["servers"], servers) for _, arrays in loaded):
+        raise ValueError("the sweeps have different numbers of servers")
+
+    means = [arrays["means"] / meta["baseline"] for meta, arrays in loaded]
+    labels = [meta["topology"].replace("-", " ").title() for meta, _ in loaded]
+    optimal_servers = [servers[np.argmin(mean)] for mean in means]
+
+    return plot.plot_response_time(servers, means, labels, optimal_servers)
+
+
+def _plot_connectivity(plot, loaded):
+    import connectivity
+
+    results = [connectivity.Connectivity(arrays["x"], arrays["probs"]) for _, arrays in loaded]
+    meta = loaded[0][0]
+    title = "Erdos-Renyi Graph Connectivity" if meta["graph"] == "er" else "R-Random Graph Connectivity"
+
+    return plot.plot_connectivity_prob(results, [meta["label"] for meta, _ in loaded], title, meta["xlabel"])
+
+
+def run_coldstart(args):
+    """Measures the import time of the modules a worker process needs, in fresh interpreters."""
+    import statistics
+
+    probe = ("import sys, time; start = time.perf_counter(); import {modules}; "
+             "print(time.perf_counter() - start); print(*[m for m in {heavy!r} if m in sys.modules])")
+    command = [sys.executable, "-c", probe.format(modules=", ".join(args.modules), heavy=HEAVY_MODULES)]
+    cwd = Path(__file__).parent
+
+    times, loaded = [], set()
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        output = subprocess.run(command, capture_output=True, text=True, check=True, cwd=cwd).stdout.splitlines()
+        times.append((time.perf_counter() - start, float(output[0])))
+        loaded.update(output[1].split() if len(output) > 1 else [])
+
+    result = dict(modules=args.modules, repeats=args.repeats,
+                  process_s=statistics.median(total for total, _ in times),
+                  import_s=statistics.median(imports for _, imports in times), heavy_modules=sorted(loaded))
+
+    print(f"process start {result['process_s'] * 1000:.0f} ms, imports {result['import_s'] * 1000:.0f} ms, "
+          f"heavy modules: {', '.join(result['heavy_modules']) or 'none'}")
+    if args.output is not None:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+
+    return result
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", default=None, metavar="NAME",
+                        help="record the phases with cProfile and tracemalloc and write NAME.prof and NAME.trace.json.")
+    subparsers = parser.add_subparsers(required=True)
+
+    sweep = subparsers.add_parser("sweep", help="sweep the response time over numbers of servers.")
+    sweep.set_defaults(run=run_sweep)
+    sweep.add_argument("--topology", choices=["fat-tree", "jellyfish"], default="fat-tree")
+    sweep.add_argument("--method", choices=["monte-carlo", "quadrature"], default="monte-carlo",
+                       help="estimate the expected response time by sampling or by numerical integration.")
+    sweep.add_argument("--n", type=int, default=64, help="the number of ports of the switches.")
+    sweep.add_argument("--servers", type=int, nargs=3, default=[1, 10001, 10], metavar=("START", "STOP", "STEP"),
+                       help="the range of numbers of servers.")
+    sweep.add_argument("--n-sims", type=int, default=100, help="the number of replicas per number of servers.")
+    sweep.add_argument("--tau", type=float, default=0.000005, help="the trip time between two nodes in seconds.")
+    sweep.add_argument("--capacity", type=float, default=10, help="the link capacity in Gbit/s.")
+    sweep.add_argument("--expected-job-time", type=float, default=8 * 3600, help="the job time in seconds.")
+    sweep.add_argument("--fixed-job-time", type=float, default=30, help="the fixed time per server in seconds.")
+    sweep.add_argument("--input-size", type=float, default=4000, help="the input file size in GB.")
+    sweep.add_argument("--output-size", type=float, default=4000, help="the output file size in GB.")
+    sweep.add_argument("--overhead", type=float, default=1 + 48 / 1500, help="the protocol overhead factor.")
+    sweep.add_argument("--workers", type=int, default=1, help="the number of worker processes.")
+    sweep.add_argument("--seed", type=int, default=None, help="the seed of the sweep.")
+    sweep.add_argument("--cache-dir", default=".sweep_cache", help="the directory of the sweep result cache.")
+    sweep.add_argument("--no-cache", action="store_true", help="always recompute the sweep.")
+    sweep.add_argument("--output", default="results/sweep.npz", help="the .npz file for the results.")
+    sweep.add_argument("--store", default=None,
+                       help="a .replicas file to stream the Monte Carlo replicas into instead of the .npz file.")
+
+    connec = subparsers.add_parser("connectivity", help="estimate connectivity probabilities of random graphs.")
+    connec.set_defaults(run=run_connectivity)
+    connec.add_argument("--graph", choices=["er", "r-random"], default="er")
+    connec.add_argument("--n-nodes", type=int, default=100, help="the number of nodes of the ER graphs.")
+    connec.add_argument("--probs", type=float, nargs=3, default=[0.01, 1, 100], metavar=("START", "STOP", "NUM"),
+                        help="the edge probabilities of the ER graphs.")
+    connec.add_argument("--sizes", type=int, nargs=2, default=[10, 100], metavar=("START", "STOP"),
+                        help="the numbers of nodes of the r-random graphs.")
+    connec.add_argument("--degree", type=int, default=2, help="the node degree of the r-random graphs.")
+    connec.add_argument("--repeats", type=int, default=10, help="the number of graphs per value without --half-width.")
+    connec.add_argument("--half-width", type=float, default=None,
+                        help="stop every value once the half width of its confidence interval is this small.")
+    connec.add_argument("--max-repeats", type=int, default=100000,
+                        help="the maximum number of graphs per value with --half-width.")
+    connec.add_argument("--workers", type=int, default=1, help="the number of worker processes.")
+    connec.add_argument("--coupled", action="store_true",
+                        help="estimate all edge probabilities of the ER graphs from the same coupled graphs.")
+    connec.add_argument("--seed", type=int, default=None, help="the seed of the graphs.")
+    connec.add_argument("--output", default="results/connectivity.npz", help="the .npz file for the results.")
+
+    complex_ = subparsers.add_parser("complexity", help="benchmark connectivity checks on r-random graphs.")
+    complex_.set_defaults(run=run_complexity)
+    complex_.add_argument("--checks", nargs="+", default=["irreducibility", "laplacian", "bfs"],
+                          choices=["irreducibility", "laplacian", "bfs", "irreducibility_sparse", "laplacian_sparse",
+                                   "bfs_sparse"])
+    complex_.add_argument("--sizes", type=int, nargs=3, default=[3, 100, 20], metavar=("START", "STOP", "NUM"),
+                          help="the log-spaced numbers of nodes.")
+    complex_.add_argument("--degree", type=int, default=2, help="the node degree of the graphs.")
+    complex_.add_argument("--n-exec", type=int, default=100, help="the number of timed checks per size.")
+    complex_.add_argument("--output", default="results/complexity.json", help="the .json or .csv file for the results.")
+
+    plot = subparsers.add_parser("plot", help="plot data files written by the other subcommands.")
+    plot.set_defaults(run=run_plot)
+    plot.add_argument("inputs", nargs="+", help="data files of the same kind, plotted into one figure.")
+    plot.add_argument("--output", default=None, help="the figure file, defaults to the first input as .eps.")
+    plot.add_argument("--percentiles", type=float, nargs="+", default=[50, 99],
+                      help="the percentiles plotted from .replicas files.")
+
+    coldstart = subparsers.add_parser("coldstart", help="measure the import time of a sweep worker.")
+    coldstart.set_defaults(run=run_coldstart)
+    coldstart.add_argument("--modules", nargs="+", default=["sweep", "response_time", "fat_tree"],
+                           help="the modules imported by a worker.")
+    coldstart.add_argument("--repeats", type=int, default=5, help="the number of fresh interpreters.")
+    coldstart.add_argument("--output", default=None, help="an optional .json file for the measurements.")
+
+    return parser
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,222 @@
 """Module for measuring and plotting complexity of graph connectivity algorithms."""
 
-import timeit
+import csv
+import json
+import subprocess
+import time
+import tracemalloc
+from collections import namedtuple
+from pathlib import Path
 
-import networkx as nx
 import numpy as np
 
+Measurement = namedtuple("Measurement", "mean median std min peak_memory")
 
-class TimeComplexity:
-    """A class for measuring the time complexity of a graph connectivity algorithm."""
+MEASUREMENT_FIELDS = ["generation_" + field for field in Measurement._fields] + \
+                     ["check_" + field for field in Measurement._fields]
 
-    def __init__(self, connec, create_graph):
-        self.times = np.array([])
-        self.n_nodes = np.array([])
-        self.connec = connec
-        self.create_graph = create_graph
 
-    def _time_connectivity(self, n_exec: int, graph: nx.graph):
-        """Times a connectivity function.
+def measure(function, n_exec: int):
+    """Measures the execution time and the peak memory of a function without arguments.
+
+    The times come from n_exec separate runs, the peak memory from one additional run under tracemalloc, so that
+    tracing does not slow down the timed runs.
+
+    :arg
+    function - the function to be measured.
+    n_exec - the number of timed executions.
+
+    :return
+    a Measurement namedtuple with the mean, median, standard deviation and minimum time in seconds and the peak
+    memory in bytes.
+    """
+    times = np.zeros(n_exec)
+    for i in range(n_exec):
+        start = time.perf_counter()
+        function()
+        times[i] = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measurement(float(np.mean(times)), float(np.median(times)), float(np.std(times)), float(np.min(times)),
+                       int(peak_memory))
+
+
+def log_sizes(start: int, stop: int, num: int):
+    """Creates log-spaced graph sizes.
+
+    :arg
+    start - the smallest number of nodes.
+    stop - the largest number of nodes.
+    num - the number of sizes, fewer are returned if sizes coincide after rounding.
+
+    :return
+    an np.array of unique integer sizes.
+    """
+    return np.unique(np.geomspace(start, stop, num).round().astype(int))
+
+
+def fit_exponent(n_nodes, times):
+    """Fits an empirical complexity exponent b in time = a * n_nodes ^ b with a least squares fit in log-log space.
+
+    :arg
+    n_nodes - an np.array of graph sizes.
+    times - an np.array of times.
+
+    :return
+    the exponent b.
+    """
+    slope, _ = np.polyfit(np.log(n_nodes), np.log(times), 1)
+    return float(slope)
+
+
+class ConnectivityBenchmark:
+    """A benchmark of a graph connectivity algorithm, measuring graph generation and the check separately."""
+
+    def __init__(self, connec, create_graph, node_degree: int = 2, name: str = None):
+        """creates the ConnectivityBenchmark object.
 
         :arg
         connec - a function from the connectivity module.
-        n_exec - the number of executions.
-        graph - an nx.graph to run the connectivity function on.
+        create_graph - a function create_graph(k, node_degree) creating a graph with k nodes.
+        node_degree - the node degree passed to create_graph.
+        name - the name of the benchmark, defaults to the name of connec.
+        """
+        self.connec = connec
+        self.create_graph = create_graph
+        self.node_degree = node_degree
+        self.name = name if name is not None else getattr(connec, "__name__", str(connec))
+        self.n_nodes = np.array([], dtype=int)
+        self.generation = []
+        self.check = []
 
-        :return
-        the average execution time over n_exec executions.
+    def run(self, sizes, n_exec: int, n_generate: int = 1):
+        """Measures graph generation and the connectivity check for every graph size.
+
+        :arg
+        sizes - an iterable of numbers of nodes.
+        n_exec - the number of timed executions of the check for each size.
+        n_generate - the number of timed graph generations for each size.
         """
-        return min(timeit.Timer(lambda: self.connec(graph)).repeat(n_exec, 1))
+        self.n_nodes = np.array(sizes, dtype=int)
+        self.generation = []
+        self.check = []
 
-    def time(self, n_exec: int, start_k: int, end_k: int):
+        for k in self.n_nodes:
+            self.generation.append(measure(lambda: self.create_graph(int(k), self.node_degree), n_generate))
+
+            graph = self.create_graph(int(k), self.node_degree)
+            self.check.append(measure(lambda: self.connec(graph), n_exec))
+
+    def fit_exponent(self, min_nodes: int = 0):
+        """Fits the empirical complexity exponent of the median check time, for graphs with at least min_nodes nodes."""
+        mask = self.n_nodes >= min_nodes
+        return fit_exponent(self.n_nodes[mask], np.array([m.median for m in self.check])[mask])
+
+    def to_records(self):
+        """Converts the results to a list of dictionaries, one per graph size."""
+        return [dict(name=self.name, node_degree=self.node_degree, n_nodes=int(k),
+                     **dict(zip(MEASUREMENT_FIELDS, generation + check)))
+                for k, generation, check in zip(self.n_nodes, self.generation, self.check)]
+
+
+def save_results(benchmarks, path):
+    """Saves the results of benchmarks as JSON or CSV, depending on the suffix of path.
+
+    The JSON file also records the current git commit and a timestamp, so results can be compared across commits.
+
+    :arg
+    benchmarks - a list of run ConnectivityBenchmark objects.
+    path - the path of a .json or .csv file.
+    """
+    path = Path(path)
+    records = [record for benchmark in benchmarks for record in benchmark.to_records()]
+
+    if path.suffix == ".csv":
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=["name", "node_degree", "n_nodes"] + MEASUREMENT_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(path, "w") as file:
+            json.dump(dict(commit=git_commit(), timestamp=time.time(), results=records), file, indent=2)
+
+
+def load_results(path):
+    """Loads results saved with save_results.
+
+    :return
+    a list of dictionaries, one per benchmark and graph size.
+    """
+    path = Path(path)
+    if path.suffix == ".csv":
+        with open(path, newline="") as file:
+            return [{key: value if key == "name" else float(value) for key, value in row.items()}
+                    for row in csv.DictReader(file)]
+
+    with open(path) as file:
+        return json.load(file)["results"]
+
+
+def compare_results(baseline, current, field: str = "check_median", key: str = "n_nodes"):
+    """Compares two sets of results, e.g. from two commits.
+
+    :arg
+    baseline - a list of result dictionaries, see load_results.
+    current - a list of result dictionaries.
+    field - the measurement to compare.
+    key - the field that identifies a result together with its name.
+
+    :return
+    a dictionary mapping (name, key) to the ratio current / baseline, for all entries in both.
+    """
+    baseline = {(r["name"], int(r[key])): float(r[field]) for r in baseline}
+    return {(r["name"], int(r[key])): float(r[field]) / baseline[(r["name"], int(r[key]))]
+            for r in current if (r["name"], int(r[key])) in baseline}
+
+
+def git_commit():
+    """Looks up the current git commit of the repository, or None outside of a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class TimeComplexity:
+    """A class for measuring the time complexity of a graph connectivity algorithm."""
+
+    def __init__(self, connec, create_graph, node_degree: int = 2):
+        self.times = np.array([])
+        self.n_nodes = np.array([])
+        self.benchmark = ConnectivityBenchmark(connec, create_graph, node_degree)
+
+    def time(self, n_exec: int, start_k: int, end_k: int, num: int = None):
         """Times the connectivity function multiple times for graphs of different sizes.
 
+        Only the connectivity check is timed, graph generation is measured separately by the underlying
+        ConnectivityBenchmark.
+
         :arg
-        create_graph - a function for creating a graph.
         n_exec - the number of executions for each single connectivity timing.
         start_k - the number of nodes in the first graph.
         end_k - the number of nodes in the last graph.
+        num - the number of log-spaced graph sizes, every size from start_k to end_k is timed if None.
 
         :return
         (np.array, np.array) - a tuple where the first array is the number of nodes at each iteration and the second array
-        is the time the execution took in seconds.
+        is the median time the execution took in seconds.
         """
-        n_nodes = np.array([k for k in range(start_k, end_k + 1)])
-        times = np.zeros((len(n_nodes)))
-
-        for i, k in enumerate(n_nodes):
-            graph = self.create_graph(k, 2)
-            exec_time = self._time_connectivity(n_exec, graph)
+        sizes = range(start_k, end_k + 1) if num is None else log_sizes(start_k, end_k, num)
+        self.benchmark.run(sizes, n_exec)
 
-            times[i] = exec_time
+        self.n_nodes = self.benchmark.n_nodes
+        self.times = np.array([m.median for m in self.benchmark.check])
 
-        self.n_nodes = n_nodes
-        self.times = times
+        return self.n_nodes, self.times
@@ -2,12 +2,24 @@
 
 A graph is said to be connected if there is a path between any two nodes in the graph.
 """
+from __future__ import annotations
+
+import sys
 from collections import namedtuple
+from typing import TYPE_CHECKING
 
-import networkx as nx
 import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
 
 import graphs
+import instrument
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# eigenvalues below this are treated as zero, the Fiedler value of a path with 10^5 nodes is still about 1e-9
+EIGENVALUE_TOLERANCE = 1e-10
 
 
 def check_irreducibility(graph: nx.graph):
@@ -21,6 +33,8 @@ def check_irreducibility(graph: nx.graph):
     :return
     True if the graph's adjacency matrix is irreducible, false if not.
     """
+    import networkx as nx
+
     n = graph.number_of_nodes()
     adj = nx.to_numpy_array(graph)
     powers = np.arange(start=1, stop=n, step=1)
@@ -43,11 +57,135 @@ def check_laplacian(graph: nx.graph):
     :return
     True if the graph 2nd smallest eigenvalue of the graph's Laplacian matrix is positive, false otherwise.
     """
+    import networkx as nx
+
     eigenvalues = np.sort(nx.laplacian_spectrum(graph))
 
     return eigenvalues[1] > 0
 
 
+def check_irreducibility_sparse(graph):
+    """Checks connectivity of graph with reducibility of the graph's sparse adjacency matrix.
+
+    Instead of summing matrix powers, the non-zero pattern of row 0 of I + A + ... + A^n-1 is grown one power at a time
+    by expanding a frontier over the sparse matrix, from node 0 along A and along A^T. The adjacency matrix is irreducible if both
+    reach every node.
+
+    :arg
+    graph - an nx.graph, a scipy.sparse matrix or an np.array adjacency matrix to be checked.
+
+    :return
+    True if the graph's adjacency matrix is irreducible, false if not.
+    """
+    adj = _to_csr(graph)
+
+    return _reaches_all(adj.T.tocsr()) and _reaches_all(adj)
+
+
+def check_laplacian_sparse(graph):
+    """Checks connectivity of graph with the sparse Laplacian matrix.
+
+    Only the two smallest eigenvalues are computed, with scipy.sparse.linalg.eigsh in shift-invert mode.
+
+    :arg
+    graph - an nx.graph, a scipy.sparse matrix or an np.array adjacency matrix to be checked.
+
+    :return
+    True if the graph 2nd smallest eigenvalue of the graph's Laplacian matrix is positive, false otherwise.
+    """
+    from scipy.sparse import linalg
+
+    adj = _to_csr(graph)
+    adj = ((abs(adj) + abs(adj.T)) > 0).astype(float)
+    adj.setdiag(0)
+    laplacian = csgraph.laplacian(adj.tocsc())
+
+    if adj.shape[0] < 3:
+        eigenvalues = np.linalg.eigvalsh(laplacian.toarray())
+    else:
+        eigenvalues = linalg.eigsh(laplacian, k=2, sigma=-1e-6, which="LM", return_eigenvectors=False)
+
+    return np.sort(eigenvalues)[1] > EIGENVALUE_TOLERANCE
+
+
+def check_bfs_sparse(graph, n_nodes: int = None):
+    """Checks connectivity of graph with an array-native BFS.
+
+    The BFS expands whole frontiers over the CSR index arrays and stops as soon as every node is reached, without
+    creating any networkx objects.
+
+    :arg
+    graph - an (n_edges, 2) np.array of undirected edges, a scipy.sparse matrix, an np.array adjacency matrix or an
+    nx.graph to be checked.
+    n_nodes - the number of nodes, required if graph is an edge array.
+
+    :return
+    True if the BFS traversal reaches all nodes, False otherwise.
+    """
+    if n_nodes is not None:
+        return _reaches_all(edges_to_csr(graph, n_nodes))
+
+    adj = _to_csr(graph)
+    return _reaches_all(((adj + adj.T) != 0).tocsr())
+
+
+def edges_to_csr(edges, n_nodes: int):
+    """Builds the symmetric CSR adjacency matrix of an undirected graph.
+
+    :arg
+    edges - an (n_edges, 2) np.array of node indices.
+    n_nodes - the number of nodes in the graph.
+
+    :return
+    a scipy.sparse CSR matrix.
+    """
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    rows = np.concatenate((edges[:, 0], edges[:, 1]))
+    cols = np.concatenate((edges[:, 1], edges[:, 0]))
+
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n_nodes, n_nodes))
+
+
+def _to_csr(graph):
+    """Converts an nx.graph, a scipy.sparse matrix or an np.array to a scipy.sparse CSR adjacency matrix."""
+    # a graph can only be an nx.graph if networkx has been imported by whoever created it
+    nx = sys.modules.get("networkx")
+    if nx is not None and isinstance(graph, nx.Graph):
+        return nx.to_scipy_sparse_array(graph, format="csr")
+    return sparse.csr_matrix(graph)
+
+
+def _reaches_all(adj):
+    """Checks whether the rows of the CSR matrix adj reach every node from node 0, expanding one frontier per hop."""
+    n_nodes = adj.shape[0]
+    if n_nodes == 0:
+        # a graph without nodes has no node left to reach, networkx leaves this case undefined
+        return True
+
+    reached = np.zeros(n_nodes, dtype=bool)
+    reached[0] = True
+    n_reached = 1
+    frontier = np.array([0])
+
+    # stop as soon as every node is reached, the last frontier does not need to be expanded
+    while len(frontier) > 0 and n_reached < n_nodes:
+        neighbours = adj.indices[_row_ranges(adj.indptr, frontier)]
+        frontier = np.unique(neighbours[~reached[neighbours]])
+        reached[frontier] = True
+        n_reached += len(frontier)
+
+    return n_reached == n_nodes
+
+
+def _row_ranges(indptr, rows):
+    """Concatenates the index ranges indptr[row]:indptr[row + 1] of the given rows of a CSR matrix."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+
+    return offsets + np.arange(np.sum(lengths))
+
+
 def check_bfs(graph: nx.graph):
     """Checks connectivity of graph with BFS.
 
@@ -59,6 +197,7 @@ def check_bfs(graph: nx.graph):
     :return
     True if the BFS traversal reaches all nodes, False otherwise.
     """
+    import networkx as nx
 
     bfs_edges = nx.bfs_tree(graph, list(graph)[0]).edges()
     return len(bfs_edges) == len(graph.nodes) - 1
@@ -67,37 +206,121 @@ def check_bfs(graph: nx.graph):
 Connectivity = namedtuple("Connectivity", "x probs")
 
 
-def er_connectivity(n_nodes: int, edge_probs, repeats: int):
+def er_connectivity(n_nodes: int, edge_probs, repeats: int, rng=None):
     """Calculates the probability of connectivity of an ER graph as a function of the probability of edge connections.
 
     :arg
     n_nodes - the number of nodes in the ER graph.
     edge_probs - an iterable of probabilities of edge connections.
     repeats - number of repetitions for each value in the edge_probs.
+    rng - an optional np.random.Generator.
 
     :return
     a Connectivity namedtuple with the edge_probs as the x value and the connection probability as the probs.
     """
     connected_probs = []
     for p in edge_probs:
-        connected = 0
-        for _ in range(repeats):
-            er_graph = graphs.create_er_graph(n_nodes, p=p)
-            if check_bfs(er_graph):
-                connected += 1
+        with instrument.phase("graph.generate"):
+            er_graphs = graphs.create_er_edges(n_nodes, p, repeats, rng)
+        with instrument.phase("connectivity.check"):
+            connected = sum(check_bfs_sparse(edges, n_nodes) for edges in er_graphs)
+        instrument.count("connectivity.graphs", repeats)
 
         connected_probs.append(connected / repeats)
 
     return Connectivity(np.array(edge_probs), np.array(connected_probs))
 
 
-def r_random_connectivity(n_nodes, node_degree, repeats):
+def er_connectivity_coupled(n_nodes: int, edge_probs, repeats: int, rng=None):
+    """Calculates the probability of connectivity of an ER graph for all probabilities of edge connections at once.
+
+    Every replica couples the ER graphs of all edge probabilities through one random ordering of the vertex pairs, as
+    if every pair had a uniform weight and the graph for p held the pairs with weight below p. The replica becomes
+    connected at the weight of the edge that joins its last two components, so one pass per replica gives the
+    connectivity for every p.
+
+    :arg
+    n_nodes - the number of nodes in the ER graph.
+    edge_probs - an iterable of probabilities of edge connections.
+    repeats - number of replicas.
+    rng - an optional np.random.Generator.
+
+    :return
+    a Connectivity namedtuple with the edge_probs as the x value and the connection probability as the probs.
+    """
+    edge_probs = np.array(edge_probs)
+    thresholds = er_connectivity_thresholds(n_nodes, repeats, rng)
+
+    return Connectivity(edge_probs, np.mean(thresholds[:, None] <= edge_probs[None, :], axis=0))
+
+
+def er_connectivity_thresholds(n_nodes: int, repeats: int, rng=None):
+    """Samples the smallest edge probability at which coupled ER graphs become connected.
+
+    The pairs are added in a uniformly random order with an incremental union-find until the graph is connected. If
+    that takes the k-th of M pairs, the weight of that pair is the k-th smallest of M uniform weights, which is drawn
+    directly from a Beta(k, M - k + 1) distribution.
+
+    :arg
+    n_nodes - the number of nodes in the ER graph.
+    repeats - number of replicas.
+    rng - an optional np.random.Generator.
+
+    :return
+    an np.array with the connectivity threshold of every replica.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    n_pairs = n_nodes * (n_nodes - 1) // 2
+
+    thresholds = np.zeros(repeats)
+    for i in range(repeats):
+        n_edges = _edges_until_connected(n_nodes, rng)
+        if n_edges > 0:
+            thresholds[i] = rng.beta(n_edges, n_pairs - n_edges + 1)
+
+    return thresholds
+
+
+def _edges_until_connected(n_nodes, rng):
+    """Counts the distinct random vertex pairs that are added until a union-find over n_nodes has one component."""
+    parents = list(range(n_nodes))
+    components = n_nodes
+    seen = set()
+
+    def find(node):
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    while components > 1:
+        first = rng.integers(n_nodes, size=n_nodes)
+        second = rng.integers(n_nodes - 1, size=n_nodes)
+        second += second >= first
+        for u, v in zip(first.tolist(), second.tolist()):
+            key = min(u, v) * n_nodes + max(u, v)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            root_u, root_v = find(u), find(v)
+            if root_u != root_v:
+                parents[root_u] = root_v
+                components -= 1
+                if components == 1:
+                    break
+
+    return len(seen)
+
+
+def r_random_connectivity(n_nodes, node_degree, repeats, rng=None):
     """Calculates the probability of connectivity of an ER graph as a function of the probability of edge connections.
 
     :arg
     n_nodes - the number of nodes in the r-random graph.
     node_degree - the degree of every node in the graph.
     repeats - number of repetitions for each value in n_nodes.
+    rng - an optional np.random.Generator.
 
     :return
     a Connectivity namedtuple with the n_nodes as the x value and the connection probability as the probs.
@@ -105,11 +328,11 @@ def r_random_connectivity(n_nodes, node_degree, repeats):
     connected_probs = []
 
     for k in n_nodes:
-        connected = 0
-        for _ in range(repeats):
-            regular_graph = graphs.create_regular_graph(k, node_degree=node_degree)
-            if check_bfs(regular_graph):
-                connected += 1
+        with instrument.phase("graph.generate"):
+            regular_graphs = graphs.create_regular_edges(k, node_degree, repeats, rng)
+        with instrument.phase("connectivity.check"):
+            connected = sum(check_bfs_sparse(edges, k) for edges in regular_graphs)
+        instrument.count("connectivity.graphs", repeats)
 
         connected_probs.append(connected / repeats)
 
@@ -0,0 +1,238 @@
+"""Module for an event-driven simulation of the Fat Tree transfers with link contention.
+
+The main server sends the input of every server over its own link, every server runs its job once its input has
+arrived and then returns its output over the same link. The bandwidth of the links is shared max-min fairly between
+the transfers that use them and is reallocated whenever a transfer starts or finishes.
+
+Transfers that cross the same links and go in the same direction get the same rate, so the flows are grouped into one
+class per tier and direction. Each class keeps a cumulative per-flow service, the amount of data every flow of the class
+has received since the start, and a flow finishes when the service of its class reaches the level it started at plus
+its size. The flows themselves only live in arrays and in per-class heaps of those finish levels.
+"""
+import argparse
+import heapq
+from collections import namedtuple
+
+import numpy as np
+
+from fat_tree import FatTree, TIER_HOPS
+from response_time import expected_fat_tree_response_time, TopologySimulation
+
+EventDrivenResult = namedtuple("EventDrivenResult", "response_time_s, input_arrival_s, job_done_s, output_arrival_s")
+
+# relative tolerance under which transfers finishing together are handled in the same batch
+SERVICE_TOLERANCE = 1e-12
+
+OUTBOUND = 0
+RETURN = 1
+
+
+def simulate_event_driven_response_time(sim: TopologySimulation, tree: FatTree, rng=None):
+    """Simulates a response time for the Fat Tree topology with event-driven, max-min fair link sharing.
+
+    The data sizes and capacities are in the same units as in the fluid approximation of response_time, and the
+    propagation delays of the links are neglected.
+
+    :arg
+    sim - a TopologySimulation.
+    tree - the FatTree to simulate on.
+    rng - an optional np.random.Generator.
+
+    :return
+    an EventDrivenResult namedtuple with the response time in seconds and the per-server arrival and completion times.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+
+    counts = np.array([int(k) for k in tree.allocate(sim.n_servers)])
+    tiers = np.repeat(np.arange(len(counts)), counts)
+    n_flows = len(tiers)
+
+    exec_times_s = rng.exponential(sim.expected_job_time_s / sim.n_servers, n_flows) + sim.fixed_job_time_s
+    outbound_sizes = np.full(n_flows, sim.input_file_size_gb / sim.n_servers * sim.overhead)
+    return_sizes = rng.uniform(0, 2 * sim.output_file_size_gb / sim.n_servers, n_flows) * sim.overhead
+
+    membership, capacities = fat_tree_link_groups(tree)
+    network = _FlowNetwork(membership, capacities, tree.capacity)
+
+    input_arrival_s = np.empty(n_flows)
+    job_done_s = np.empty(n_flows)
+    output_arrival_s = np.empty(n_flows)
+    jobs = []
+
+    network.start(OUTBOUND * len(counts) + tiers, outbound_sizes, np.arange(n_flows))
+
+    while network.n_active > 0 or jobs:
+        next_job_s = jobs[0][0] if jobs else np.inf
+        next_transfer_s = network.next_finish_s()
+
+        if next_transfer_s <= next_job_s:
+            now, finished_classes, finished = network.finish_next()
+            outbound = finished_classes < len(counts)
+
+            input_arrival_s[finished[outbound]] = now
+            for flow in finished[outbound]:
+                heapq.heappush(jobs, (now + exec_times_s[flow], flow))
+            output_arrival_s[finished[~outbound]] = now
+        else:
+            network.advance(next_job_s)
+            started = []
+            while jobs and jobs[0][0] <= next_job_s:
+                started.append(heapq.heappop(jobs)[1])
+            started = np.array(started)
+
+            job_done_s[started] = next_job_s
+            network.start(RETURN * len(counts) + tiers[started], return_sizes[started], started)
+
+    return EventDrivenResult(output_arrival_s.max(initial=0.0), input_arrival_s, job_done_s, output_arrival_s)
+
+
+def fat_tree_link_groups(tree: FatTree):
+    """Lists the groups of links shared by the transfer classes of a Fat Tree.
+
+    The classes are the edge, pod and core tiers of the outbound transfers followed by the same tiers of the return
+    transfers. Every direction has the link of the main server, the uplinks of its edge switch and the uplinks of the
+    aggregation switches of its pod, which only the transfers that leave the edge switch and the pod cross.
+
+    :arg
+    tree - a FatTree.
+
+    :return
+    (membership, capacities) - a boolean (n_groups, n_classes) np.array with the classes crossing every group and an
+    np.array with the total capacity of every group.
+    """
+    n_tiers = len(TIER_HOPS)
+    uplinks = tree.n // 2
+    # the main link is used by every tier, the edge uplinks by the pod and core tiers and the pod uplinks by the core
+    tier_membership = np.arange(n_tiers)[None, :] >= np.arange(n_tiers)[:, None]
+    tier_capacities = tree.capacity * np.array([1, uplinks, uplinks ** 2])
+
+    membership = np.zeros((2 * n_tiers, 2 * n_tiers), dtype=bool)
+    membership[:n_tiers, :n_tiers] = tier_membership
+    membership[n_tiers:, n_tiers:] = tier_membership
+
+    return membership, np.tile(tier_capacities, 2)
+
+
+def max_min_fair_rates(counts, membership, capacities, flow_capacity):
+    """Calculates the max-min fair rate of the flows of every class by progressive filling.
+
+    All flows of a class cross the same groups of links, so they get the same rate. The rates of all unfrozen classes
+    are raised together until a group of links is full or the flows reach their own capacity, the classes crossing a
+    full group are frozen and the filling continues until every class is frozen.
+
+    :arg
+    counts - an np.array with the number of flows in every class.
+    membership - a boolean (n_groups, n_classes) np.array with the classes crossing every group of links.
+    capacities - an np.array with the total capacity of every group of links.
+    flow_capacity - the maximum rate of a single flow.
+
+    :return
+    an np.array with the rate of a single flow of every class, 0 for the classes without flows.
+    """
+    counts = np.asarray(counts, dtype=float)
+    rates = np.zeros(len(counts))
+    remaining = np.asarray(capacities, dtype=float).copy()
+    unfrozen = counts > 0
+
+    while unfrozen.any():
+        loads = membership @ (counts * unfrozen)
+        loaded = loads > 0
+        increment = min(np.min(remaining[loaded] / loads[loaded], initial=np.inf), flow_capacity - rates[unfrozen].max())
+
+        rates[unfrozen] += increment
+        remaining -= increment * loads
+
+        full = loaded & (remaining <= SERVICE_TOLERANCE * capacities)
+        unfrozen &= ~membership[full].any(axis=0)
+        unfrozen &= rates < flow_capacity * (1 - SERVICE_TOLERANCE)
+
+    return rates
+
+
+class _FlowNetwork:
+    """The active transfers of a simulation, grouped into classes that share their links and their rate."""
+
+    def __init__(self, membership, capacities, flow_capacity):
+        """creates the _FlowNetwork object.
+
+        :arg
+        membership - a boolean (n_groups, n_classes) np.array with the classes crossing every group of links.
+        capacities - an np.array with the total capacity of every group of links.
+        flow_capacity - the maximum rate of a single flow.
+        """
+        self.membership = membership
+        self.capacities = capacities
+        self.flow_capacity = flow_capacity
+
+        n_classes = membership.shape[1]
+        self.now = 0.0
+        self.service = np.zeros(n_classes)
+        self.rates = np.zeros(n_classes)
+        self.counts = np.zeros(n_classes, dtype=int)
+        self.finish_levels = [[] for _ in range(n_classes)]
+
+    @property
+    def n_active(self):
+        return int(self.counts.sum())
+
+    def start(self, classes, sizes, flows):
+        """Starts transfers of the given sizes now and reallocates the rates."""
+        for flow_class, size, flow in zip(classes, sizes, flows):
+            heapq.heappush(self.finish_levels[flow_class], (self.service[flow_class] + size, flow))
+        self.counts += np.bincount(classes, minlength=len(self.counts))
+        self.rates = max_min_fair_rates(self.counts, self.membership, self.capacities, self.flow_capacity)
+
+    def next_finish_s(self):
+        """Calculates the time at which the next transfer finishes at the current rates."""
+        next_levels = np.array([levels[0][0] if levels else np.inf for levels in self.finish_levels])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            waits = np.where(self.counts > 0, (next_levels - self.service) / self.rates, np.inf)
+
+        return self.now + max(0.0, waits.min())
+
+    def advance(self, time_s):
+        """Moves the clock forward, delivering data at the current rates."""
+        self.service += self.rates * (time_s - self.now)
+        self.now = time_s
+
+    def finish_next(self):
+        """Advances to the next finishing transfers and removes all transfers that finish at that time.
+
+        :return
+        (now, classes, flows) - the time and two np.arrays with the class and index of every finished transfer.
+        """
+        self.advance(self.next_finish_s())
+
+        classes, flows = [], []
+        for flow_class, levels in enumerate(self.finish_levels):
+            limit = self.service[flow_class] * (1 + SERVICE_TOLERANCE)
+            while levels and levels[0][0] <= limit:
+                classes.append(flow_class)
+                flows.append(heapq.heappop(levels)[1])
+
+        classes = np.array(classes, dtype=int)
+        self.counts -= np.bincount(classes, minlength=len(self.counts))
+        self.rates = max_min_fair_rates(self.counts, self.membership, self.capacities, self.flow_capacity)
+
+        return self.now, classes, np.array(flows, dtype=int)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the event-driven and the fluid Fat Tree response times.")
+    parser.add_argument("--servers", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="the numbers of servers.")
+    parser.add_argument("--n-sims", type=int, default=10, help="the number of event-driven replicas per point.")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the simulations.")
+    args = parser.parse_args()
+
+    tree = FatTree(64, 0.000005, 10)
+    sim = TopologySimulation(None, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'servers':>8} {'fluid':>12} {'event-driven':>14} {'difference':>11}")
+    for n_servers in args.servers:
+        point = sim._replace(n_servers=n_servers)
+        fluid = expected_fat_tree_response_time(point, tree)
+        event_driven = np.mean([simulate_event_driven_response_time(point, tree, rng).response_time_s
+                                for _ in range(args.n_sims)])
+        print(f"{n_servers:>8} {fluid:>12.1f} {event_driven:>14.1f} {event_driven / fluid - 1:>+11.2%}")
@@ -1,4 +1,12 @@
 """Module for a Fat Tree data centre topology structure."""
+from collections import namedtuple
+
+import numpy as np
+
+# number of hops from the main server to a server under the same edge switch, in the same pod and via the core
+TIER_HOPS = np.array([2, 4, 6])
+
+TierTable = namedtuple("TierTable", "counts, round_trip_times_s, throughputs")
 
 
 class FatTree:
@@ -23,6 +31,15 @@ class FatTree:
         self.n_servers = (n ** 3 // 4)
         self.n_servers_per_pod = self.n_servers // n
 
+        self._tier_tables = {}
+        self._graph = None
+
+    def graph(self):
+        """Builds the explicit FatTreeGraph of this tree once and caches it."""
+        if self._graph is None:
+            self._graph = FatTreeGraph(self.n)
+        return self._graph
+
     def get_n_free_edge_servers(self, n_servers):
         return min(self.n_edge_servers - 1, n_servers)
 
@@ -33,4 +50,190 @@ class FatTree:
     def get_n_free_core_servers(self, n_servers):
         edge_servers = self.get_n_free_edge_servers(n_servers)
         pod_servers = self.get_n_free_pod_servers(n_servers)
-        return min(self.n_servers - 1 - edge_servers - pod_servers, n_servers - edge_servers - pod_servers)
\ No newline at end of file
+        return min(self.n_servers - 1 - edge_servers - pod_servers, n_servers - edge_servers - pod_servers)
+
+    def allocate(self, n_servers):
+        """Splits numbers of servers over the edge, pod and core tiers, closest to the main server first.
+
+        :arg
+        n_servers - a number or an np.array of numbers of servers.
+
+        :return
+        (edge, pod, core) - the number of servers in each tier, with the shape of n_servers.
+        """
+        n_servers = np.asarray(n_servers)
+        edge_servers = np.minimum(self.n_edge_servers - 1, n_servers)
+        pod_servers = np.minimum(self.n_servers_per_pod - 1 - edge_servers, n_servers - edge_servers)
+        core_servers = np.minimum(self.n_servers - 1 - edge_servers - pod_servers,
+                                  n_servers - edge_servers - pod_servers)
+
+        return edge_servers, pod_servers, core_servers
+
+    def tier_table(self, n_servers):
+        """Looks up the per-tier server counts, round trip times and average throughputs.
+
+        The rows are cached per number of servers, so repeated simulations of the same point do not recompute them.
+
+        :arg
+        n_servers - an iterable of numbers of servers.
+
+        :return
+        a TierTable namedtuple of np.arrays with one row per number of servers and one column per tier.
+        """
+        n_servers = [int(k) for k in n_servers]
+        missing = np.array(sorted(set(n_servers).difference(self._tier_tables)), dtype=int)
+
+        if len(missing) > 0:
+            counts = np.stack(self.allocate(missing), axis=1)
+            round_trip_times_s = 2 * self.tau * TIER_HOPS
+            network_throughput = np.sum(counts / round_trip_times_s, axis=1, keepdims=True)
+            throughputs = self.capacity / round_trip_times_s / network_throughput
+
+            for k, row_counts, row_throughputs in zip(missing, counts, throughputs):
+                self._tier_tables[int(k)] = (row_counts, row_throughputs)
+
+        rows = [self._tier_tables[k] for k in n_servers]
+        counts = np.array([row[0] for row in rows], dtype=int).reshape(-1, len(TIER_HOPS))
+        throughputs = np.array([row[1] for row in rows]).reshape(-1, len(TIER_HOPS))
+
+        return TierTable(counts, np.broadcast_to(2 * self.tau * TIER_HOPS, counts.shape), throughputs)
+
+
+class FatTreeGraph:
+    """The explicit graph of a k-ary Fat Tree, with hosts, edge, aggregation and core switches as nodes.
+
+    The nodes are numbered by level: the k^3/4 hosts first, then the k^2/2 edge switches, the k^2/2 aggregation
+    switches and the k^2/4 core switches. Within a level the nodes are numbered pod by pod, so every index is a closed
+    form of the pod and the position of a node, and so are the hop distances between any two nodes.
+    """
+
+    def __init__(self, n):
+        """creates the FatTreeGraph object.
+
+        :arg
+        n - the number of ports of every switch, an even number.
+        """
+        if n < 2 or n % 2:
+            raise ValueError(f"a Fat Tree needs an even number of ports, got {n}")
+
+        self.n = n
+        self.half = n // 2
+        self.n_hosts = n ** 3 // 4
+        self.n_edge = n ** 2 // 2
+        self.n_aggregate = n ** 2 // 2
+        self.n_core = n ** 2 // 4
+        self.n_nodes = self.n_hosts + self.n_edge + self.n_aggregate + self.n_core
+
+        # index of the first node of each level
+        self.level_starts = np.cumsum([0, self.n_hosts, self.n_edge, self.n_aggregate])
+        self.adjacency = self._build_adjacency()
+
+    def _build_adjacency(self):
+        """Builds the CSR adjacency matrix directly from the structure, every row is already sorted."""
+        from scipy import sparse
+
+        k, half = self.n, self.half
+        hosts, edge, aggregate, core = self.level_starts
+        positions = np.arange(half)
+
+        edge_ids = np.arange(self.n_edge)
+        aggregate_ids = np.arange(self.n_aggregate)
+        core_ids = np.arange(self.n_core)
+
+        host_rows = (edge + np.arange(self.n_hosts) // half)[:, None]
+        # an edge switch connects to its hosts and to every aggregation switch of its pod
+        edge_rows = np.hstack(((edge_ids * half)[:, None] + positions,
+                               (aggregate + edge_ids // half * half)[:, None] + positions))
+        # an aggregation switch connects to every edge switch of its pod and to the core switches of its group
+        aggregate_rows = np.hstack(((edge + aggregate_ids // half * half)[:, None] + positions,
+                                    (core + aggregate_ids % half * half)[:, None] + positions))
+        # a core switch connects to the aggregation switch of its group in every pod
+        core_rows = aggregate + np.arange(k)[None, :] * half + (core_ids // half)[:, None]
+
+        indices = np.concatenate([rows.ravel() for rows in (host_rows, edge_rows, aggregate_rows, core_rows)])
+        degrees = np.concatenate((np.ones(self.n_hosts, dtype=int), np.full(self.n_nodes - self.n_hosts, k)))
+        indptr = np.concatenate(([0], np.cumsum(degrees)))
+
+        return sparse.csr_matrix((np.ones(len(indices), dtype=np.int8), indices.astype(np.int32),
+                                  indptr.astype(np.int32)), shape=(self.n_nodes, self.n_nodes))
+
+    def to_sparse(self, hosts: bool = True):
+        """Exports the adjacency matrix as a scipy.sparse CSR matrix.
+
+        :arg
+        hosts - whether to keep the hosts, False only keeps the switches, like the Jellyfish adjacency.
+        """
+        if hosts:
+            return self.adjacency
+        return self.adjacency[self.n_hosts:, self.n_hosts:]
+
+    def levels(self, nodes):
+        """Looks up the level of nodes, 0 for hosts, 1 for edge, 2 for aggregation and 3 for core switches."""
+        return np.searchsorted(self.level_starts, nodes, side="right") - 1
+
+    def distances(self, sources, targets):
+        """Calculates hop distances between nodes from the structure of the tree, without a BFS.
+
+        Hosts are one hop further than their edge switch from every other node. Between switches, a pod is crossed
+        through its edge or aggregation switches and pods are connected by the core switches, so two edge switches
+        are 2 hops apart within a pod and 4 across pods, and similarly for the other levels.
+
+        :arg
+        sources - node indices, broadcast against targets.
+        targets - node indices.
+
+        :return
+        an np.array of hop distances with the broadcast shape of sources and targets.
+        """
+        sources, targets = np.broadcast_arrays(np.asarray(sources), np.asarray(targets))
+        extra = (self.levels(sources) == 0).astype(int) + (self.levels(targets) == 0)
+
+        # hosts are replaced by their edge switches and the switches are compared by level, pod and group
+        u = np.where(self.levels(sources) == 0, self.n_hosts + sources // self.half, sources)
+        v = np.where(self.levels(targets) == 0, self.n_hosts + targets // self.half, targets)
+        swap = self.levels(u) > self.levels(v)
+        u, v = np.where(swap, v, u), np.where(swap, u, v)
+        level_u, level_v = self.levels(u), self.levels(v)
+        pod_u, group_u = self._pod_and_group(u, level_u)
+        pod_v, group_v = self._pod_and_group(v, level_v)
+
+        same = u == v
+        same_pod = pod_u == pod_v
+        same_group = group_u == group_v
+        level_pair = level_u * 4 + level_v
+
+        switch_distances = np.select(
+            [same,
+             level_pair == 1 * 4 + 1, level_pair == 1 * 4 + 2, level_pair == 1 * 4 + 3,
+             level_pair == 2 * 4 + 2, level_pair == 2 * 4 + 3,
+             level_pair == 3 * 4 + 3],
+            [0,
+             np.where(same_pod, 2, 4), np.where(same_pod, 1, 3), 2,
+             np.where(same_pod | same_group, 2, 4), np.where(same_group, 1, 3),
+             np.where(same_group, 2, 4)])
+
+        # two hosts are only 0 hops apart if they are the same host
+        same_host = (extra == 2) & (sources == targets)
+        return np.where(same_host, 0, switch_distances + extra)
+
+    def _pod_and_group(self, switches, levels):
+        """Looks up the pod of edge and aggregation switches and the core group of aggregation and core switches.
+
+        Switches without a pod or a group get -1.
+        """
+        offsets = switches - self.level_starts[levels]
+        pods = np.where(levels < 3, offsets // self.half, -1)
+        groups = np.select([levels == 2, levels == 3], [offsets % self.half, offsets // self.half], -1)
+        return pods, groups
+
+    def hop_histogram(self, main_server: int = 0):
+        """Counts the hosts at every hop distance from the main server, excluding the main server itself.
+
+        :return
+        (hops, servers) - np.arrays with the hop counts and the number of hosts at each hop count, like
+        Jellyfish.hop_histogram.
+        """
+        servers = np.bincount(self.distances(main_server, np.arange(self.n_hosts)))
+        servers[0] -= 1
+        hops = np.flatnonzero(servers)
+        return hops, servers[hops]
@@ -1,6 +1,6 @@
 """Module for creating graphs."""
 
-import networkx as nx
+import numpy as np
 
 def create_er_graph(k, p):
     """Creates an Erdos-Renyi random graph.
@@ -12,6 +12,8 @@ def create_er_graph(k, p):
     :return
     an nx.graph with k nodes.
     """
+    import networkx as nx
+
     return nx.erdos_renyi_graph(k, p)
 
 def create_regular_graph(k, node_degree):
@@ -24,4 +26,151 @@ def create_regular_graph(k, node_degree):
     :return
     an nx.graph with k nodes.
     """
-    return nx.random_regular_graph(node_degree, k)
\ No newline at end of file
+    import networkx as nx
+
+    return nx.random_regular_graph(node_degree, k)
+
+def create_regular_sparse_graph(k, node_degree):
+    """Creates a random regular graph without networkx, for benchmarking the sparse connectivity checks on large graphs.
+
+    :arg
+    k - the number of nodes in the graph.
+    node_degree - the degree of each node in the graph.
+
+    :return
+    a scipy.sparse CSR adjacency matrix with k nodes.
+    """
+    from connectivity import edges_to_csr
+
+    return edges_to_csr(create_regular_edges(k, node_degree, 1)[0], k)
+
+def create_er_edges(k, p, replicas, rng=None):
+    """Creates Erdos-Renyi random graphs as edge arrays.
+
+    The vertex pairs of every replica are drawn with geometric skips between consecutive edges, so the cost is
+    proportional to the number of edges rather than to the number of vertex pairs. The skips of all replicas are drawn
+    at once.
+
+    :arg
+    k - the number of nodes in each graph.
+    p - the probability that any vertex pair is connected.
+    replicas - the number of graphs.
+    rng - an optional np.random.Generator.
+
+    :return
+    a list of replicas (n_edges, 2) np.arrays of node indices.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    n_pairs = k * (k - 1) // 2
+
+    if p <= 0 or n_pairs == 0:
+        return [np.zeros((0, 2), dtype=np.int64) for _ in range(replicas)]
+    if p >= 1:
+        return [_decode_pairs(np.arange(n_pairs)) for _ in range(replicas)]
+
+    # enough skips to cover all vertex pairs in almost every replica, the others are extended below
+    mean = n_pairs * p
+    n_skips = int(mean + 6 * np.sqrt(mean) + 10)
+    positions = np.cumsum(rng.geometric(p, size=(replicas, n_skips)), axis=1) - 1
+
+    edges = []
+    for row in positions:
+        while row[-1] < n_pairs:
+            row = np.concatenate((row, row[-1] + np.cumsum(rng.geometric(p, size=n_skips))))
+        edges.append(_decode_pairs(row[row < n_pairs]))
+
+    return edges
+
+
+def create_regular_edges(k, node_degree, replicas, rng=None):
+    """Creates random regular graphs as edge arrays.
+
+    Every replica pairs the stubs of a configuration model with pair_stubs, and is rejected and drawn again if some
+    stubs cannot be paired into a simple graph.
+
+    :arg
+    k - the number of nodes in each graph.
+    node_degree - the degree of each node in the graph.
+    replicas - the number of graphs.
+    rng - an optional np.random.Generator.
+
+    :return
+    a list of replicas (n_edges, 2) np.arrays of node indices.
+    """
+    if (k * node_degree) % 2 != 0 or node_degree >= k:
+        raise ValueError("A regular graph needs k * node_degree to be even and node_degree < k.")
+
+    rng = np.random.default_rng() if rng is None else rng
+    degrees = np.full(k, node_degree)
+
+    edges = []
+    while len(edges) < replicas:
+        replica_edges, stubs = pair_stubs(degrees, rng)
+        if len(stubs) == 0:
+            edges.append(replica_edges)
+
+    return edges
+
+
+def pair_stubs(degrees, rng=None, patience: int = 10):
+    """Randomly pairs the free ports (stubs) of nodes into a simple graph, as in the configuration model.
+
+    The stubs are shuffled and paired in bulk. Pairs that form self-loops or repeat an existing edge are rejected and
+    their stubs are shuffled and paired again, until no pair is accepted for patience rounds in a row.
+
+    :arg
+    degrees - an iterable with the number of stubs of every node.
+    rng - an optional np.random.Generator.
+    patience - the number of rounds without any accepted pair before giving up.
+
+    :return
+    (edges, stubs) - an (n_edges, 2) np.array of node indices and an np.array with the nodes of the unpaired stubs.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    degrees = np.asarray(degrees, dtype=np.int64)
+    n_nodes = len(degrees)
+
+    stubs = np.repeat(np.arange(n_nodes, dtype=np.int64), degrees)
+    keys = np.array([], dtype=np.int64)
+    idle_rounds = 0
+
+    while len(stubs) >= 2 and idle_rounds < patience:
+        rng.shuffle(stubs)
+        n_pairs = len(stubs) // 2
+        low = np.minimum(stubs[:n_pairs], stubs[n_pairs:2 * n_pairs])
+        high = np.maximum(stubs[:n_pairs], stubs[n_pairs:2 * n_pairs])
+        pair_keys = low * n_nodes + high
+
+        # reject self-loops, edges that already exist and all but the first copy of a new edge
+        accepted = (low != high) & ~_sorted_contains(keys, pair_keys)
+        order = np.argsort(pair_keys, kind="stable")
+        is_first = np.ones(n_pairs, dtype=bool)
+        is_first[order[1:]] = pair_keys[order[1:]] != pair_keys[order[:-1]]
+        accepted &= is_first
+
+        # keep the existing keys sorted for the binary search membership check
+        keys = np.sort(np.concatenate((keys, pair_keys[accepted])))
+        stubs = np.concatenate((low[~accepted], high[~accepted], stubs[2 * n_pairs:]))
+        idle_rounds = 0 if np.any(accepted) else idle_rounds + 1
+
+    return np.stack((keys // n_nodes, keys % n_nodes), axis=1), stubs
+
+
+def _sorted_contains(sorted_values, values):
+    """Checks which values are in the sorted np.array sorted_values with a binary search."""
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return sorted_values[positions] == values
+
+
+def _decode_pairs(indices):
+    """Maps linear indices of vertex pairs to (i, j) node pairs with j < i, in lower triangular row-major order."""
+    indices = np.asarray(indices, dtype=np.int64)
+    rows = ((1 + np.sqrt(1 + 8 * indices.astype(float))) // 2).astype(np.int64)
+
+    # correct rounding errors of the square root
+    rows -= rows * (rows - 1) // 2 > indices
+    rows += (rows + 1) * rows // 2 <= indices
+
+    return np.stack((rows, indices - rows * (rows - 1) // 2), axis=1)
@@ -0,0 +1,247 @@
+"""Module for opt-in instrumentation of the simulators.
+
+The simulators wrap their phases in phase("name") and count work with count("name", n). While no Recorder is active
+both return immediately, phase hands out one shared do-nothing context manager, so the hooks can stay in hot paths.
+An active Recorder keeps the start and duration of every phase and the totals of every counter, tagged with the
+current sweep point. It prints a summary table per phase and writes the phases as a Chrome trace, which can be opened
+in chrome://tracing or https://ui.perfetto.dev.
+"""
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+# start_s is a time.perf_counter() value
+Event = namedtuple("Event", "name point start_s duration_s pid tid")
+
+PhaseSummary = namedtuple("PhaseSummary", "name calls total_s mean_s max_s points")
+
+# the active Recorder, None while instrumentation is disabled
+_recorder = None
+
+
+class _NullPhase:
+    """A reusable context manager that does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class Recorder:
+    """Records the phases and counters of the code that runs while it is active."""
+
+    def __init__(self):
+        """creates the Recorder object."""
+        self.events = []
+        self.counters = defaultdict(lambda: defaultdict(int))
+        self.point = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start_s = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append(Event(name, self.point, start_s, time.perf_counter() - start_s, os.getpid(),
+                                     threading.get_ident()))
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name][self.point] += n
+
+    def merge(self, events, counters):
+        """Adds the events and counters recorded by another Recorder, e.g. in a worker process."""
+        self.events.extend(events)
+        for name, points in counters.items():
+            for point, n in points.items():
+                self.counters[name][point] += n
+
+    def summary(self):
+        """Aggregates the events per phase name.
+
+        :return
+        a list of PhaseSummary namedtuples sorted by decreasing total time.
+        """
+        by_name = defaultdict(list)
+        for event in self.events:
+            by_name[event.name].append(event)
+
+        rows = [PhaseSummary(name, len(events), sum(e.duration_s for e in events),
+                             sum(e.duration_s for e in events) / len(events), max(e.duration_s for e in events),
+                             len({e.point for e in events}))
+                for name, events in by_name.items()]
+        return sorted(rows, key=lambda row: -row.total_s)
+
+    def point_summary(self):
+        """Aggregates the total time of every phase per sweep point.
+
+        :return
+        a dictionary from the sweep point to a dictionary from the phase name to the total time in seconds.
+        """
+        totals = defaultdict(lambda: defaultdict(float))
+        for event in self.events:
+            totals[event.point][event.name] += event.duration_s
+        return {point: dict(phases) for point, phases in totals.items()}
+
+    def format_summary(self):
+        """Formats the summary of the phases and the totals of the counters as a table."""
+        lines = [f"{'phase':<32} {'calls':>9} {'total':>11} {'mean':>11} {'max':>11} {'points':>7}"]
+        for row in self.summary():
+            lines.append(f"{row.name:<32} {row.calls:>9} {_format_s(row.total_s):>11} {_format_s(row.mean_s):>11} "
+                         f"{_format_s(row.max_s):>11} {row.points:>7}")
+        for name, points in sorted(self.counters.items()):
+            lines.append(f"{name:<32} {sum(points.values()):>9} (counter)")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path):
+        """Writes the events as complete events and the counters as counter events of the Chrome trace format.
+
+        The perf_counter clock is shared by all processes of a machine, so the events of worker processes line up
+        with the ones of the parent.
+        """
+        origin_s = min((e.start_s for e in self.events), default=0.0)
+        trace_events = [dict(name=e.name, ph="X", ts=(e.start_s - origin_s) * 1e6, dur=e.duration_s * 1e6,
+                             pid=e.pid, tid=e.tid, args=dict(point=e.point)) for e in self.events]
+        end_us = max((e.start_s - origin_s + e.duration_s for e in self.events), default=0.0) * 1e6
+        trace_events += [dict(name=name, ph="C", ts=end_us, pid=os.getpid(), args={"total": sum(points.values())})
+                         for name, points in self.counters.items()]
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(dict(traceEvents=trace_events, displayTimeUnit="ms"), file, default=str)
+
+
+def phase(name: str):
+    """Times the block as a phase of the given name while a Recorder is active."""
+    if _recorder is None:
+        return _NULL_PHASE
+    return _recorder.phase(name)
+
+
+def count(name: str, n: int = 1):
+    """Adds n to the counter of the given name while a Recorder is active."""
+    if _recorder is not None:
+        _recorder.count(name, n)
+
+
+def merge(events, counters):
+    """Adds events and counters recorded elsewhere, see run_recorded, to the active Recorder."""
+    if _recorder is not None:
+        _recorder.merge(events, counters)
+
+
+def enabled():
+    """Checks whether a Recorder is active."""
+    return _recorder is not None
+
+
+@contextmanager
+def recording(recorder: Recorder = None):
+    """Activates a Recorder while the block runs.
+
+    :arg
+    recorder - an optional Recorder to add to, a new one by default.
+
+    :return
+    the active Recorder.
+    """
+    global _recorder
+    previous, _recorder = _recorder, Recorder() if recorder is None else recorder
+    try:
+        yield _recorder
+    finally:
+        _recorder = previous
+
+
+@contextmanager
+def point(label):
+    """Tags the phases and counters of the block with a sweep point, e.g. its number of servers."""
+    if _recorder is None:
+        yield
+        return
+
+    previous, _recorder.point = _recorder.point, label
+    try:
+        yield
+    finally:
+        _recorder.point = previous
+
+
+def run_recorded(function, *args):
+    """Calls function(*args) under a new Recorder, for worker processes of an instrumented parent.
+
+    :return
+    (result, events, counters) - the result of the call and what the Recorder recorded, ready for Recorder.merge.
+    """
+    with recording() as recorder:
+        result = function(*args)
+    return result, recorder.events, {name: dict(points) for name, points in recorder.counters.items()}
+
+
+@contextmanager
+def profile(name, memory: bool = True, top: int = 20):
+    """Records phases, cProfile statistics and optionally tracemalloc allocations while the block runs.
+
+    Afterwards the phase summary, the functions with the largest cumulative time and the largest allocations are
+    printed, and name.prof with the cProfile statistics and name.trace.json with the Chrome trace are written.
+
+    :arg
+    name - the path of the output files without suffix.
+    memory - whether to trace memory allocations, which slows the block down.
+    top - the number of functions and allocation sites printed.
+    """
+    profiler = cProfile.Profile()
+    if memory:
+        tracemalloc.start()
+
+    with recording() as recorder:
+        profiler.enable()
+        try:
+            yield recorder
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot() if memory else None
+            if memory:
+                tracemalloc.stop()
+
+            Path(name).parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(f"{name}.prof")
+            recorder.write_chrome_trace(f"{name}.trace.json")
+
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+            print(recorder.format_summary())
+            print(stream.getvalue())
+            if snapshot is not None:
+                print("largest allocations still held:")
+                for statistic in snapshot.statistics("lineno")[:top]:
+                    print(f"  {statistic}")
+            print(f"profile in {name}.prof, trace in {name}.trace.json")
+
+
+def profile_until_exit(name, memory: bool = True, top: int = 20):
+    """Starts profile(name) now and finishes it when the interpreter exits, for scripts with early exits."""
+    context = profile(name, memory, top)
+    context.__enter__()
+    atexit.register(context.__exit__, None, None, None)
+
+
+def _format_s(seconds):
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.1f} us"
@@ -0,0 +1,239 @@
+"""Module for analysing the connectivity and the path diversity of a Jellyfish switch graph.
+
+All analyses run on the sparse switch adjacency matrix. Breadth first searches from many sources run at once as
+products of the adjacency matrix with a dense (switches x sources) frontier matrix, one product per hop, and batches
+of sources are spread over worker processes.
+"""
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+import connectivity
+from Jellyfish import Jellyfish
+
+PathLengths = namedtuple("PathLengths", "hops pairs average diameter")
+
+PathDiversity = namedtuple("PathDiversity", "sources targets hops n_shortest_paths k_shortest_hops")
+
+JellyfishAnalysis = namedtuple("JellyfishAnalysis", "connected path_lengths diversity")
+
+
+def analyse(jellyfish: Jellyfish, n_pairs: int = 100, k: int = 0, batch_size: int = 256, workers: int = 1,
+            rng=None):
+    """Checks the connectivity of a Jellyfish and measures its shortest path lengths and path diversity.
+
+    :arg
+    jellyfish - a built Jellyfish.
+    n_pairs - the number of random switch pairs for the path diversity.
+    k - the number of shortest simple paths measured for every pair, 0 skips them.
+    batch_size - the number of BFS sources handled at once.
+    workers - the number of worker processes.
+    rng - an optional np.random.Generator for sampling the pairs.
+
+    :return
+    a JellyfishAnalysis namedtuple.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    adjacency = jellyfish.to_sparse()
+
+    sources, targets = sample_pairs(adjacency.shape[0], n_pairs, rng)
+
+    return JellyfishAnalysis(connectivity.check_bfs_sparse(adjacency),
+                             path_lengths(adjacency, batch_size=batch_size, workers=workers),
+                             path_diversity(adjacency, sources, targets, k, batch_size, workers))
+
+
+def sample_pairs(n_switches: int, n_pairs: int, rng=None):
+    """Samples pairs of distinct switches uniformly.
+
+    :return
+    (sources, targets) - two np.arrays of switch indices.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    sources = rng.integers(n_switches, size=n_pairs)
+    # shifting by 1 to n - 1 places never lands on the source itself
+    targets = (sources + rng.integers(1, n_switches, size=n_pairs)) % n_switches
+
+    return sources, targets
+
+
+def path_lengths(adjacency, sources=None, batch_size: int = 256, workers: int = 1):
+    """Counts the pairs of switches at every shortest path length with batched multi-source BFS.
+
+    :arg
+    adjacency - a symmetric scipy.sparse adjacency matrix of the switches.
+    sources - the BFS sources, all switches by default, which makes the average exact.
+    batch_size - the number of sources handled at once.
+    workers - the number of worker processes.
+
+    :return
+    a PathLengths namedtuple with np.arrays of the hop counts and the number of (source, target) pairs at each count,
+    the average over the connected pairs of distinct switches and the largest hop count.
+    """
+    adjacency = _float_adjacency(adjacency)
+    sources = np.arange(adjacency.shape[0]) if sources is None else np.asarray(sources)
+    batches = [sources[i:i + batch_size] for i in range(0, len(sources), batch_size)]
+
+    pairs = np.zeros(1, dtype=np.int64)
+    for counts in _map(_count_levels, adjacency, batches, workers):
+        pairs = np.pad(pairs, (0, max(0, len(counts) - len(pairs))))
+        pairs[:len(counts)] += counts
+
+    hops = np.flatnonzero(pairs[1:]) + 1
+    pairs = pairs[hops]
+    average = float(np.sum(hops * pairs) / np.sum(pairs)) if len(hops) > 0 else np.nan
+
+    return PathLengths(hops, pairs, average, int(hops.max(initial=0)))
+
+
+def path_diversity(adjacency, sources, targets, k: int = 0, batch_size: int = 256, workers: int = 1):
+    """Counts the equal-cost shortest paths between pairs of switches and optionally the lengths of k shortest paths.
+
+    The number of shortest paths to every switch is propagated along the BFS levels, so one BFS per distinct source
+    counts the paths to all its targets.
+
+    :arg
+    adjacency - a symmetric scipy.sparse adjacency matrix of the switches.
+    sources - an np.array of source switches.
+    targets - an np.array of target switches, one per source.
+    k - the number of shortest simple paths measured for every pair with networkx, 0 skips them.
+    batch_size - the number of distinct sources handled at once.
+    workers - the number of worker processes.
+
+    :return
+    a PathDiversity namedtuple with the pairs, their shortest path lengths, -1 if disconnected, their number of
+    shortest paths and, if k > 0, a (n_pairs, k) np.array with the lengths of their k shortest simple paths, -1
+    where there are fewer.
+    """
+    adjacency = _float_adjacency(adjacency)
+    sources, targets = np.asarray(sources), np.asarray(targets)
+    distinct = np.unique(sources)
+    batches = [distinct[i:i + batch_size] for i in range(0, len(distinct), batch_size)]
+
+    hops = np.empty(len(sources), dtype=int)
+    n_paths = np.empty(len(sources))
+    for batch, (batch_hops, batch_paths) in zip(batches, _map(_count_shortest_paths, adjacency, batches, workers)):
+        pairs = np.flatnonzero(np.isin(sources, batch))
+        columns = np.searchsorted(batch, sources[pairs])
+        hops[pairs] = batch_hops[targets[pairs], columns]
+        n_paths[pairs] = batch_paths[targets[pairs], columns]
+
+    k_shortest_hops = None
+    if k > 0:
+        pair_batches = [np.stack((sources[i:i + batch_size], targets[i:i + batch_size]), axis=1)
+                        for i in range(0, len(sources), batch_size)]
+        k_shortest_hops = np.concatenate([lengths for lengths in _map(
+            _k_shortest_hops, adjacency, [(pairs, k) for pairs in pair_batches], workers)]).reshape(-1, k)
+
+    return PathDiversity(sources, targets, hops, n_paths, k_shortest_hops)
+
+
+def _map(function, adjacency, batches, workers):
+    """Applies function(adjacency, batch) to every batch, in worker processes if workers > 1."""
+    if workers == 1:
+        return (function(adjacency, batch) for batch in batches)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, repeat(adjacency), batches))
+
+
+def _float_adjacency(adjacency):
+    """Converts an adjacency matrix to float32 CSR, so that products with frontier matrices stay in float32."""
+    return adjacency.tocsr().astype(np.float32)
+
+
+def _frontier(n_switches, sources):
+    frontier = np.zeros((n_switches, len(sources)), dtype=np.float32)
+    frontier[sources, np.arange(len(sources))] = 1
+    return frontier
+
+
+def _count_levels(adjacency, sources):
+    """Runs a BFS from every source at once and counts the switches reached at every level, summed over sources."""
+    frontier = _frontier(adjacency.shape[0], sources)
+    visited = frontier > 0
+    counts = [len(sources)]
+
+    while counts[-1] > 0:
+        reached = adjacency @ frontier > 0
+        reached &= ~visited
+        visited |= reached
+        counts.append(int(np.count_nonzero(reached)))
+        frontier = reached.astype(np.float32)
+
+    return np.array(counts[:-1], dtype=np.int64)
+
+
+def _count_shortest_paths(adjacency, sources):
+    """Runs a BFS from every source at once, counting the shortest paths to every switch.
+
+    :return
+    (hops, n_paths) - two (n_switches, n_sources) np.arrays with the shortest path lengths, -1 for unreachable
+    switches, and the number of shortest paths.
+    """
+    n_switches = adjacency.shape[0]
+    hops = np.full((n_switches, len(sources)), -1)
+    hops[sources, np.arange(len(sources))] = 0
+    n_paths = _frontier(n_switches, sources).astype(np.float64)
+    frontier = n_paths.copy()
+    level = 0
+
+    while frontier.any():
+        level += 1
+        # every shortest path to a newly reached switch ends with a link from the previous level
+        arriving = adjacency @ frontier
+        reached = (arriving > 0) & (hops < 0)
+        hops[reached] = level
+        frontier = np.where(reached, arriving, 0)
+        n_paths += frontier
+
+    return hops, n_paths
+
+
+def _k_shortest_hops(adjacency, task):
+    """Measures the lengths of the k shortest simple paths of pairs of switches with networkx."""
+    import networkx as nx
+    from itertools import islice
+
+    pairs, k = task
+    graph = nx.from_scipy_sparse_array(adjacency)
+    lengths = np.full((len(pairs), k), -1)
+
+    for i, (source, target) in enumerate(pairs):
+        try:
+            paths = islice(nx.shortest_simple_paths(graph, int(source), int(target)), k)
+            for j, path in enumerate(paths):
+                lengths[i, j] = len(path) - 1
+        except nx.NetworkXNoPath:
+            pass
+
+    return lengths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyses the connectivity and the path diversity of a Jellyfish.")
+    parser.add_argument("--n", type=int, default=64, help="the number of ports of the switches.")
+    parser.add_argument("--pairs", type=int, default=100, help="the number of sampled switch pairs.")
+    parser.add_argument("--k", type=int, default=0, help="the number of shortest simple paths per pair.")
+    parser.add_argument("--workers", type=int, default=1, help="the number of worker processes.")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the structure and the pairs.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    jellyfish = Jellyfish(args.n, 0.000005, 10)
+    jellyfish.build_sparse_structure(rng)
+
+    analysis = analyse(jellyfish, args.pairs, args.k, workers=args.workers, rng=rng)
+    lengths, diversity = analysis.path_lengths, analysis.diversity
+
+    print(f"{jellyfish.S} switches, connected: {analysis.connected}")
+    print(f"average shortest path {lengths.average:.3f} hops, diameter {lengths.diameter}")
+    for hops, pairs in zip(lengths.hops, lengths.pairs):
+        print(f"{hops:>4} hops: {pairs / lengths.pairs.sum():8.4%} of pairs")
+    print(f"equal-cost shortest paths per pair: mean {diversity.n_shortest_paths.mean():.1f}, "
+          f"min {diversity.n_shortest_paths.min():.0f}, max {diversity.n_shortest_paths.max():.0f}")
+    if diversity.k_shortest_hops is not None:
+        print(f"mean length of the {args.k} shortest paths: {diversity.k_shortest_hops.mean(axis=0).round(2)}")
@@ -0,0 +1,177 @@
+"""Module for estimating connectivity probabilities with parallel, adaptive Monte Carlo.
+
+The replicas of every parameter value are split into fixed size blocks, and every block draws from its own random
+stream derived from the seed, the parameter's index and the block's index. Blocks run on a process pool and their
+counts are gathered as they finish. A parameter value stops once the Wilson confidence interval of the blocks
+finished so far, taken in block order, is narrow enough, so the result does not depend on the number of workers.
+"""
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+import connectivity
+import graphs
+
+ConnectivityEstimate = namedtuple("ConnectivityEstimate", "x probs ci_low ci_high repeats")
+
+
+def parallel_er_connectivity(n_nodes: int, edge_probs, half_width: float = 0.01, max_repeats: int = 100000,
+                             block_size: int = 100, workers: int = 1, seed=None, z: float = 1.96):
+    """Estimates the probability of connectivity of an ER graph for every probability of edge connections.
+
+    :arg
+    n_nodes - the number of nodes in the ER graph.
+    edge_probs - an iterable of probabilities of edge connections.
+    half_width - the half width of the confidence interval at which a probability stops.
+    max_repeats - the maximum number of repetitions for each value in edge_probs.
+    block_size - the number of repetitions in one task, the last task of a value is cut short at max_repeats.
+    workers - the number of worker processes, 1 runs in the current process.
+    seed - an optional seed.
+    z - the standard normal quantile of the confidence interval.
+
+    :return
+    a ConnectivityEstimate namedtuple with the edge_probs as the x value.
+    """
+    tasks = [(_count_er_connected, n_nodes, p) for p in edge_probs]
+    return _estimate(tasks, np.array(edge_probs), half_width, max_repeats, block_size, workers, seed, z)
+
+
+def parallel_r_random_connectivity(n_nodes, node_degree: int, half_width: float = 0.01, max_repeats: int = 100000,
+                                   block_size: int = 100, workers: int = 1, seed=None, z: float = 1.96):
+    """Estimates the probability of connectivity of an r-random graph for every number of nodes.
+
+    :arg
+    n_nodes - an iterable of numbers of nodes in the r-random graph.
+    node_degree - the degree of every node in the graph.
+    half_width - the half width of the confidence interval at which a number of nodes stops.
+    max_repeats - the maximum number of repetitions for each value in n_nodes.
+    block_size - the number of repetitions in one task, the last task of a value is cut short at max_repeats.
+    workers - the number of worker processes, 1 runs in the current process.
+    seed - an optional seed.
+    z - the standard normal quantile of the confidence interval.
+
+    :return
+    a ConnectivityEstimate namedtuple with the n_nodes as the x value.
+    """
+    tasks = [(_count_regular_connected, k, node_degree) for k in n_nodes]
+    return _estimate(tasks, np.array(n_nodes), half_width, max_repeats, block_size, workers, seed, z)
+
+
+def wilson_interval(successes, trials, z: float = 1.96):
+    """Calculates the Wilson score confidence interval of a binomial proportion.
+
+    :arg
+    successes - the number of successes.
+    trials - the number of trials.
+    z - the standard normal quantile of the confidence interval.
+
+    :return
+    (low, high) - the bounds of the confidence interval.
+    """
+    successes, trials = np.asarray(successes, dtype=float), np.asarray(trials, dtype=float)
+    proportion = successes / trials
+    denominator = 1 + z ** 2 / trials
+
+    centre = (proportion + z ** 2 / (2 * trials)) / denominator
+    half_width = z / denominator * np.sqrt(proportion * (1 - proportion) / trials + z ** 2 / (4 * trials ** 2))
+
+    # the bounds at 0 and 1 are exact, but rounding can leave them just inside
+    low = np.where(successes == 0, 0, np.clip(centre - half_width, 0, 1))
+    high = np.where(successes == trials, 1, np.clip(centre + half_width, 0, 1))
+    return low, high
+
+
+def repeats_for_half_width(half_width: float, z: float = 1.96):
+    """Calculates the number of repetitions after which any probability has a confidence interval of half_width.
+
+    The bound holds for the normal approximation at a probability of 1/2, where the interval is widest. It sizes
+    estimators without intermediate intervals, e.g. connectivity.er_connectivity_coupled.
+
+    :arg
+    half_width - the half width of the confidence interval.
+    z - the standard normal quantile of the confidence interval.
+
+    :return
+    the number of repetitions.
+    """
+    return int(np.ceil((z / (2 * half_width)) ** 2))
+
+
+def _estimate(tasks, x, half_width, max_repeats, block_size, workers, seed, z):
+    entropy = np.random.SeedSequence(seed).entropy
+    max_blocks = -(-max_repeats // block_size)
+    blocks = [{} for _ in tasks]  # finished block counts of every task, by block index
+    used = np.zeros(len(tasks), dtype=int)  # number of leading blocks included in the estimate
+    next_block = np.zeros(len(tasks), dtype=int)
+
+    def update(i):
+        """Extends the estimate of task i by its finished leading blocks until it is precise enough."""
+        while not _is_done(blocks[i], used[i], max_repeats, block_size, half_width, z) and used[i] in blocks[i]:
+            used[i] += 1
+        return _is_done(blocks[i], used[i], max_repeats, block_size, half_width, z)
+
+    def arguments(i):
+        block = int(next_block[i])
+        seed_sequence = np.random.SeedSequence(entropy, spawn_key=(i, block))
+        next_block[i] += 1
+        return tasks[i] + (min(block_size, max_repeats - block * block_size), seed_sequence)
+
+    if workers == 1:
+        for i in range(len(tasks)):
+            while not update(i):
+                block = next_block[i]
+                count_block, *args = arguments(i)
+                blocks[i][block] = count_block(*args)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+
+            def submit(i):
+                block = next_block[i]
+                count_block, *args = arguments(i)
+                pending[executor.submit(count_block, *args)] = (i, block)
+
+            # keep every worker busy, handing out blocks of the unfinished tasks in turn
+            while True:
+                open_tasks = [i for i in range(len(tasks)) if not update(i) and next_block[i] < max_blocks]
+                for i in open_tasks:
+                    if len(pending) >= 2 * workers:
+                        break
+                    if next_block[i] - used[i] < 2 * workers:
+                        submit(i)
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, block = pending.pop(future)
+                    blocks[i][block] = future.result()
+
+    successes = np.array([sum(blocks[i][b] for b in range(used[i])) for i in range(len(tasks))])
+    trials = np.minimum(used * block_size, max_repeats)
+    low, high = wilson_interval(successes, trials, z)
+
+    return ConnectivityEstimate(x, successes / trials, low, high, trials)
+
+
+def _is_done(blocks, used, max_repeats, block_size, half_width, z):
+    if used * block_size >= max_repeats:
+        return True
+    if used == 0:
+        return False
+
+    low, high = wilson_interval(sum(blocks[b] for b in range(used)), used * block_size, z)
+    return (high - low) / 2 <= half_width
+
+
+def _count_er_connected(n_nodes, p, repeats, seed):
+    rng = np.random.default_rng(seed)
+    return sum(connectivity.check_bfs_sparse(edges, n_nodes)
+               for edges in graphs.create_er_edges(n_nodes, p, repeats, rng))
+
+
+def _count_regular_connected(n_nodes, node_degree, repeats, seed):
+    rng = np.random.default_rng(seed)
+    return sum(connectivity.check_bfs_sparse(edges, n_nodes)
+               for edges in graphs.create_regular_edges(n_nodes, node_degree, repeats, rng))
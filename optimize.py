@@ -0,0 +1,140 @@
+"""Module for finding the optimal number of servers with common random numbers.
+
+All candidate numbers of servers are evaluated on the same standard exponential and uniform draws, so the differences
+between candidates are much less noisy than the candidates themselves. This makes a coarse-to-fine search over the
+number of servers reliable with few evaluations.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from fat_tree import FatTree
+from response_time import fat_tree_tier_table, TopologySimulation
+
+OptimalServers = namedtuple("OptimalServers", "n_servers, value, value_ci, n_servers_ci, n_evaluations")
+
+
+class CommonRandomNumbers:
+    """The response time or job running cost of a FatTree as a function of the number of servers."""
+
+    def __init__(self, sim: TopologySimulation, tree: FatTree, max_servers: int, n_sims: int, xi: float = 0,
+                 seed=None):
+        """creates the CommonRandomNumbers object.
+
+        :arg
+        sim - a TopologySimulation, its n_servers field is ignored.
+        tree - the FatTree to simulate on.
+        max_servers - the largest number of servers that can be evaluated.
+        n_sims - the number of replicas.
+        xi - the weight of theta in the job running cost, 0 evaluates the response time only.
+        seed - an optional seed for the common random numbers.
+        """
+        self.sim = sim
+        self.tree = tree
+        self.xi = xi
+
+        rng = np.random.default_rng(seed)
+        self.exec_draws = rng.standard_exponential((n_sims, max_servers))
+        self.return_draws = rng.random((n_sims, max_servers))
+        self.exec_draw_sums = np.cumsum(self.exec_draws, axis=1)
+        self.values = {}
+
+    def __call__(self, n_servers: int):
+        """Evaluates the objective for every replica.
+
+        :arg
+        n_servers - the number of servers.
+
+        :return
+        an np.array with one value per replica.
+        """
+        n_servers = int(n_servers)
+        if n_servers not in self.values:
+            self.values[n_servers] = self._evaluate(n_servers)
+
+        return self.values[n_servers]
+
+    def _evaluate(self, n_servers):
+        sim = self.sim._replace(n_servers=n_servers)
+        exec_scale = sim.expected_job_time_s / n_servers
+        counts, offsets, return_scales = (table[0] for table in fat_tree_tier_table(sim, self.tree, [n_servers]))
+
+        tiers = np.repeat(np.arange(len(counts)), counts)
+        times = exec_scale * self.exec_draws[:, :len(tiers)] + offsets[tiers]
+        times += return_scales[tiers] * self.return_draws[:, :len(tiers)]
+        response_times = np.max(times, axis=1)
+
+        theta = exec_scale * self.exec_draw_sums[:, n_servers - 1] + n_servers * sim.fixed_job_time_s
+
+        return response_times + self.xi * theta
+
+
+def find_optimal_servers(objective: CommonRandomNumbers, min_servers: int, max_servers: int, n_coarse: int = 16,
+                         z: float = 1.96):
+    """Finds the number of servers that minimises the mean of an objective.
+
+    The search first evaluates a coarse grid, then narrows the bracket around its best point with a golden-section
+    search over the integers.
+
+    :arg
+    objective - a function of the number of servers returning one value per replica, e.g. CommonRandomNumbers.
+    min_servers - the smallest number of servers to consider.
+    max_servers - the largest number of servers to consider.
+    n_coarse - the number of points in the coarse grid.
+    z - the standard normal quantile of the confidence intervals.
+
+    :return
+    an OptimalServers namedtuple with the optimal number of servers, the objective's mean there, a confidence interval
+    of the mean, the range of evaluated numbers of servers that are not significantly worse than the optimum and the
+    number of evaluated numbers of servers.
+    """
+    evaluated = {}
+
+    def mean(n_servers):
+        n_servers = int(n_servers)
+        if n_servers not in evaluated:
+            evaluated[n_servers] = objective(n_servers)
+        return np.mean(evaluated[n_servers])
+
+    grid = np.unique(np.linspace(min_servers, max_servers, n_coarse).astype(int))
+    best = int(np.argmin([mean(n_servers) for n_servers in grid]))
+    low, high = int(grid[max(best - 1, 0)]), int(grid[min(best + 1, len(grid) - 1)])
+
+    low, high = _golden_section_search(mean, low, high)
+    for n_servers in range(low, high + 1):
+        mean(n_servers)
+
+    optimum = min(evaluated, key=mean)
+    values = evaluated[optimum]
+    value = float(np.mean(values))
+    half_width = float(z * np.std(values, ddof=1) / np.sqrt(len(values)))
+
+    # with common random numbers the paired differences tell which candidates are indistinguishable from the optimum
+    indistinguishable = [n_servers for n_servers, other in evaluated.items()
+                         if _paired_lower_bound(other - values, z) <= 0]
+
+    return OptimalServers(optimum, value, (value - half_width, value + half_width),
+                          (min(indistinguishable), max(indistinguishable)), len(evaluated))
+
+
+def _golden_section_search(f, low: int, high: int):
+    """Narrows the integer bracket [low, high] around a minimum of f until at most four points remain."""
+    ratio = (np.sqrt(5) - 1) / 2
+    while high - low > 3:
+        left = int(round(high - ratio * (high - low)))
+        right = int(round(low + ratio * (high - low)))
+        if left == right:
+            right += 1
+
+        if f(left) <= f(right):
+            high = right
+        else:
+            low = left
+
+    return low, high
+
+
+def _paired_lower_bound(differences, z):
+    if np.all(differences == 0):
+        return 0.0
+    return np.mean(differences) - z * np.std(differences, ddof=1) / np.sqrt(len(differences))
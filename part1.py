@@ -1,16 +1,40 @@
 """Script for creating plots for part 1 of the assignment."""
+import argparse
+
 import complexity
 import connectivity
 import graphs
+import instrument
+import montecarlo
 import plot
 import numpy as np
 import os
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Creates the plots for part 1 of the assignment.")
+    parser.add_argument("--profile", action="store_true",
+                        help="record the connectivity phases with cProfile and tracemalloc and write a profile and a trace.")
+    parser.add_argument("--sparse-checks", nargs="+", default=["irreducibility", "bfs"],
+                        choices=["irreducibility", "laplacian", "bfs"],
+                        help="the sparse connectivity checks benchmarked on large graphs, the Laplacian check takes "
+                             "tens of seconds per graph beyond 10^4 nodes.")
+    parser.add_argument("--sparse-sizes", type=int, nargs=3, default=[100, 100000, 13],
+                        metavar=("START", "STOP", "NUM"), help="the log-spaced numbers of nodes of the sparse benchmark.")
+    parser.add_argument("--coupled", action="store_true",
+                        help="estimate all edge probabilities of the ER graphs from the same coupled graphs.")
+    parser.add_argument("--workers", type=int, default=1, help="the number of worker processes of the connectivity plots.")
+    parser.add_argument("--half-width", type=float, default=0.05,
+                        help="the half width of the confidence interval at which a connectivity probability stops.")
+    parser.add_argument("--max-repeats", type=int, default=10000,
+                        help="the maximum number of graphs per connectivity probability.")
+    args = parser.parse_args()
 
     if not os.path.exists('img'):
         os.makedirs('img')
 
+    if args.profile:
+        instrument.profile_until_exit("img/part1_profile")
+
     # create complexity plots
     lap_complex = complexity.TimeComplexity(connec=connectivity.check_laplacian,
                                             create_graph=graphs.create_regular_graph)
@@ -30,18 +54,44 @@ if __name__ == "__main__":
                                         labels=["Irreducibility", "Laplacian", "BFS"],
                                         title="Connectivity Algorithm Complexity")
     fig.savefig("img/connectivity_complexity.eps", format="eps")
+    complexity.save_results([irred_complex.benchmark, lap_complex.benchmark, bfs_complex.benchmark],
+                            "img/connectivity_complexity.json")
+
+    # create complexity plots of the sparse checks on graphs up to 10^5 nodes, of degree 4 so that they are connected
+    sparse_checks = dict(irreducibility=connectivity.check_irreducibility_sparse,
+                         laplacian=connectivity.check_laplacian_sparse, bfs=connectivity.check_bfs_sparse)
+    sparse_complex = [complexity.TimeComplexity(connec=sparse_checks[name],
+                                                create_graph=graphs.create_regular_sparse_graph, node_degree=4)
+                      for name in args.sparse_checks]
+
+    for t_c in sparse_complex:
+        t_c.time(10, *args.sparse_sizes)
+
+    fig, ax = plot.plot_time_complexity(time_complexity=sparse_complex,
+                                        labels=[name.title() for name in args.sparse_checks],
+                                        title="Sparse Connectivity Algorithm Complexity")
+    ax.set(xscale="log", yscale="log")
+    fig.savefig("img/sparse_connectivity_complexity.eps", format="eps")
+    complexity.save_results([t_c.benchmark for t_c in sparse_complex], "img/sparse_connectivity_complexity.json")
 
     # create connectivity probability plots
 
-    r_connec1 = connectivity.r_random_connectivity(range(10, 101), 2, 10)
-    r_connec2 = connectivity.r_random_connectivity(range(10, 101), 8, 10)
+    r_connec1 = montecarlo.parallel_r_random_connectivity(range(10, 101), 2, args.half_width, args.max_repeats,
+                                                          workers=args.workers)
+    r_connec2 = montecarlo.parallel_r_random_connectivity(range(10, 101), 8, args.half_width, args.max_repeats,
+                                                          workers=args.workers)
 
     fig, _ = plot.plot_connectivity_prob([r_connec1, r_connec2], ["r = 2", "r = 8"], "R-Random Graph Connectivity",
                                          "Number of Nodes")
 
     fig.savefig("img/r-random_graph_connectivity.eps", format="eps")
 
-    er_connec = connectivity.er_connectivity(100, np.linspace(0.01, 1, 100), 10)
+    if args.coupled:
+        repeats = min(args.max_repeats, montecarlo.repeats_for_half_width(args.half_width))
+        er_connec = connectivity.er_connectivity_coupled(100, np.linspace(0.01, 1, 100), repeats)
+    else:
+        er_connec = montecarlo.parallel_er_connectivity(100, np.linspace(0.01, 1, 100), args.half_width,
+                                                        args.max_repeats, workers=args.workers)
     fig, _ = plot.plot_connectivity_prob([er_connec], [""], "Erdos-Renyi Graph Connectivity", "p")
 
     fig.savefig("img/er-graph_connectivity.eps", format="eps")
@@ -1,13 +1,45 @@
+import argparse
+import functools
 import os
 
 import numpy as np
-from tqdm import tqdm
 
 import fat_tree
-from plot import plot_response_time
-from response_time import simulate_fat_tree_response_time, TopologySimulation
+import instrument
+import optimize
+from Jellyfish import Jellyfish
+from plot import plot_response_time, plot_response_time_percentiles
+from replica_store import ReplicaStore
+from response_time import expected_fat_tree_response_time, expected_jellyfish_response_time, TopologySimulation, \
+    VARIANCE_REDUCTIONS
+import sweep
+from sweep_cache import SweepCache
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Creates the response time plot for part 2 of the assignment.")
+    parser.add_argument("--method", choices=["monte-carlo", "quadrature"], default="monte-carlo",
+                        help="estimate the expected response time by sampling or by numerical integration.")
+    parser.add_argument("--workers", type=int, default=1, help="the number of worker processes for the sweep.")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the sweep.")
+    parser.add_argument("--cache-dir", default=".sweep_cache", help="the directory of the sweep result cache.")
+    parser.add_argument("--no-cache", action="store_true", help="always recompute the sweep.")
+    parser.add_argument("--optimize", action="store_true",
+                        help="search the optimal number of servers with common random numbers instead of a full sweep.")
+    parser.add_argument("--variance-reduction", nargs="+", choices=VARIANCE_REDUCTIONS, default=[],
+                        help="couple the Monte Carlo replicas of every number of servers to lower the variance of "
+                             "their mean, control needs --n-sims >= 3 and can not be used with --store-dir.")
+    parser.add_argument("--n-sims", type=int, default=100, help="the number of Monte Carlo replicas per point.")
+    parser.add_argument("--store-dir", default=None,
+                        help="stream every Monte Carlo replica into memory-mapped float32 stores in this directory, "
+                             "average them from there and also plot their percentiles.")
+    parser.add_argument("--profile", action="store_true",
+                        help="record the simulator phases with cProfile and tracemalloc and write a profile and a trace.")
+    args = parser.parse_args()
+    if "control" in args.variance_reduction and args.store_dir is not None:
+        parser.error("--store-dir keeps replicas for percentiles, which the control variate adjustment invalidates.")
+
+    if args.profile:
+        instrument.profile_until_exit("img/part2_profile")
 
     if not os.path.exists('img'):
         os.makedirs('img')
@@ -21,23 +53,62 @@ if __name__ == "__main__":
     input_file_size_gb = 4000
     output_file_size_gb = 4000
     overhead = 1 + 48 / 1500
-    n_sims = 100
+    n_sims = args.n_sims
+    variance_reduction = sorted(args.variance_reduction)
+    # plain sweeps keep the cache keys they had before variance reduction existed
+    reduction_params = dict(variance_reduction=variance_reduction) if variance_reduction else {}
 
     baseline = expected_job_time_s + fixed_job_time_s
     tree = fat_tree.FatTree(n, tau_s, capacity_gbit)
+    jellyfish = Jellyfish(n, tau_s, capacity_gbit)
+    jellyfish.build_sparse_structure(np.random.default_rng(args.seed))
 
-    fat_tree_response_times = []
     servers = range(1, N + 1, 10)
-    for n_servers in tqdm(servers):
-        sim = TopologySimulation(n_servers, tau_s, capacity_gbit, expected_job_time_s, fixed_job_time_s, input_file_size_gb,
-                                 output_file_size_gb, overhead)
+    sim = TopologySimulation(N, tau_s, capacity_gbit, expected_job_time_s, fixed_job_time_s, input_file_size_gb,
+                             output_file_size_gb, overhead)
+
+    if args.optimize:
+        objective = optimize.CommonRandomNumbers(sim, tree, N, n_sims, seed=args.seed)
+        print(optimize.find_optimal_servers(objective, 1, N))
+        raise SystemExit
+
+    if args.method == "quadrature":
+        fat_tree_response_times = np.array([expected_fat_tree_response_time(sim._replace(n_servers=n_servers), tree)
+                                            for n_servers in servers])
+        jellyfish_response_times = np.array([expected_jellyfish_response_time(sim._replace(n_servers=n_servers),
+                                                                              jellyfish) for n_servers in servers])
+    else:
+        cache = None if args.no_cache else SweepCache(args.cache_dir)
+        stores = [None, None]
+        if args.store_dir is not None:
+            # the same metadata as python -m cli sweep --store, so that python -m cli plot can read the stores
+            stores = [ReplicaStore.create(os.path.join(args.store_dir, f"{topology}.replicas"), servers, n_sims,
+                                          dict(topology=topology, n=n, sim=sim._asdict(), seed=args.seed,
+                                               baseline=baseline, variance_reduction=variance_reduction))
+                      for topology in ["fat-tree", "jellyfish"]]
+
+        simulate = functools.partial(sweep.fat_tree_response_times, tree=tree, variance_reduction=variance_reduction)
+        params = dict(topology="fat_tree", n=n, tau=tau_s, capacity=capacity_gbit, **reduction_params)
+        replicas = sweep.run_cached_sweep(simulate, sim, servers, n_sims, cache, params, args.workers, args.seed,
+                                          stores[0])
+        # a store is reduced block by block, from its float32 replicas, and with the control scheme the control
+        # variate is fitted on all replicas of a point
+        fat_tree_response_times = stores[0].mean() if stores[0] is not None else sweep.replica_means(replicas)
+
+        simulate = functools.partial(sweep.jellyfish_response_times, jellyfish=jellyfish,
+                                     variance_reduction=variance_reduction)
+        params = dict(topology="jellyfish", n=n, tau=tau_s, capacity=capacity_gbit, **reduction_params)
+        replicas = sweep.run_cached_sweep(simulate, sim, servers, n_sims, cache, params, args.workers, args.seed,
+                                          stores[1])
+        jellyfish_response_times = stores[1].mean() if stores[1] is not None else sweep.replica_means(replicas)
 
-        response_time = np.mean([simulate_fat_tree_response_time(sim, tree) for _ in range(n_sims)])
-        fat_tree_response_times.append(response_time)
+        if args.store_dir is not None:
+            fig, _ = plot_response_time_percentiles(stores, ["Fat Tree", "Jellyfish"], baseline=baseline)
+            fig.savefig("img/response_time_percentiles.eps", format="eps")
 
-    fat_tree_response_times = np.array(fat_tree_response_times)
-    optimal_servers = [servers[np.argmin(fat_tree_response_times)]]
+    optimal_servers = [servers[np.argmin(fat_tree_response_times)], servers[np.argmin(jellyfish_response_times)]]
 
-    fig, _ = plot_response_time(servers, [fat_tree_response_times / baseline], ["Fat Tree"],optimal_servers)
+    fig, _ = plot_response_time(servers, [fat_tree_response_times / baseline, jellyfish_response_times / baseline],
+                                ["Fat Tree", "Jellyfish"], optimal_servers)
 
     fig.savefig("img/response_time.eps", format="eps")
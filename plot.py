@@ -1,9 +1,15 @@
 """Module for plotting."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 
 import numpy as np
 import matplotlib.pyplot as plt
-import complexity
-import connectivity
+
+if TYPE_CHECKING:
+    import complexity
+    import connectivity
+    import replica_store
 
 
 def plot_time_complexity(time_complexity: list[complexity.TimeComplexity], labels: [str], title: str):
@@ -60,6 +66,30 @@ def plot_response_time(servers, response_times: [np.array], labels: [str],optima
 
     return fig, ax
 
+
+def plot_response_time_percentiles(stores: list[replica_store.ReplicaStore], labels: [str], percentiles=(50, 99),
+                                   baseline: float = 1.0):
+    """Plots percentiles of the response time over the replicas, read block by block from replica stores.
+
+    :arg
+    stores - a list of ReplicaStore objects.
+    labels - a list of labels, one per store.
+    percentiles - the percentiles to plot.
+    baseline - the response time the percentiles are normalised by.
+    """
+    fig, ax = plt.subplots(1)
+
+    for store, label in zip(stores, labels):
+        values = store.percentiles(percentiles) / baseline
+        for column, q in enumerate(percentiles):
+            ax.plot(store.servers, values[:, column], label=f"{label} p{q:g}")
+
+    ax.set(title="Normalised Response Time Percentiles", ylabel="Response Time", xlabel="Number of Servers")
+    ax.legend()
+
+    return fig, ax
+
+
 def plot_job_running_cost(servers,costs):
     """Creates a figure for the running cost."""
     fig, ax = plt.subplots(1)
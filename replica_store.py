@@ -0,0 +1,125 @@
+"""Module for storing replica-level sweep results in a memory-mapped file.
+
+A store is a single file with a small header followed by a (servers x replicas) float32 matrix in C order. The header
+is the magic bytes, the length of a JSON document and the document itself, with the numbers of servers, the number of
+replicas and free-form metadata, padded so that the matrix starts at a multiple of DATA_ALIGNMENT bytes. The matrix
+is preallocated with NaN, filled row by row while a sweep runs and read back as an np.memmap, so datasets larger
+than the memory can be analysed one block of rows at a time.
+"""
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"REPLICA1"
+
+# the offset of the matrix is a multiple of this, which keeps the float32 rows aligned for vectorised reads
+DATA_ALIGNMENT = 64
+
+# the maximum number of bytes of the matrix that are read at once by the reductions
+CHUNK_BYTES = 1 << 26
+
+_LENGTH = struct.Struct("<Q")
+
+
+class ReplicaStore:
+    """A memory-mapped (servers x replicas) float32 matrix of sweep results with metadata."""
+
+    def __init__(self, path, mode: str = "r"):
+        """creates the ReplicaStore object for an existing file, see create for new files.
+
+        :arg
+        path - the path of the store.
+        mode - "r" to read the matrix, "r+" to also write it.
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a replica store")
+            (header_length,) = _LENGTH.unpack(file.read(_LENGTH.size))
+            header = json.loads(file.read(header_length))
+
+        self.servers = np.array(header["servers"], dtype=int)
+        self.n_replicas = header["n_replicas"]
+        self.meta = header["meta"]
+        self.replicas = np.memmap(self.path, dtype=np.float32, mode=mode, offset=header["offset"],
+                                  shape=(len(self.servers), self.n_replicas))
+
+    @classmethod
+    def create(cls, path, servers, n_replicas: int, meta: dict = None):
+        """Creates a store with every result set to NaN and opens it for writing.
+
+        :arg
+        path - the path of the new store, its directory is created if missing.
+        servers - an iterable of numbers of servers, one row each.
+        n_replicas - the number of replicas, one column each.
+        meta - an optional JSON serialisable dictionary, e.g. the parameters of the sweep.
+
+        :return
+        a ReplicaStore opened in "r+" mode.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        servers = [int(k) for k in servers]
+
+        header = dict(servers=servers, n_replicas=int(n_replicas), meta=meta or {}, offset=0)
+        # the offset is part of the header, so grow it until the header fits in front of it
+        while True:
+            document = json.dumps(header).encode()
+            offset = -(-(len(MAGIC) + _LENGTH.size + len(document)) // DATA_ALIGNMENT) * DATA_ALIGNMENT
+            if offset == header["offset"]:
+                break
+            header["offset"] = offset
+
+        with open(path, "wb") as file:
+            file.write(MAGIC + _LENGTH.pack(len(document)) + document)
+            file.write(b" " * (offset - file.tell()))
+            file.truncate(offset + 4 * len(servers) * int(n_replicas))
+
+        replicas = np.memmap(path, dtype=np.float32, mode="r+", offset=offset, shape=(len(servers), n_replicas))
+        for rows in _row_chunks(len(servers), n_replicas):
+            replicas[rows] = np.nan
+        replicas.flush()
+        del replicas
+
+        return cls(path, mode="r+")
+
+    def write(self, row: int, values):
+        """Writes the results of the replicas of one number of servers, the row-th of the store."""
+        self.replicas[row] = values
+
+    def flush(self):
+        """Writes the changed rows to the file."""
+        self.replicas.flush()
+
+    def written(self):
+        """Checks which rows have been written completely, the results that were never written are NaN."""
+        return self._reduce(lambda block: ~np.isnan(block).any(axis=1))
+
+    def mean(self):
+        """Calculates the mean over the replicas of every row, block of rows by block of rows."""
+        return self._reduce(lambda block: block.mean(axis=1, dtype=np.float64))
+
+    def percentiles(self, q):
+        """Calculates percentiles over the replicas of every row, block of rows by block of rows.
+
+        :arg
+        q - a percentile or a sequence of percentiles between 0 and 100.
+
+        :return
+        an np.array with one row per number of servers and one column per percentile.
+        """
+        q = np.atleast_1d(q)
+        return self._reduce(lambda block: np.percentile(block, q, axis=1).T)
+
+    def _reduce(self, reduction):
+        """Applies a reduction to blocks of rows and concatenates the results, like reduction(self.replicas)."""
+        chunks = _row_chunks(*self.replicas.shape) or [slice(0, 0)]
+        return np.concatenate([reduction(self.replicas[rows]) for rows in chunks])
+
+
+def _row_chunks(n_rows, n_columns):
+    """Splits the rows into slices of at most CHUNK_BYTES of float32 values, with at least one row each."""
+    rows_per_chunk = max(1, CHUNK_BYTES // (4 * max(1, n_columns)))
+    return [slice(start, min(start + rows_per_chunk, n_rows)) for start in range(0, n_rows, rows_per_chunk)]
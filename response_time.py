@@ -1,23 +1,89 @@
+from __future__ import annotations
+
 from collections import namedtuple
+from typing import TYPE_CHECKING
 
 import numpy as np
 
+import instrument
 from fat_tree import FatTree
 
+if TYPE_CHECKING:
+    # only for annotations, the Jellyfish module pulls in scipy.sparse
+    from Jellyfish import Jellyfish
+
 TopologySimulation = namedtuple("TopologySimulation", "n_servers, tau_s, capacity_gbit, expected_job_time_s, "
                                                       "fixed_job_time_s, input_file_size_gb, output_file_size_gb, "
                                                       "overhead")
 
+JobRunningCost = namedtuple("JobRunningCost", "response_time_s, theta_s, cost")
+
+# raw replicas for a control variate fit, the controls are the maxima of the exponential execution times
+ControlledResponseTimes = namedtuple("ControlledResponseTimes", "response_times_s, controls_s, expected_controls_s")
+
+# maximum number of samples drawn at once by the batched simulators
+BLOCK_SIZE = 1 << 20
+
+# part of the sweep cache keys, increase it whenever the samplers draw different numbers for the same seed
+SAMPLER_VERSION = 3
+
+# the variance reduction schemes of the batched simulators, any combination of them can be used together
+VARIANCE_REDUCTIONS = ("antithetic", "stratified", "control")
+
+# the fewest replicas per point for which the simulators fit the control variate coefficient themselves, the fit
+# overfits smaller batches and their adjusted replicas understate the spread
+MIN_CONTROL_SIMS = 10
+
+# the largest uniform turned into an exponential sample, so that the inverse CDF stays finite
+_MAX_UNIFORM = 1 - 2 ** -53
 
 
 def simulate_fat_tree_response_time(sim: TopologySimulation, tree: FatTree):
-    """Simulates a response time for the Fat Tree topology."""
-    outbound_data_size_gb = sim.input_file_size_gb / sim.n_servers * sim.overhead
+    """Simulates a response time for the Fat Tree topology.
+
+    While instrumentation is enabled every step is a phase of its own. Otherwise the steps run without any hooks,
+    which would cost a noticeable share of the few microseconds of a call.
+    """
+    if instrument.enabled():
+        return _recorded_fat_tree_response_time(sim, tree)
 
+    tier_servers = _fat_tree_free_servers(sim, tree)
+    exec_times_s, return_sizes_gb = _fat_tree_draws(sim, tier_servers)
+    throughputs = _fat_tree_throughputs(tree, tier_servers)
+    return _fat_tree_max_time(_fat_tree_network_times(sim, exec_times_s, return_sizes_gb, throughputs))
+
+
+def _recorded_fat_tree_response_time(sim: TopologySimulation, tree: FatTree):
+    """Runs the steps of simulate_fat_tree_response_time as instrumentation phases."""
+    with instrument.phase("fat_tree.allocate"):
+        tier_servers = _fat_tree_free_servers(sim, tree)
+
+    with instrument.phase("fat_tree.draws"):
+        exec_times_s, return_sizes_gb = _fat_tree_draws(sim, tier_servers)
+    # the tiers can hold fewer servers than requested
+    instrument.count("fat_tree.samples", 2 * sum(tier_servers))
+
+    with instrument.phase("fat_tree.throughput"):
+        throughputs = _fat_tree_throughputs(tree, tier_servers)
+
+    with instrument.phase("fat_tree.network_times"):
+        response_times_s = _fat_tree_network_times(sim, exec_times_s, return_sizes_gb, throughputs)
+
+    with instrument.phase("fat_tree.max"):
+        return _fat_tree_max_time(response_times_s)
+
+
+def _fat_tree_free_servers(sim, tree):
     edge_servers = tree.get_n_free_edge_servers(sim.n_servers)
     pod_servers = tree.get_n_free_pod_servers(sim.n_servers)
     core_servers = tree.get_n_free_core_servers(sim.n_servers)
 
+    return edge_servers, pod_servers, core_servers
+
+
+def _fat_tree_draws(sim, tier_servers):
+    edge_servers, pod_servers, core_servers = tier_servers
+
     edge_exec_times_s = np.random.exponential(sim.expected_job_time_s / sim.n_servers, edge_servers) + sim.fixed_job_time_s
     pod_exec_times_s = np.random.exponential(sim.expected_job_time_s / sim.n_servers, pod_servers) + sim.fixed_job_time_s
     core_exec_times_s = np.random.exponential(sim.expected_job_time_s / sim.n_servers, core_servers) + sim.fixed_job_time_s
@@ -26,6 +92,13 @@ def simulate_fat_tree_response_time(sim: TopologySimulation, tree: FatTree):
     pod_return_size_gb = np.random.uniform(0, 2 * sim.output_file_size_gb / sim.n_servers, size=pod_servers) * sim.overhead
     core_return_size_gb = np.random.uniform(0, 2 * sim.output_file_size_gb / sim.n_servers, size=core_servers) * sim.overhead
 
+    return (edge_exec_times_s, pod_exec_times_s, core_exec_times_s), \
+        (edge_return_size_gb, pod_return_size_gb, core_return_size_gb)
+
+
+def _fat_tree_throughputs(tree, tier_servers):
+    edge_servers, pod_servers, core_servers = tier_servers
+
     edge_round_trip_time_s = 2 * tree.tau * 2
     pod_round_trip_time_s = 2 * tree.tau * 4
     core_round_trip_time_s = 2 * tree.tau * 6
@@ -38,20 +111,545 @@ def simulate_fat_tree_response_time(sim: TopologySimulation, tree: FatTree):
     pod_throughput = calc_avg_throughput(tree.capacity, pod_round_trip_time_s, network_throughput)
     core_throughput = calc_avg_throughput(tree.capacity, core_round_trip_time_s, network_throughput)
 
-    edge_outbound_time_s = outbound_data_size_gb / edge_throughput
-    pod_outbound_time_s = outbound_data_size_gb / pod_throughput
-    core_outbound_time_s = outbound_data_size_gb / core_throughput
+    return edge_throughput, pod_throughput, core_throughput
+
+
+def _fat_tree_network_times(sim, exec_times_s, return_sizes_gb, throughputs):
+    """Adds the outbound and return times of every tier to its execution times, in place."""
+    outbound_data_size_gb = sim.input_file_size_gb / sim.n_servers * sim.overhead
+    edge_exec_times_s, pod_exec_times_s, core_exec_times_s = exec_times_s
+    edge_return_size_gb, pod_return_size_gb, core_return_size_gb = return_sizes_gb
+    edge_throughput, pod_throughput, core_throughput = throughputs
+
+    edge_exec_times_s += edge_return_size_gb / edge_throughput + outbound_data_size_gb / edge_throughput
+    pod_exec_times_s += pod_return_size_gb / pod_throughput + outbound_data_size_gb / pod_throughput
+    core_exec_times_s += core_return_size_gb / core_throughput + outbound_data_size_gb / core_throughput
+
+    return exec_times_s
+
+
+def _fat_tree_max_time(response_times_s):
+    return np.max(np.hstack(response_times_s))
+
+
+def simulate_fat_tree_response_times(sim: TopologySimulation, tree: FatTree, servers, n_sims: int, rng=None,
+                                     variance_reduction=(), return_controls: bool = False):
+    """Simulates response times for the Fat Tree topology for many server counts and replicas at once.
+
+    The per-server execution times of every (server count, replica) pair are laid out as consecutive segments of one
+    flat array, so all samples of a block of server counts are drawn with a single call per distribution. Each sample
+    follows the same distribution as in simulate_fat_tree_response_time.
+
+    The replicas of every server count can be coupled to lower the variance of their mean:
+    antithetic - every odd replica mirrors the uniforms behind the replica before it, u to 1 - u.
+    stratified - the return sizes of every server are a Latin hypercube over the replicas, one per 1 / n_sims stratum.
+    control - the maximum of the exponential execution times, whose expectation is a harmonic number, is used as a
+    control variate, fitted on the n_sims >= MIN_CONTROL_SIMS replicas of every server count. The adjusted replicas
+    keep the mean, but they are neither samples of the response time nor independent, so neither their percentiles
+    nor their spread describe the response time. Use return_controls to fit the control variate elsewhere.
+
+    :arg
+    sim - a TopologySimulation, its n_servers field is ignored.
+    tree - the FatTree to simulate on.
+    servers - an iterable of numbers of servers.
+    n_sims - the number of replicas for each number of servers.
+    rng - an optional np.random.Generator.
+    variance_reduction - an iterable of names from VARIANCE_REDUCTIONS.
+    return_controls - whether to return the unadjusted replicas with their controls instead, see
+    control_variate_estimate.
+
+    :return
+    an np.array of shape (len(servers), n_sims) with the simulated response times in seconds, or a
+    ControlledResponseTimes namedtuple of two such np.arrays and the expected controls if return_controls is True.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    servers = np.asarray(servers, dtype=int)
+
+    counts, offsets, return_scales = fat_tree_tier_table(sim, tree, servers)
+    exec_scales = sim.expected_job_time_s / servers
+
+    return _sample_max_times(counts, exec_scales, offsets, return_scales, n_sims, rng,
+                             variance_reduction=variance_reduction, with_controls=return_controls)
+
+
+def simulate_fat_tree_job_running_costs(sim: TopologySimulation, tree: FatTree, n_sims: int, xi: float, rng=None):
+    """Simulates the job running cost response time + xi * theta for the Fat Tree topology.
+
+    The execution times of every replica are drawn once, and both the response time, their maximum after adding the
+    network times, and theta, the sum of the execution times of all servers, are derived from the same samples.
+
+    :arg
+    sim - a TopologySimulation.
+    tree - the FatTree to simulate on.
+    n_sims - the number of replicas.
+    xi - the weight of theta in the job running cost.
+    rng - an optional np.random.Generator.
+
+    :return
+    a JobRunningCost namedtuple of np.arrays with one value per replica.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+
+    counts, offsets, return_scales = fat_tree_tier_table(sim, tree, [sim.n_servers])
+    response_times, exec_sums = _sample_max_times(counts, np.array([sim.expected_job_time_s / sim.n_servers]),
+                                                  offsets, return_scales, n_sims, rng, with_exec_sums=True)
+    theta = exec_sums[0] + np.sum(counts) * sim.fixed_job_time_s
+
+    return JobRunningCost(response_times[0], theta, response_times[0] + xi * theta)
+
+
+def stream_fat_tree_response_time(sim: TopologySimulation, tree: FatTree, rng=None, block_size: int = BLOCK_SIZE):
+    """Simulates a response time for the Fat Tree topology with bounded memory.
+
+    The per-server samples are generated in blocks of block_size into reused buffers, so the peak memory does not
+    depend on the number of servers. Each sample follows the same distribution as in simulate_fat_tree_response_time.
+
+    :arg
+    sim - a TopologySimulation.
+    tree - the FatTree to simulate on.
+    rng - an optional np.random.Generator.
+    block_size - the number of samples generated at once.
+
+    :return
+    the simulated response time in seconds.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    counts, offsets, return_scales = _fat_tree_tier_parameters(sim, tree)
+    return _stream_max_time(counts, sim.expected_job_time_s / sim.n_servers, offsets, return_scales, rng,
+                            block_size)[0]
+
+
+def expected_fat_tree_response_time(sim: TopologySimulation, tree: FatTree):
+    """Calculates the expected response time for the Fat Tree topology without sampling.
+
+    The response time is the maximum over independent server times, so its CDF is the product of the per-server CDFs.
+    The expectation is the integral of one minus that CDF, which is evaluated with adaptive quadrature.
+
+    :arg
+    sim - a TopologySimulation.
+    tree - the FatTree to simulate on.
+
+    :return
+    the expected response time in seconds.
+    """
+    counts, offsets, return_scales = _fat_tree_tier_parameters(sim, tree)
+    return _expected_max_time(counts, sim.expected_job_time_s / sim.n_servers, offsets, return_scales)
+
+
+def _expected_max_time(counts, exec_scale, offsets, return_scales):
+    """Integrates the expected maximum of exp + offsets[t] + return_scales[t] * u over counts[t] servers per tier."""
+    from scipy.integrate import quad
+
+    counts, offsets, return_scales = (np.asarray(a)[np.asarray(counts) > 0] for a in (counts, offsets, return_scales))
+
+    def survival(x):
+        log_cdf = sum(m * np.log(_shifted_sum_cdf(x - s, exec_scale, a))
+                      for m, s, a in zip(counts, offsets, return_scales))
+        return -np.expm1(log_cdf)
+
+    start = np.min(offsets)
+    # beyond this point the survival function is smaller than machine precision
+    stop = np.max(offsets + return_scales) + exec_scale * (np.log(np.sum(counts)) + 40)
+    breakpoints = np.concatenate((offsets, offsets + return_scales))
+
+    with np.errstate(divide="ignore"), instrument.phase("quadrature"):
+        area, _ = quad(survival, start, stop, points=breakpoints[breakpoints < stop], limit=200)
+
+    return start + area
+
+
+def _shifted_sum_cdf(y, exec_scale, return_scale):
+    """CDF of exp + return_scale * u at y, where exp is exponential with mean exec_scale and u is standard uniform."""
+    if y <= 0:
+        return 0.0
+    if return_scale == 0:
+        return -np.expm1(-y / exec_scale)
+    if y <= return_scale:
+        return (y + exec_scale * np.expm1(-y / exec_scale)) / return_scale
+    return 1 - exec_scale / return_scale * (np.exp(-(y - return_scale) / exec_scale) - np.exp(-y / exec_scale))
+
+
+def simulate_jellyfish_response_time(sim: TopologySimulation, jellyfish: Jellyfish, rng=None):
+    """Simulates a response time for the Jellyfish topology.
+
+    The servers are grouped by their hop distance from the main server, and every group is sampled like a Fat Tree
+    tier. The hop histogram is cached by the Jellyfish, so repeated simulations do no graph work.
+
+    :arg
+    sim - a TopologySimulation.
+    jellyfish - a built Jellyfish.
+    rng - an optional np.random.Generator.
+
+    :return
+    the simulated response time in seconds.
+    """
+    return simulate_jellyfish_response_times(sim, jellyfish, [sim.n_servers], 1, rng)[0, 0]
+
+
+def simulate_jellyfish_response_times(sim: TopologySimulation, jellyfish: Jellyfish, servers, n_sims: int, rng=None,
+                                      variance_reduction=(), return_controls: bool = False):
+    """Simulates response times for the Jellyfish topology for many server counts and replicas at once.
+
+    :arg
+    sim - a TopologySimulation, its n_servers field is ignored.
+    jellyfish - a built Jellyfish.
+    servers - an iterable of numbers of servers.
+    n_sims - the number of replicas for each number of servers.
+    rng - an optional np.random.Generator.
+    variance_reduction - an iterable of names from VARIANCE_REDUCTIONS, see simulate_fat_tree_response_times.
+    return_controls - whether to return the unadjusted replicas with their controls instead.
+
+    :return
+    an np.array of shape (len(servers), n_sims) with the simulated response times in seconds, or a
+    ControlledResponseTimes namedtuple if return_controls is True.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    servers = np.asarray(servers, dtype=int)
+
+    counts, offsets, return_scales = _jellyfish_tier_table(sim, jellyfish, servers)
+    exec_scales = sim.expected_job_time_s / servers
+
+    return _sample_max_times(counts, exec_scales, offsets, return_scales, n_sims, rng,
+                             variance_reduction=variance_reduction, with_controls=return_controls)
+
+
+def expected_jellyfish_response_time(sim: TopologySimulation, jellyfish: Jellyfish):
+    """Calculates the expected response time for the Jellyfish topology without sampling.
+
+    :arg
+    sim - a TopologySimulation.
+    jellyfish - a built Jellyfish.
+
+    :return
+    the expected response time in seconds.
+    """
+    counts, offsets, return_scales = _jellyfish_tier_table(sim, jellyfish, [sim.n_servers])
+    return _expected_max_time(counts[0], sim.expected_job_time_s / sim.n_servers, offsets[0], return_scales[0])
+
+
+def _fat_tree_tier_parameters(sim: TopologySimulation, tree: FatTree):
+    """Calculates the number of servers and the network time terms for the edge, pod and core tiers.
+
+    The response time of a server in tier t is exp + offsets[t] + return_scales[t] * u, where exp is an exponential
+    execution time and u is a standard uniform return size.
+
+    :return
+    (counts, offsets, return_scales) - three np.arrays with one value per tier.
+    """
+    counts, offsets, return_scales = fat_tree_tier_table(sim, tree, [sim.n_servers])
+    return counts[0], offsets[0], return_scales[0]
+
+
+def fat_tree_tier_table(sim: TopologySimulation, tree: FatTree, servers):
+    """Calculates the number of servers and the network time terms of the edge, pod and core tiers.
+
+    The response time of a server in tier t is exp + offsets[t] + return_scales[t] * u, where exp is an exponential
+    execution time with mean sim.expected_job_time_s / n_servers and u is a standard uniform return size.
+
+    :arg
+    sim - a TopologySimulation, its n_servers field is ignored.
+    tree - the FatTree to simulate on.
+    servers - an iterable of numbers of servers.
+
+    :return
+    (counts, offsets, return_scales) - three np.arrays with one row per number of servers and one column per tier.
+    """
+    servers = np.asarray(servers)
+    with instrument.phase("fat_tree.tier_table"):
+        counts, _, throughputs = tree.tier_table(servers)
+
+        return (counts,) + _tier_time_terms(sim, servers, throughputs)
+
+
+def _jellyfish_tier_table(sim: TopologySimulation, jellyfish: Jellyfish, servers):
+    """Calculates the number of servers and the network time terms for every hop distance of a Jellyfish.
+
+    :return
+    (counts, offsets, return_scales) - three np.arrays with one row per number of servers and one column per hop count.
+    """
+    servers = np.asarray(servers)
+    with instrument.phase("jellyfish.tier_table"):
+        hops, counts = jellyfish.allocate(servers)
+        round_trip_times_s = calc_round_trip_time(jellyfish.tau, hops)
+
+        network_throughput = np.sum(counts / round_trip_times_s, axis=1, keepdims=True)
+        throughputs = calc_avg_throughput(jellyfish.capacity, round_trip_times_s, network_throughput)
+
+        return (counts,) + _tier_time_terms(sim, servers, throughputs)
+
+
+def _tier_time_terms(sim: TopologySimulation, servers, throughputs):
+    """Calculates the constant time terms and the maximum return times from the per-tier throughputs."""
+    outbound_data_size_gb = sim.input_file_size_gb / servers[:, None] * sim.overhead
+    max_return_size_gb = 2 * sim.output_file_size_gb / servers[:, None] * sim.overhead
+
+    offsets = sim.fixed_job_time_s + outbound_data_size_gb / throughputs
+    return_scales = max_return_size_gb / throughputs
+
+    return offsets, return_scales
+
+
+def _sample_max_times(counts, exec_scales, offsets, return_scales, n_sims, rng, block_size=BLOCK_SIZE,
+                      with_exec_sums=False, variance_reduction=(), with_controls=False):
+    """Samples the maximum response time over all servers for many points and replicas.
+
+    At most block_size samples are held in memory at once. Points are grouped into blocks, a point that does not fit
+    into one block is split over its replicas and a single replica that does not fit is streamed. The antithetic and
+    stratified schemes couple the replicas within a block, blocks of replicas start at even replicas to keep the
+    antithetic pairs together, and streamed replicas are sampled independently.
+
+    :arg
+    counts - an (n_points, n_tiers) array with the number of servers in each tier.
+    exec_scales - an (n_points,) array with the expected exponential execution time.
+    offsets - an (n_points, n_tiers) array with the constant time terms of each tier.
+    return_scales - an (n_points, n_tiers) array with the maximum return time of each tier.
+    n_sims - the number of replicas for each point.
+    rng - an np.random.Generator.
+    block_size - the maximum number of samples drawn at once.
+    with_exec_sums - whether to also return the sums of the exponential execution times of each replica, drawn from
+    the same samples as the maximum.
+    variance_reduction - an iterable of names from VARIANCE_REDUCTIONS.
+    with_controls - whether to return a ControlledResponseTimes namedtuple with the unadjusted maxima instead.
+
+    :return
+    an np.array of shape (n_points, n_sims), and a second one with the sums if with_exec_sums is True.
+    """
+    variance_reduction = frozenset(variance_reduction)
+    if not variance_reduction <= set(VARIANCE_REDUCTIONS):
+        raise ValueError(f"Unknown variance reduction {sorted(variance_reduction - set(VARIANCE_REDUCTIONS))}, "
+                         f"expected some of {VARIANCE_REDUCTIONS}.")
+    if "control" in variance_reduction and not with_controls and n_sims < MIN_CONTROL_SIMS:
+        raise ValueError(f"The control variate needs at least {MIN_CONTROL_SIMS} replicas per point, got {n_sims}, "
+                         f"fit smaller batches together with return_controls.")
+
+    n_points = len(counts)
+    lengths = counts.sum(axis=1)
+    if np.any(lengths == 0):
+        raise ValueError("Every point needs at least one server.")
+
+    max_times = np.zeros((n_points, n_sims))
+    exec_sums = np.zeros((n_points, n_sims))
+    exec_maxes = np.zeros((n_points, n_sims))
+    start = 0
+    while start < n_points:
+        # take as many points as fit into one block, but always at least one
+        n_samples = np.cumsum(lengths[start:] * n_sims)
+        stop = start + max(1, np.searchsorted(n_samples, block_size, side="right"))
+        block = slice(start, stop)
+
+        if n_samples[0] <= block_size:
+            max_times[block], exec_sums[block], exec_maxes[block] = _sample_block(
+                counts[block], exec_scales[block], offsets[block], return_scales[block], n_sims, rng,
+                variance_reduction)
+        elif lengths[start] <= block_size:
+            sims_per_block = block_size // lengths[start]
+            if "antithetic" in variance_reduction and sims_per_block > 1:
+                sims_per_block -= sims_per_block % 2
+            for sim_start in range(0, n_sims, sims_per_block):
+                sim_block = slice(sim_start, min(sim_start + sims_per_block, n_sims))
+                sampled = _sample_block(counts[block], exec_scales[block], offsets[block], return_scales[block],
+                                        sim_block.stop - sim_block.start, rng, variance_reduction)
+                for results, block_results in zip((max_times, exec_sums, exec_maxes), sampled):
+                    results[start, sim_block] = block_results[0]
+        else:
+            for i in range(n_sims):
+                max_times[start, i], exec_sums[start, i], exec_maxes[start, i] = _stream_max_time(
+                    counts[start], exec_scales[start], offsets[start], return_scales[start], rng, block_size)
+
+        start = stop
+
+    expected_exec_maxes = exec_scales * harmonic_number(lengths)
+    if with_controls:
+        return ControlledResponseTimes(max_times, exec_maxes, expected_exec_maxes)
+    if "control" in variance_reduction:
+        max_times = _control_variate(max_times, exec_maxes, expected_exec_maxes)
+
+    if with_exec_sums:
+        return max_times, exec_sums
+    return max_times
+
+
+def _sample_block(counts, exec_scales, offsets, return_scales, n_sims, rng, variance_reduction=frozenset()):
+    """Samples the maximum response times, execution time sums and execution time maxima of a block of points.
+
+    The samples are laid out in one flat array of per-server segments, one segment per point and replica.
+    """
+    n_points, n_tiers = counts.shape
+    shape = (n_points, n_sims, n_tiers)
+
+    repeats = np.broadcast_to(counts[:, None, :], shape).ravel()
+    scale = np.repeat(np.broadcast_to(exec_scales[:, None, None], shape).ravel(), repeats)
+    offset = np.repeat(np.broadcast_to(offsets[:, None, :], shape).ravel(), repeats)
+    return_scale = np.repeat(np.broadcast_to(return_scales[:, None, :], shape).ravel(), repeats)
+
+    segment_lengths = np.repeat(counts.sum(axis=1), n_sims)
+    segment_starts = np.concatenate(([0], np.cumsum(segment_lengths)[:-1]))
+
+    instrument.count("sample.samples", len(scale))
+    with instrument.phase("sample.draws"):
+        if variance_reduction & {"antithetic", "stratified"}:
+            times, return_times = _coupled_draws(counts.sum(axis=1), n_sims, rng, variance_reduction)
+        else:
+            times = rng.standard_exponential(len(scale))
+            return_times = rng.random(len(scale))
+        times *= scale
+
+    with instrument.phase("sample.reduce"):
+        exec_sums = np.add.reduceat(times, segment_starts).reshape(shape[:2])
+        exec_maxes = np.maximum.reduceat(times, segment_starts).reshape(shape[:2])
+        times += offset
+        times += return_times * return_scale
+
+        return np.maximum.reduceat(times, segment_starts).reshape(shape[:2]), exec_sums, exec_maxes
+
+
+def _coupled_draws(lengths, n_sims, rng, variance_reduction):
+    """Draws standard exponential execution times and uniform return sizes that are coupled over the replicas.
+
+    :arg
+    lengths - an np.array with the number of servers of every point.
+    n_sims - the number of replicas of every point.
+    rng - an np.random.Generator.
+    variance_reduction - a set of names from VARIANCE_REDUCTIONS.
+
+    :return
+    (times, return_times) - two flat np.arrays in the layout of _sample_block.
+    """
+    antithetic = "antithetic" in variance_reduction
+    stratified = "stratified" in variance_reduction
+
+    times, return_times = [], []
+    for length in lengths:
+        uniforms = _replica_uniforms(n_sims, length, rng, antithetic, stratified=False)
+        times.append(-np.log1p(-np.minimum(uniforms, _MAX_UNIFORM, out=uniforms), out=uniforms).ravel())
+        return_times.append(_replica_uniforms(n_sims, length, rng, antithetic, stratified).ravel())
+
+    return np.concatenate(times), np.concatenate(return_times)
+
+
+def _replica_uniforms(n_sims, length, rng, antithetic, stratified):
+    """Draws an (n_sims, length) np.array of uniforms, each column coupled over the replicas.
+
+    Every single value is standard uniform and the values of one replica are independent, so each replica keeps the
+    distribution of independent sampling. With antithetic every odd replica mirrors the even replica before it, so
+    consecutive blocks of an even number of replicas keep their pairs, and with stratified the values of every column
+    fall into different strata of the independently drawn replicas.
+    """
+    n_drawn = n_sims - n_sims // 2 if antithetic else n_sims
+    drawn = rng.random((n_drawn, length))
+
+    if stratified:
+        strata = rng.permuted(np.broadcast_to(np.arange(n_drawn)[:, None], drawn.shape), axis=0)
+        drawn += strata
+        drawn /= n_drawn
+
+    if not antithetic:
+        return drawn
+
+    uniforms = np.empty((n_sims, length))
+    uniforms[0::2] = drawn
+    uniforms[1::2] = 1 - drawn[:n_sims // 2]
+    return uniforms
+
+
+def control_variate_estimate(response_times, controls, expected_controls):
+    """Estimates the expected response times with a control variate fitted on all replicas of every point.
+
+    The response times are regressed on the controls, and the estimate is the regression line at the expected
+    control. Its standard error uses the residual variance with n - 2 degrees of freedom and includes the uncertainty
+    of the fitted slope.
+
+    :arg
+    response_times - an (n_points, n) np.array of independent, unadjusted replicas, e.g. of a ControlledResponseTimes.
+    controls - an (n_points, n) np.array with the control of every replica.
+    expected_controls - an (n_points,) np.array with the expected control of every point.
+
+    :return
+    (means, standard_errors) - two np.arrays with one value per point.
+    """
+    response_times, controls = np.atleast_2d(response_times), np.atleast_2d(controls)
+    n = response_times.shape[1]
+    if n < 3:
+        raise ValueError(f"The control variate fit needs at least 3 replicas per point, got {n}.")
+
+    betas, centred_controls, control_variances = _control_coefficients(response_times, controls)
+    control_means = controls.mean(axis=1)
+    means = response_times.mean(axis=1) - betas * (control_means - expected_controls)
+
+    residuals = response_times - response_times.mean(axis=1, keepdims=True) - betas[:, None] * centred_controls
+    residual_variances = np.sum(residuals ** 2, axis=1) / (n - 2)
+    leverages = np.divide((control_means - expected_controls) ** 2, control_variances,
+                          out=np.zeros_like(control_variances), where=control_variances > 0)
+
+    return means, np.sqrt(residual_variances * (1 / n + leverages))
+
+
+def _control_variate(max_times, exec_maxes, expected_exec_maxes):
+    """Adjusts the maximum response times with the maximum execution times as a control variate.
+
+    The coefficient of every point is the regression slope of its replicas, beta = cov(max, control) / var(control),
+    and every replica is shifted by beta times the deviation of its control from the expectation.
+    """
+    betas, _, _ = _control_coefficients(max_times, exec_maxes)
+    return max_times - betas[:, None] * (exec_maxes - expected_exec_maxes[:, None])
+
+
+def _control_coefficients(response_times, controls):
+    """Fits the regression slopes of the response times on the controls of every point.
+
+    :return
+    (betas, centred_controls, control_variances) - the slopes, the controls minus their means and the sums of their
+    squares.
+    """
+    centred = controls - controls.mean(axis=1, keepdims=True)
+    variances = np.sum(centred ** 2, axis=1)
+    covariances = np.sum(centred * (response_times - response_times.mean(axis=1, keepdims=True)), axis=1)
+    # with a single replica there is nothing to regress on
+    betas = np.divide(covariances, variances, out=np.zeros_like(variances), where=variances > 0)
+
+    return betas, centred, variances
+
+
+def harmonic_number(n):
+    """Calculates the n-th harmonic number, the expected maximum of n independent standard exponentials."""
+    from scipy.special import digamma
+
+    return digamma(np.asarray(n) + 1) + np.euler_gamma
+
+
+def _stream_max_time(counts, exec_scale, offsets, return_scales, rng, block_size=BLOCK_SIZE):
+    """Samples one maximum response time in fixed size blocks, keeping only a running maximum.
+
+    Two buffers of at most block_size samples are allocated once and refilled in place for every block.
+
+    :return
+    (max_time, exec_sum, exec_max) - the maximum response time and the sum and maximum of the exponential execution
+    times.
+    """
+    buffer_size = min(block_size, np.max(counts))
+    times = np.empty(buffer_size)
+    return_times = np.empty(buffer_size)
 
-    edge_return_times_s = edge_return_size_gb / edge_throughput
-    edge_exec_times_s += edge_return_times_s + edge_outbound_time_s
+    max_time = -np.inf
+    exec_sum = 0.0
+    exec_max = 0.0
+    for n_servers, offset, return_scale in zip(counts, offsets, return_scales):
+        for start in range(0, n_servers, block_size):
+            size = min(block_size, n_servers - start)
+            block_times, block_return_times = times[:size], return_times[:size]
 
-    pod_return_time_s = pod_return_size_gb / pod_throughput
-    pod_exec_times_s += pod_return_time_s + pod_outbound_time_s
+            rng.standard_exponential(out=block_times)
+            block_times *= exec_scale
+            exec_sum += block_times.sum()
+            exec_max = max(exec_max, block_times.max())
+            rng.random(out=block_return_times)
+            block_return_times *= return_scale
+            block_times += block_return_times
 
-    rest_return_time_s = core_return_size_gb / core_throughput
-    core_exec_times_s += rest_return_time_s + core_outbound_time_s
+            # the offset is constant within a tier, so it is added to the block maximum only
+            max_time = max(max_time, block_times.max() + offset)
 
-    return np.max(np.hstack((edge_exec_times_s, pod_exec_times_s, core_exec_times_s)))
+    return max_time, exec_sum, exec_max
 
 
 def calc_round_trip_time(tau, n_hops):
@@ -0,0 +1,192 @@
+"""Module for simulating the Fat Tree response time over a grid of scenarios at once.
+
+The scenarios of a grid only change the scale and the constant terms of the per-server times
+exec_scale * E + offset + return_scale * U, so one set of standard exponential and uniform draws serves every scenario.
+Within a tier the maximum only depends on the ratio return_scale / exec_scale, which is computed once for every
+distinct ratio and rescaled per scenario.
+"""
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import fat_tree
+from response_time import BLOCK_SIZE, fat_tree_tier_table, TopologySimulation
+
+# relative tolerance under which two ratios of a tier share their sampled maximum
+RATIO_TOLERANCE = 1e-12
+
+
+def scenario_sims(sim: TopologySimulation, grid):
+    """Expands a grid of field values into one TopologySimulation per scenario.
+
+    :arg
+    sim - the TopologySimulation with the values of the fields that are not in the grid.
+    grid - a dictionary from TopologySimulation field names, except n_servers, to sequences of values.
+
+    :return
+    a list of TopologySimulation namedtuples, the product of the grid values in the order of the grid.
+    """
+    unknown = set(grid).difference(TopologySimulation._fields)
+    if unknown:
+        raise ValueError(f"unknown TopologySimulation fields {sorted(unknown)}")
+    if "n_servers" in grid:
+        raise ValueError("the numbers of servers are passed separately from the grid")
+
+    return [sim._replace(**dict(zip(grid, values))) for values in itertools.product(*grid.values())]
+
+
+def simulate_scenario_grid(sim: TopologySimulation, n, grid, servers, n_sims: int, xi: float = 0.0, rng=None,
+                           block_size: int = BLOCK_SIZE):
+    """Simulates the Fat Tree response time and job running cost for every scenario of a grid and number of servers.
+
+    :arg
+    sim - a TopologySimulation with the values of the fields that are not in the grid, its n_servers is ignored.
+    n - the number of ports of the Fat Tree switches.
+    grid - a dictionary from TopologySimulation field names, except n_servers, to sequences of values.
+    servers - an iterable of numbers of servers.
+    n_sims - the number of replicas, shared by all scenarios of a number of servers.
+    xi - the weight of theta in the job running cost.
+    rng - an optional np.random.Generator.
+    block_size - the maximum number of samples held in memory at once.
+
+    :return
+    a pd.DataFrame with one row per number of servers and scenario, the grid fields and the mean response time, theta
+    and job running cost.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    scenarios = scenario_sims(sim, grid)
+    trees = {}
+    frames = []
+
+    for n_servers in servers:
+        n_servers = int(n_servers)
+        tables = []
+        for scenario in scenarios:
+            key = (scenario.tau_s, scenario.capacity_gbit)
+            if key not in trees:
+                trees[key] = fat_tree.FatTree(n, scenario.tau_s, scenario.capacity_gbit)
+            tables.append(fat_tree_tier_table(scenario._replace(n_servers=n_servers), trees[key], [n_servers]))
+
+        counts = tables[0][0][0]
+        offsets = np.array([table[1][0] for table in tables])
+        return_scales = np.array([table[2][0] for table in tables])
+        exec_scales = np.array([scenario.expected_job_time_s for scenario in scenarios]) / n_servers
+        fixed_times = np.array([scenario.fixed_job_time_s for scenario in scenarios])
+
+        response_times, exec_sums = _sample_shared_max_times(counts, exec_scales, offsets, return_scales, n_sims,
+                                                             rng, block_size)
+        theta = exec_sums + (np.sum(counts) * fixed_times)[:, None]
+
+        frame = pd.DataFrame({field: [getattr(scenario, field) for scenario in scenarios] for field in grid})
+        frame.insert(0, "n_servers", n_servers)
+        frame["response_time_s"] = response_times.mean(axis=1)
+        frame["theta_s"] = theta.mean(axis=1)
+        frame["cost"] = frame["response_time_s"] + xi * frame["theta_s"]
+        frames.append(frame)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def _sample_shared_max_times(counts, exec_scales, offsets, return_scales, n_sims, rng, block_size=BLOCK_SIZE):
+    """Samples the maximum response time of many scenarios with the same number of servers from shared draws.
+
+    :arg
+    counts - an (n_tiers,) array with the number of servers in each tier, the same for every scenario.
+    exec_scales - an (n_scenarios,) array with the expected exponential execution time.
+    offsets - an (n_scenarios, n_tiers) array with the constant time terms of each tier.
+    return_scales - an (n_scenarios, n_tiers) array with the maximum return time of each tier.
+    n_sims - the number of replicas.
+    rng - an np.random.Generator.
+    block_size - the maximum number of samples held in memory at once.
+
+    :return
+    (max_times, exec_sums) - two np.arrays of shape (n_scenarios, n_sims) with the maximum response time and the sum
+    of the execution times of every scenario and replica.
+    """
+    n_scenarios, n_tiers = offsets.shape
+    ratios = return_scales / exec_scales[:, None]
+    groups = [_group_within(ratios[:, tier], RATIO_TOLERANCE) for tier in range(n_tiers)]
+
+    max_times = np.full((n_scenarios, n_sims), -np.inf)
+    exec_sums = np.zeros((n_scenarios, n_sims))
+    rows = max(1, block_size // max(1, int(np.sum(counts))))
+
+    for start in range(0, n_sims, rows):
+        replicas = slice(start, min(n_sims, start + rows))
+        n_rows = replicas.stop - replicas.start
+        block_sum = np.zeros(n_rows)
+
+        for tier, count in enumerate(counts):
+            if count == 0:
+                continue
+            exec_times = rng.standard_exponential((n_rows, count))
+            return_times = rng.random((n_rows, count))
+            block_sum += exec_times.sum(axis=1)
+
+            representatives, inverse = groups[tier]
+            tier_max = _max_over_ratios(exec_times, return_times, representatives, block_size)
+            tier_times = exec_scales[:, None] * tier_max[inverse] + offsets[:, tier, None]
+            np.maximum(max_times[:, replicas], tier_times, out=max_times[:, replicas])
+
+        exec_sums[:, replicas] = exec_scales[:, None] * block_sum
+
+    return max_times, exec_sums
+
+
+def _max_over_ratios(exec_times, return_times, ratios, block_size=BLOCK_SIZE):
+    """Calculates the row maxima of exec_times + ratio * return_times for every ratio, in chunks of ratios."""
+    n_rows, count = exec_times.shape
+    maxima = np.empty((len(ratios), n_rows))
+    chunk = max(1, block_size // (n_rows * count))
+
+    for start in range(0, len(ratios), chunk):
+        block = slice(start, start + chunk)
+        times = ratios[block, None, None] * return_times
+        times += exec_times
+        maxima[block] = times.max(axis=2)
+
+    return maxima
+
+
+def _group_within(values, rtol):
+    """Groups values that are equal within a relative tolerance.
+
+    :return
+    (representatives, inverse) - the first sorted value of every group and the group index of every value.
+    """
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    starts = np.concatenate(([True], np.diff(ordered) > rtol * np.abs(ordered[1:])))
+    group_ids = np.cumsum(starts) - 1
+
+    inverse = np.empty(len(values), dtype=int)
+    inverse[order] = group_ids
+
+    return ordered[starts], inverse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulates the Fat Tree response time over a grid of scenarios.")
+    parser.add_argument("--tau", type=float, nargs="+", default=[0.000005], help="the trip times in seconds.")
+    parser.add_argument("--capacity", type=float, nargs="+", default=[10], help="the link capacities in Gbit/s.")
+    parser.add_argument("--input-size", type=float, nargs="+", default=[4000], help="the input file sizes in GB.")
+    parser.add_argument("--output-size", type=float, nargs="+", default=[4000], help="the output file sizes in GB.")
+    parser.add_argument("--overhead", type=float, nargs="+", default=[1 + 48 / 1500], help="the protocol overheads.")
+    parser.add_argument("--servers", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="the numbers of servers.")
+    parser.add_argument("--n-sims", type=int, default=1000, help="the number of replicas of every scenario.")
+    parser.add_argument("--xi", type=float, default=0.1, help="the weight of theta in the job running cost.")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the draws.")
+    parser.add_argument("--output", default="scenarios.csv", help="the CSV file for the results.")
+    args = parser.parse_args()
+
+    sim = TopologySimulation(None, None, None, 8 * 3600, 30, None, None, None)
+    grid = dict(tau_s=args.tau, capacity_gbit=args.capacity, input_file_size_gb=args.input_size,
+                output_file_size_gb=args.output_size, overhead=args.overhead)
+
+    results = simulate_scenario_grid(sim, 64, grid, args.servers, args.n_sims, args.xi,
+                                     np.random.default_rng(args.seed))
+    results.to_csv(args.output, index=False)
+    print(results.to_string(index=False))
@@ -0,0 +1,212 @@
+"""Module for running simulations over many numbers of servers in parallel.
+
+Every sweep point gets its own random stream derived from the sweep seed and the point's number of servers, so the
+results do not depend on the number of workers or on the order in which the points finish. Cached sweeps draw the
+replicas of a point in fixed size chunks with one stream each, so a cached sweep that is extended by more replicas
+gives the same results as a fresh sweep.
+"""
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+import instrument
+from response_time import control_variate_estimate, ControlledResponseTimes, SAMPLER_VERSION, \
+    simulate_fat_tree_response_times, simulate_jellyfish_response_times
+
+# the number of replicas of a sweep point drawn from one random stream by run_cached_sweep
+REPLICA_CHUNK = 16
+
+
+def run_sweep(simulate, sims, workers: int = 1, seed=None, progress: bool = True, store=None):
+    """Runs a simulation function for every sweep point.
+
+    :arg
+    simulate - a picklable function simulate(sim, rng) returning the result of a single point.
+    sims - an iterable of TopologySimulation namedtuples, one per sweep point.
+    workers - the number of worker processes, 1 runs the sweep in the current process.
+    seed - an optional seed for the sweep, the same seed gives the same results for any number of workers.
+    progress - whether to show a progress bar.
+    store - an optional replica_store.ReplicaStore with one row per sweep point, or any object with its write, flush
+    and replicas, the results are written into it as they arrive instead of being collected.
+
+    :return
+    a list with the result of every sweep point, in the order of sims, or the memory-mapped results of the store.
+    """
+    from tqdm import tqdm
+
+    sims = list(sims)
+    seeds = point_seeds(sims, seed)
+    collect = _StoreWriter(store) if store is not None else []
+
+    if workers == 1:
+        for sim, point_seed in tqdm(zip(sims, seeds), total=len(sims), disable=not progress):
+            collect.append(_run_point(simulate, sim, point_seed))
+        return _collected(collect)
+
+    chunksize = max(1, len(sims) // (workers * 16))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if not instrument.enabled():
+            for result in tqdm(executor.map(_run_point, repeat(simulate), sims, seeds, chunksize=chunksize),
+                               total=len(sims), disable=not progress):
+                collect.append(result)
+            return _collected(collect)
+
+        # the workers record their phases themselves and send them back with the results
+        recorded = executor.map(_run_recorded_point, repeat(simulate), sims, seeds, chunksize=chunksize)
+        for result, events, counters in tqdm(recorded, total=len(sims), disable=not progress):
+            instrument.merge(events, counters)
+            collect.append(result)
+        return _collected(collect)
+
+
+def run_cached_sweep(simulate, sim, servers, n_sims: int, cache=None, params=None, workers: int = 1, seed=None,
+                     store=None):
+    """Runs a sweep of per-replica results, reusing and extending cached results.
+
+    The replicas of every point are simulated in chunks of REPLICA_CHUNK from the streams of chunk_seeds, and the
+    requested ones are cut out of the chunks, so any split of the replicas between runs gives the same results. Only
+    seeded sweeps are cached, an unseeded sweep is meant to give new results on every run.
+
+    :arg
+    simulate - a picklable function simulate(sim, rng, n_sims) returning an np.array with n_sims replica results, or
+    n_sims rows of several values per replica, like fat_tree_response_times with the control scheme.
+    sim - a TopologySimulation, its n_servers field is ignored.
+    servers - an iterable of numbers of servers.
+    n_sims - the number of replicas for each number of servers.
+    cache - an optional sweep_cache.SweepCache.
+    params - a JSON serialisable dictionary of the parameters of simulate that are not in sim, e.g. of the topology.
+    workers - the number of worker processes.
+    seed - an optional seed for the sweep.
+    store - an optional replica_store.ReplicaStore with one row per number of servers and n_sims replicas, which
+    receives the results.
+
+    :return
+    an np.array of shape (len(servers), n_sims) and the further dimensions of simulate, the memory-mapped results of
+    the store if store is given.
+    """
+    def compute(points, replica_offset, n_replicas, store=None):
+        sims = [sim._replace(n_servers=int(k)) for k in points]
+        point = functools.partial(_replica_range, simulate, replica_offset=replica_offset, n_replicas=n_replicas)
+        return np.asarray(run_sweep(point, sims, workers, seed, store=store))
+
+    if cache is None or seed is None:
+        return compute(servers, 0, n_sims, store)
+
+    sim_params = sim._asdict()
+    del sim_params["n_servers"]
+    name = getattr(simulate, "func", simulate).__name__
+    key = dict(params or {}, simulate=name, sim=sim_params, seed=seed, sampler_version=SAMPLER_VERSION)
+
+    return cache.get(key, servers, n_sims, compute, store)
+
+
+def point_seeds(sims, seed=None):
+    """Derives an independent np.random.SeedSequence for every sweep point.
+
+    :arg
+    sims - an iterable of TopologySimulation namedtuples.
+    seed - an optional seed for the sweep.
+
+    :return
+    a list of np.random.SeedSequence, keyed by the number of servers of each point.
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    return [np.random.SeedSequence(entropy, spawn_key=(int(sim.n_servers),)) for sim in sims]
+
+
+def chunk_seeds(point_seed, chunks):
+    """Derives an independent np.random.SeedSequence for every replica chunk of a sweep point.
+
+    :arg
+    point_seed - the np.random.SeedSequence of the point, see point_seeds.
+    chunks - an iterable of chunk indices, chunk c holds the replicas c * REPLICA_CHUNK to (c + 1) * REPLICA_CHUNK - 1.
+
+    :return
+    a list of np.random.SeedSequence, keyed by the number of servers of the point and the chunk index.
+    """
+    return [np.random.SeedSequence(point_seed.entropy, spawn_key=point_seed.spawn_key + (chunk,)) for chunk in chunks]
+
+
+def fat_tree_response_times(sim, rng, tree, n_sims, variance_reduction=()):
+    """Simulates n_sims response times of a single sweep point, for use with functools.partial and run_sweep.
+
+    With the control scheme every replica is returned unadjusted together with the deviation of its control from the
+    expectation, as an (n_sims, 2) np.array, so that replica_means fits the control variate on all replicas of the
+    point, however many runs they were computed in.
+    """
+    return _with_controls(simulate_fat_tree_response_times(sim, tree, [sim.n_servers], n_sims, rng,
+                                                           variance_reduction, "control" in variance_reduction))
+
+
+def jellyfish_response_times(sim, rng, jellyfish, n_sims, variance_reduction=()):
+    """Simulates n_sims Jellyfish response times of a single sweep point like fat_tree_response_times."""
+    return _with_controls(simulate_jellyfish_response_times(sim, jellyfish, [sim.n_servers], n_sims, rng,
+                                                            variance_reduction, "control" in variance_reduction))
+
+
+def replica_means(replicas):
+    """Estimates the expected result of every sweep point from its replicas.
+
+    :arg
+    replicas - an (n_points, n_sims) np.array of replicas, or an (n_points, n_sims, 2) np.array of replicas and the
+    deviations of their controls from the expectation, as returned by fat_tree_response_times with the control scheme.
+
+    :return
+    an np.array with the mean of every point, with the control variate fitted on all its replicas if there are controls.
+    """
+    replicas = np.asarray(replicas)
+    if replicas.ndim == 2:
+        return replicas.mean(axis=1)
+
+    means, _ = control_variate_estimate(replicas[..., 0], replicas[..., 1], np.zeros(len(replicas)))
+    return means
+
+
+def _with_controls(results):
+    """Stacks the replicas of the single point of a ControlledResponseTimes with their control deviations."""
+    if not isinstance(results, ControlledResponseTimes):
+        return results[0]
+
+    response_times_s, controls_s, expected_controls_s = results
+    return np.column_stack((response_times_s[0], controls_s[0] - expected_controls_s[0]))
+
+
+def _replica_range(simulate, sim, rng, replica_offset, n_replicas):
+    """Simulates the replicas replica_offset to replica_offset + n_replicas - 1 of a sweep point in whole chunks."""
+    first_chunk, stop_chunk = replica_offset // REPLICA_CHUNK, -(-(replica_offset + n_replicas) // REPLICA_CHUNK)
+    chunks = [simulate(sim, np.random.default_rng(seed), n_sims=REPLICA_CHUNK)
+              for seed in chunk_seeds(rng.bit_generator.seed_seq, range(first_chunk, stop_chunk))]
+
+    start = replica_offset - first_chunk * REPLICA_CHUNK
+    return np.concatenate(chunks)[start:start + n_replicas]
+
+
+class _StoreWriter:
+    """Writes the results of consecutive sweep points into consecutive rows of a ReplicaStore."""
+
+    def __init__(self, store):
+        """creates the _StoreWriter object."""
+        self.store = store
+        self.row = 0
+
+    def append(self, result):
+        self.store.write(self.row, result)
+        self.row += 1
+
+
+def _collected(collect):
+    if isinstance(collect, _StoreWriter):
+        collect.store.flush()
+        return collect.store.replicas
+    return collect
+
+
+def _run_point(simulate, sim, seed):
+    with instrument.point(int(sim.n_servers)), instrument.phase("sweep.point"):
+        return simulate(sim, np.random.default_rng(seed))
+
+
+def _run_recorded_point(simulate, sim, seed):
+    return instrument.run_recorded(_run_point, simulate, sim, seed)
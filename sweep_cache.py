@@ -0,0 +1,187 @@
+"""Module for caching sweep results on disk.
+
+Every cache entry is a directory named after a hash of the parameters that determine the results, e.g. the
+TopologySimulation fields, the topology parameters, the method and the seed. It holds the simulated numbers of
+servers and a (servers x replicas) matrix of results as .npy files, which are loaded memory-mapped. Requests for more
+numbers of servers or more replicas than stored only compute the missing cells. The least recently used entries are
+evicted once the cache grows beyond its size limit.
+
+With a replica_store.ReplicaStore as the destination, the extended matrix is built in a memory-mapped file and
+computed, cached and returned results move between the files row by row, so a sweep never holds its results in memory.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+
+class SweepCache:
+    """An on-disk cache of sweep results."""
+
+    def __init__(self, directory, max_bytes: int = 1 << 30):
+        """creates the SweepCache object.
+
+        :arg
+        directory - the directory of the cache, created if missing.
+        max_bytes - the maximum total size of the cached results.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, params: dict, servers, n_sims: int, compute, store=None):
+        """Looks up the results of a sweep, computing and storing the missing ones.
+
+        :arg
+        params - a JSON serialisable dictionary of all parameters that determine the results.
+        servers - an iterable of numbers of servers.
+        n_sims - the number of replicas for each number of servers.
+        compute - a function compute(servers, replica_offset, n_replicas) returning an np.array of shape
+        (len(servers), n_replicas) with the results of replicas replica_offset to replica_offset + n_replicas - 1.
+        Without a store a replica can also have several values, in further dimensions of the array.
+        With a store it is called as compute(servers, replica_offset, n_replicas, out) and writes the i-th row of its
+        results with out.write(i, values) instead, like sweep.run_sweep into a ReplicaStore.
+        store - an optional replica_store.ReplicaStore with one row per number of servers and n_sims replicas, which
+        receives the results.
+
+        :return
+        an np.array of shape (len(servers), n_sims) and the further dimensions of compute, the memory-mapped results
+        of the store if store is given.
+        """
+        servers = np.asarray(servers, dtype=int)
+        entry = self.directory / cache_key(params)
+        stored_servers, results = self._load(entry)
+
+        missing_servers = np.setdiff1d(servers, stored_servers)
+        if store is not None and (len(missing_servers) > 0 or results.shape[1] < n_sims):
+            stored_servers, results = self._extend_on_disk(entry, params, stored_servers, results, missing_servers,
+                                                           n_sims, compute)
+        elif len(missing_servers) > 0 or results.shape[1] < n_sims:
+            stored_sims = results.shape[1]
+            n_total_sims = max(stored_sims, n_sims)
+
+            blocks = []
+            if len(stored_servers) > 0:
+                blocks.append(np.asarray(results))
+                if n_total_sims > stored_sims:
+                    blocks[0] = np.concatenate((blocks[0], compute(stored_servers, stored_sims,
+                                                                   n_total_sims - stored_sims)), axis=1)
+
+            if len(missing_servers) > 0:
+                blocks.append(compute(missing_servers, 0, n_total_sims))
+                stored_servers = np.concatenate((stored_servers, missing_servers))
+
+            extended = np.concatenate(blocks)
+            order = np.argsort(stored_servers)
+            self._save(entry, params, stored_servers[order], extended[order])
+            self._evict(keep=entry)
+            stored_servers, results = self._load(entry)
+
+        os.utime(entry)
+        rows = np.searchsorted(stored_servers, servers)
+        if store is None:
+            return np.asarray(results[rows, :n_sims])
+
+        for row, stored_row in enumerate(rows):
+            store.write(row, results[stored_row, :n_sims])
+        store.flush()
+        return store.replicas
+
+    def _extend_on_disk(self, entry, params, stored_servers, results, missing_servers, n_sims, compute):
+        """Extends an entry like get, building the extended matrix in a memory-mapped file one row at a time."""
+        stored_sims = results.shape[1]
+        n_total_sims = max(stored_sims, n_sims)
+        all_servers = np.union1d(stored_servers, missing_servers)
+        stored_rows = np.searchsorted(all_servers, stored_servers)
+
+        entry.mkdir(exist_ok=True)
+        extended = np.lib.format.open_memmap(entry / "results.tmp.npy", mode="w+",
+                                             shape=(len(all_servers), n_total_sims))
+        for row, stored_row in zip(stored_rows, results):
+            extended[row, :stored_sims] = stored_row
+
+        if n_total_sims > stored_sims and len(stored_servers) > 0:
+            compute(stored_servers, stored_sims, n_total_sims - stored_sims,
+                    _RowWriter(extended, stored_rows, slice(stored_sims, None)))
+        if len(missing_servers) > 0:
+            compute(missing_servers, 0, n_total_sims,
+                    _RowWriter(extended, np.searchsorted(all_servers, missing_servers), slice(None)))
+
+        extended.flush()
+        del extended
+        self._save(entry, params, all_servers)
+        self._evict(keep=entry)
+        return self._load(entry)
+
+    def size(self):
+        """Calculates the total size of the cached results in bytes."""
+        return sum(_entry_size(entry) for entry in self._entries())
+
+    def _load(self, entry):
+        if not (entry / "results.npy").exists():
+            return np.array([], dtype=int), np.zeros((0, 0))
+        return np.load(entry / "servers.npy"), np.load(entry / "results.npy", mmap_mode="r")
+
+    def _save(self, entry, params, servers, results=None):
+        """Saves an entry, without results they have already been written to results.tmp.npy."""
+        entry.mkdir(exist_ok=True)
+        # write to temporary files first, so an interrupted save never leaves a corrupt entry
+        np.save(entry / "servers.tmp.npy", servers)
+        if results is not None:
+            np.save(entry / "results.tmp.npy", results)
+        os.replace(entry / "servers.tmp.npy", entry / "servers.npy")
+        os.replace(entry / "results.tmp.npy", entry / "results.npy")
+        with open(entry / "params.json", "w") as file:
+            json.dump(params, file, indent=2, sort_keys=True)
+
+    def _entries(self):
+        return [entry for entry in self.directory.iterdir() if entry.is_dir()]
+
+    def _evict(self, keep):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(_entry_size(entry) for entry in entries)
+
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry != keep:
+                total -= _entry_size(entry)
+                shutil.rmtree(entry)
+
+
+class _RowWriter:
+    """Writes the rows computed for some numbers of servers into their rows and columns of a cached matrix."""
+
+    def __init__(self, results, rows, columns):
+        """creates the _RowWriter object.
+
+        :arg
+        results - the memory-mapped matrix of the entry.
+        rows - an np.array with the row of the matrix of every computed number of servers.
+        columns - a slice with the columns of the computed replicas.
+        """
+        self.results = results
+        self.rows = rows
+        self.columns = columns
+
+    @property
+    def replicas(self):
+        return self.results
+
+    def write(self, row: int, values):
+        self.results[self.rows[row], self.columns] = values
+
+    def flush(self):
+        self.results.flush()
+
+
+def cache_key(params: dict):
+    """Hashes a JSON serialisable dictionary of parameters into a cache key."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _entry_size(entry):
+    return sum(path.stat().st_size for path in entry.iterdir())
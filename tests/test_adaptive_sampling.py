@@ -0,0 +1,49 @@
+import functools
+
+import numpy as np
+
+import fat_tree
+from adaptive_sampling import estimate_response_times
+from response_time import expected_fat_tree_response_time, simulate_fat_tree_response_times, TopologySimulation
+
+SIM = TopologySimulation(None, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+
+
+def test_estimate_reaches_precision_and_covers_expectation():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    simulate = functools.partial(simulate_fat_tree_response_times, SIM, tree)
+    servers = [10, 100, 1000]
+
+    expected = [expected_fat_tree_response_time(SIM._replace(n_servers=k), tree) for k in servers]
+
+    for variance_reduction in [(), ("control",), ("antithetic", "control")]:
+        estimate = estimate_response_times(simulate, servers, 0.02, variance_reduction, rng=np.random.default_rng(0))
+
+        assert np.all((estimate.ci_high - estimate.ci_low) / 2 <= 0.02 * estimate.mean)
+        assert np.all(np.abs(estimate.mean - expected) < 2 * (estimate.ci_high - estimate.ci_low))
+        if not variance_reduction:
+            # the replicas go to the small numbers of servers, whose maximum is dominated by few execution times
+            assert estimate.replicas[0] > estimate.replicas[1] > estimate.replicas[2]
+
+
+def test_variance_reduction_needs_fewer_replicas():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    simulate = functools.partial(simulate_fat_tree_response_times, SIM, tree)
+
+    plain = estimate_response_times(simulate, [1, 10], 0.02, rng=np.random.default_rng(1))
+    reduced = estimate_response_times(simulate, [1, 10], 0.02, ["antithetic", "control"],
+                                      rng=np.random.default_rng(1))
+
+    assert np.all(reduced.replicas * 5 <= plain.replicas)
+    assert np.all(reduced.replicas % 2 == 0)
+
+
+def test_estimate_stops_at_max_sims():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    simulate = functools.partial(simulate_fat_tree_response_times, SIM, tree)
+
+    estimate = estimate_response_times(simulate, [1], 0.001, initial_sims=10, max_sims=100,
+                                       rng=np.random.default_rng(2))
+
+    assert estimate.replicas.tolist() == [100]
+    assert estimate.ci_low[0] < estimate.mean[0] < estimate.ci_high[0]
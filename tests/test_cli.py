@@ -0,0 +1,73 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import cli
+
+
+def test_sweep_and_plot(tmp_path):
+    monte_carlo = tmp_path / "monte_carlo.npz"
+    quadrature = tmp_path / "quadrature.npz"
+
+    cli.main(["sweep", "--n", "16", "--servers", "1", "500", "50", "--n-sims", "5", "--seed", "0", "--no-cache",
+              "--output", str(monte_carlo)])
+    cli.main(["sweep", "--n", "16", "--servers", "1", "500", "50", "--method", "quadrature",
+              "--output", str(quadrature)])
+    cli.main(["plot", str(monte_carlo), str(quadrature), "--output", str(tmp_path / "sweep.png")])
+
+    meta, arrays = cli.load_data(monte_carlo)
+    assert meta["kind"] == "sweep" and meta["seed"] == 0
+    assert arrays["replicas"].shape == (10, 5)
+    np.testing.assert_allclose(arrays["means"], arrays["replicas"].mean(axis=1))
+    assert cli.load_data(quadrature)[1]["replicas"].shape == (10, 1)
+    assert (tmp_path / "sweep.png").stat().st_size > 0
+
+
+def test_connectivity_and_plot(tmp_path):
+    path = tmp_path / "connectivity.npz"
+
+    cli.main(["connectivity", "--graph", "r-random", "--degree", "3", "--sizes", "10", "20", "--repeats", "3",
+              "--seed", "1", "--output", str(path)])
+    cli.main(["plot", str(path)])
+
+    meta, arrays = cli.load_data(path)
+    assert meta["kind"] == "connectivity"
+    assert arrays["x"].tolist() == [10, 12, 14, 16, 18, 20]
+    assert np.all((arrays["probs"] >= 0) & (arrays["probs"] <= 1))
+    assert path.with_suffix(".eps").exists()
+
+
+def test_coupled_er_connectivity(tmp_path):
+    path = tmp_path / "connectivity.npz"
+
+    cli.main(["connectivity", "--n-nodes", "30", "--probs", "0", "1", "21", "--repeats", "20", "--coupled",
+              "--seed", "2", "--output", str(path)])
+
+    meta, arrays = cli.load_data(path)
+    assert meta["coupled"]
+    # every coupled replica is connected from its threshold on, so the curve can not decrease
+    assert arrays["probs"][0] == 0 and arrays["probs"][-1] == 1
+    assert np.all(np.diff(arrays["probs"]) >= 0)
+
+
+def test_adaptive_parallel_connectivity(tmp_path):
+    path = tmp_path / "connectivity.npz"
+
+    cli.main(["connectivity", "--n-nodes", "30", "--probs", "0.05", "0.3", "3", "--half-width", "0.1",
+              "--max-repeats", "300", "--workers", "2", "--seed", "3", "--output", str(path)])
+
+    _, arrays = cli.load_data(path)
+    done = (arrays["ci_high"] - arrays["ci_low"]) / 2 <= 0.1
+    assert np.all(done | (arrays["repeats"] == 300))
+    assert np.all((arrays["ci_low"] <= arrays["probs"]) & (arrays["probs"] <= arrays["ci_high"]))
+
+
+def test_sweep_workers_do_not_import_heavy_modules():
+    probe = f"import sys, sweep, response_time, fat_tree; print(*[m for m in {cli.HEAVY_MODULES!r} if m in sys.modules])"
+
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+                            cwd=Path(cli.__file__).parent).stdout
+
+    assert output.split() == []
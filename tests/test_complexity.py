@@ -33,3 +33,35 @@ def test_plot_prob():
 
     plt.savefig
 
+
+
+def test_log_sizes_and_exponent():
+    sizes = complexity.log_sizes(10, 100000, 9)
+
+    assert sizes[0] == 10 and sizes[-1] == 100000
+    assert abs(complexity.fit_exponent(sizes, 3e-7 * sizes ** 1.5) - 1.5) < 1e-9
+
+
+def test_benchmark_results_round_trip(tmp_path):
+    benchmark = complexity.ConnectivityBenchmark(connectivity.check_bfs_sparse, graphs.create_regular_graph, 4)
+    benchmark.run([10, 20, 40], n_exec=3)
+
+    assert len(benchmark.check) == 3
+    assert all(m.peak_memory > 0 and m.min <= m.median for m in benchmark.check)
+
+    for name in ["results.json", "results.csv"]:
+        complexity.save_results([benchmark], tmp_path / name)
+        loaded = complexity.load_results(tmp_path / name)
+
+        ratios = complexity.compare_results(loaded, benchmark.to_records())
+        assert list(ratios) == [("check_bfs_sparse", 10), ("check_bfs_sparse", 20), ("check_bfs_sparse", 40)]
+        assert np.allclose(list(ratios.values()), 1)
+
+
+def test_time_complexity_on_log_spaced_sparse_graphs():
+    bfs_complex = complexity.TimeComplexity(connec=connectivity.check_bfs_sparse,
+                                            create_graph=graphs.create_regular_sparse_graph, node_degree=4)
+    n_nodes, times = bfs_complex.time(2, 100, 10000, 3)
+
+    assert list(n_nodes) == [100, 1000, 10000]
+    assert len(times) == 3 and np.all(times > 0)
@@ -44,3 +44,68 @@ def test_bfs_for_disconnected_graph():
     g = nx.from_numpy_array(m)
 
     assert not connectivity.check_bfs(g)
+
+
+def test_sparse_checks_agree_with_networkx():
+    for seed in range(20):
+        g = nx.erdos_renyi_graph(30, 0.1, seed=seed)
+
+        assert connectivity.check_irreducibility_sparse(g) == nx.is_connected(g)
+        assert connectivity.check_laplacian_sparse(g) == nx.is_connected(g)
+
+
+def test_sparse_checks_for_small_graphs():
+    assert connectivity.check_irreducibility_sparse(np.array([[1, 0], [1, 1]])) is False
+    assert connectivity.check_irreducibility_sparse(np.array([[0, 1], [1, 0]]))
+    assert connectivity.check_laplacian_sparse(nx.from_numpy_array(np.array([[1, 1], [1, 1]])))
+    assert not connectivity.check_laplacian_sparse(nx.from_numpy_array(np.array([[1, 0], [0, 1]])))
+
+
+def test_sparse_checks_for_large_path_graph():
+    g = nx.path_graph(2000)
+
+    assert connectivity.check_irreducibility_sparse(g)
+    assert connectivity.check_laplacian_sparse(g)
+
+    g.remove_edge(100, 101)
+    assert not connectivity.check_irreducibility_sparse(g)
+    assert not connectivity.check_laplacian_sparse(g)
+
+
+def test_bfs_sparse_agrees_with_networkx():
+    for seed in range(20):
+        g = nx.erdos_renyi_graph(30, 0.1, seed=seed)
+
+        assert connectivity.check_bfs_sparse(np.array(g.edges()), 30) == nx.is_connected(g)
+        assert connectivity.check_bfs_sparse(g) == nx.is_connected(g)
+
+
+def test_bfs_sparse_for_edge_arrays():
+    assert connectivity.check_bfs_sparse(np.array([[0, 1], [1, 2]]), 3)
+    assert not connectivity.check_bfs_sparse(np.array([[0, 1]]), 3)
+    assert not connectivity.check_bfs_sparse(np.zeros((0, 2)), 2)
+    assert connectivity.check_bfs_sparse(np.zeros((0, 2)), 1)
+
+
+def test_bfs_sparse_for_graph_without_nodes():
+    assert connectivity.check_bfs_sparse(np.zeros((0, 2)), 0)
+    assert connectivity.check_bfs_sparse(np.zeros((0, 0)))
+
+
+def test_coupled_er_connectivity_matches_independent_graphs():
+    rng = np.random.default_rng(0)
+    edge_probs = [0.03, 0.05, 0.08]
+
+    coupled = connectivity.er_connectivity_coupled(60, edge_probs, 2000, rng)
+    independent = connectivity.er_connectivity(60, edge_probs, 2000, rng)
+
+    assert coupled.x.tolist() == edge_probs
+    assert np.all(np.abs(coupled.probs - independent.probs) < 0.06)
+
+
+def test_coupled_er_connectivity_is_monotone():
+    coupled = connectivity.er_connectivity_coupled(30, np.linspace(0, 1, 1000), 50, np.random.default_rng(1))
+
+    assert coupled.probs[0] == 0
+    assert coupled.probs[-1] == 1
+    assert np.all(np.diff(coupled.probs) >= 0)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import fat_tree
+from event_sim import fat_tree_link_groups, max_min_fair_rates, simulate_event_driven_response_time
+from response_time import TopologySimulation
+
+
+def _sim(n_servers=100):
+    return TopologySimulation(n_servers, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+
+
+def test_max_min_fair_rates_share_a_link():
+    rates = max_min_fair_rates([3, 2], np.array([[True, True]]), np.array([10.0]), 100)
+
+    np.testing.assert_allclose(rates, [2, 2])
+
+
+def test_max_min_fair_rates_redistribute_unused_capacity():
+    membership = np.array([[True, True, False], [False, True, False]])
+
+    rates = max_min_fair_rates([1, 4, 0], membership, np.array([10.0, 2.0]), 100)
+
+    np.testing.assert_allclose(rates, [8, 0.5, 0])
+
+
+def test_max_min_fair_rates_cap_single_flows():
+    rates = max_min_fair_rates([2], np.array([[True]]), np.array([10.0]), 1)
+
+    np.testing.assert_allclose(rates, [1])
+
+
+def test_fat_tree_link_groups():
+    membership, capacities = fat_tree_link_groups(fat_tree.FatTree(4, 0.000005, 10))
+
+    assert membership.shape == (6, 6)
+    assert membership[0, :3].all() and not membership[0, 3:].any()
+    np.testing.assert_array_equal(membership[5], [False] * 5 + [True])
+    np.testing.assert_allclose(capacities, [10, 20, 40, 10, 20, 40])
+
+
+def test_single_server_transfers():
+    sim = _sim(1)
+    tree = fat_tree.FatTree(16, sim.tau_s, sim.capacity_gbit)
+
+    result = simulate_event_driven_response_time(sim, tree, np.random.default_rng(0))
+
+    input_time_s = sim.input_file_size_gb * sim.overhead / sim.capacity_gbit
+    assert result.input_arrival_s[0] == pytest.approx(input_time_s)
+    assert result.job_done_s[0] > input_time_s + sim.fixed_job_time_s
+    assert result.output_arrival_s[0] > result.job_done_s[0]
+    assert result.response_time_s == result.output_arrival_s[0]
+
+
+def test_outbound_transfers_share_the_main_link():
+    sim = _sim(300)
+    tree = fat_tree.FatTree(16, sim.tau_s, sim.capacity_gbit)
+
+    result = simulate_event_driven_response_time(sim, tree, np.random.default_rng(1))
+
+    # every server gets the same share of the main link, so all inputs arrive when the whole input has been sent
+    np.testing.assert_allclose(result.input_arrival_s, sim.input_file_size_gb * sim.overhead / sim.capacity_gbit)
+    assert np.all(result.output_arrival_s > result.job_done_s)
+    assert result.response_time_s == result.output_arrival_s.max()
+
+
+def test_returns_never_beat_the_main_link():
+    sim = _sim(300)
+    tree = fat_tree.FatTree(16, sim.tau_s, sim.capacity_gbit)
+
+    result = simulate_event_driven_response_time(sim, tree, np.random.default_rng(2))
+    rng = np.random.default_rng(2)
+    rng.exponential(size=300)
+    return_sizes = rng.uniform(0, 2 * sim.output_file_size_gb / 300, 300) * sim.overhead
+
+    # no return is faster than the capacity of a single link and all returns share the link of the main server
+    assert np.all(result.output_arrival_s - result.job_done_s >= return_sizes / sim.capacity_gbit * (1 - 1e-9))
+    assert result.response_time_s - result.job_done_s.min() >= return_sizes.sum() / sim.capacity_gbit
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from scipy.sparse import csgraph
+
+import connectivity
+import fat_tree
+
+
+def test_allocate_matches_scalar_tier_counts():
+    tree = fat_tree.FatTree(8, 0.000005, 10)
+    servers = np.arange(1, tree.n_servers + 10)
+
+    edge, pod, core = tree.allocate(servers)
+
+    assert edge.tolist() == [tree.get_n_free_edge_servers(k) for k in servers]
+    assert pod.tolist() == [tree.get_n_free_pod_servers(k) for k in servers]
+    assert core.tolist() == [tree.get_n_free_core_servers(k) for k in servers]
+
+
+def test_tier_table_is_cached_per_number_of_servers():
+    tree = fat_tree.FatTree(8, 0.000005, 10)
+
+    first = tree.tier_table([5, 20])
+    second = tree.tier_table([20, 5, 20])
+
+    assert second.counts.tolist() == [first.counts[1].tolist(), first.counts[0].tolist(), first.counts[1].tolist()]
+    assert np.allclose(np.sum(second.counts * second.throughputs, axis=1), tree.capacity)
+    assert sorted(tree._tier_tables) == [5, 20]
+
+
+def test_graph_distances_match_bfs():
+    for k in [2, 4, 6]:
+        graph = fat_tree.FatTreeGraph(k)
+        nodes = np.arange(graph.n_nodes)
+
+        bfs_distances = csgraph.shortest_path(graph.adjacency, unweighted=True)
+
+        assert np.array_equal(graph.distances(nodes[:, None], nodes[None, :]), bfs_distances)
+
+
+def test_graph_structure():
+    graph = fat_tree.FatTree(8, 0.000005, 10).graph()
+    adjacency = graph.to_sparse()
+    degrees = np.diff(adjacency.indptr)
+
+    assert (adjacency != adjacency.T).nnz == 0
+    assert degrees[:graph.n_hosts].tolist() == [1] * graph.n_hosts
+    assert set(degrees[graph.n_hosts:].tolist()) == {8}
+    assert graph.to_sparse(hosts=False).shape == (80, 80)
+    assert connectivity.check_bfs_sparse(adjacency)
+
+
+def test_graph_hop_histogram_matches_allocation():
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+
+    hops, servers = tree.graph().hop_histogram()
+
+    assert hops.tolist() == fat_tree.TIER_HOPS.tolist()
+    assert servers.tolist() == [int(k) for k in tree.allocate(tree.n_servers - 1)]
+    assert tree.graph() is tree.graph()
+
+
+def test_graph_needs_even_ports():
+    with pytest.raises(ValueError):
+        fat_tree.FatTreeGraph(5)
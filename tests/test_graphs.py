@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import graphs
+
+
+def test_er_edges_are_unique_pairs_with_expected_count():
+    replicas = graphs.create_er_edges(200, 0.05, 100, np.random.default_rng(0))
+
+    for edges in replicas:
+        assert np.all(edges[:, 1] < edges[:, 0])
+        assert np.all(edges[:, 0] < 200)
+        assert len(np.unique(edges[:, 0] * 200 + edges[:, 1])) == len(edges)
+
+    expected = 200 * 199 / 2 * 0.05
+    assert abs(np.mean([len(edges) for edges in replicas]) - expected) < 4 * np.sqrt(expected / 100)
+
+
+def test_er_edges_for_extreme_probabilities():
+    assert all(len(edges) == 0 for edges in graphs.create_er_edges(10, 0, 3))
+    assert all(len(edges) == 45 for edges in graphs.create_er_edges(10, 1, 3))
+
+
+def test_regular_edges_have_equal_degrees():
+    for edges in graphs.create_regular_edges(30, 4, 20, np.random.default_rng(1)):
+        assert np.all(np.bincount(edges.ravel(), minlength=30) == 4)
+        assert len(np.unique(np.min(edges, axis=1) * 30 + np.max(edges, axis=1))) == len(edges)
+
+
+def test_regular_edges_need_even_number_of_stubs():
+    with pytest.raises(ValueError):
+        graphs.create_regular_edges(5, 3, 1)
+
+
+def test_regular_sparse_graph_is_symmetric_with_equal_degrees():
+    adjacency = graphs.create_regular_sparse_graph(1000, 4)
+
+    assert adjacency.shape == (1000, 1000)
+    assert np.all(np.diff(adjacency.indptr) == 4)
+    assert (adjacency != adjacency.T).nnz == 0
@@ -0,0 +1,95 @@
+import functools
+import json
+
+import numpy as np
+
+import connectivity
+import fat_tree
+import instrument
+import sweep
+from response_time import simulate_fat_tree_response_time, TopologySimulation
+
+
+def _sim(n_servers=100):
+    return TopologySimulation(n_servers, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+
+
+def test_disabled_hooks_do_nothing():
+    assert not instrument.enabled()
+    assert instrument.phase("a") is instrument.phase("b")
+
+    with instrument.phase("a"), instrument.point(1):
+        instrument.count("a")
+
+
+def test_recording_phases_and_counters(tmp_path):
+    with instrument.recording() as recorder:
+        with instrument.point(10):
+            with instrument.phase("outer"), instrument.phase("inner"):
+                instrument.count("items", 3)
+        with instrument.phase("outer"):
+            instrument.count("items")
+
+    assert not instrument.enabled()
+    assert [(event.name, event.point) for event in recorder.events] == [("inner", 10), ("outer", 10),
+                                                                         ("outer", None)]
+    assert {row.name: row.calls for row in recorder.summary()} == {"outer": 2, "inner": 1}
+    assert dict(recorder.counters["items"]) == {10: 3, None: 1}
+    assert "outer" in recorder.format_summary()
+
+    recorder.write_chrome_trace(tmp_path / "trace.json")
+    with open(tmp_path / "trace.json") as file:
+        trace = json.load(file)["traceEvents"]
+    assert [event["ph"] for event in trace] == ["X", "X", "X", "C"]
+    assert min(event["ts"] for event in trace) == 0
+
+
+def test_simulator_phases():
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+
+    with instrument.recording() as recorder:
+        simulate_fat_tree_response_time(_sim(), tree)
+        connectivity.er_connectivity(20, [0.1, 0.5], 3, np.random.default_rng(0))
+
+    names = {row.name for row in recorder.summary()}
+    assert {"fat_tree.allocate", "fat_tree.draws", "fat_tree.throughput", "fat_tree.network_times",
+            "fat_tree.max"} <= names
+    assert sum(recorder.counters["fat_tree.samples"].values()) == 2 * _sim().n_servers
+    assert {"graph.generate", "connectivity.check"} <= names
+    assert sum(recorder.counters["connectivity.graphs"].values()) == 6
+
+
+def test_fat_tree_samples_are_counted_per_allocated_server():
+    tree = fat_tree.FatTree(4, 0.000005, 10)
+
+    with instrument.recording() as recorder:
+        simulate_fat_tree_response_time(_sim(100), tree)
+
+    # a Fat Tree with 4 ports only holds 16 servers, 15 besides the main server
+    assert sum(recorder.counters["fat_tree.samples"].values()) == 2 * 15
+
+
+def test_sweep_points_are_aggregated_across_workers():
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+    simulate = functools.partial(sweep.fat_tree_response_times, tree=tree, n_sims=5)
+    sims = [_sim(k) for k in [1, 50, 500]]
+
+    for workers in [1, 2]:
+        with instrument.recording() as recorder:
+            results = sweep.run_sweep(simulate, sims, workers, seed=0, progress=False)
+
+        assert np.array(results).shape == (3, 5)
+        per_point = recorder.point_summary()
+        assert sorted(per_point) == [1, 50, 500]
+        assert all({"sweep.point", "sample.draws", "sample.reduce"} <= set(phases) for phases in per_point.values())
+
+
+def test_profile_writes_outputs(tmp_path, capsys):
+    with instrument.profile(tmp_path / "run", top=5):
+        with instrument.phase("work"):
+            np.sort(np.random.default_rng(0).random(1000))
+
+    assert (tmp_path / "run.prof").exists()
+    assert (tmp_path / "run.trace.json").exists()
+    assert "work" in capsys.readouterr().out
+    assert not instrument.enabled()
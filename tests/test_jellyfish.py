@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+import graphs
+from Jellyfish import Jellyfish
+
+
+def test_sparse_structure_is_simple_regular_graph():
+    for seed in range(50):
+        jellyfish = Jellyfish(4, 0.000005, 10)
+        adjacency = jellyfish.build_sparse_structure(np.random.default_rng(seed))
+
+        assert np.all(np.diff(adjacency.indptr) == jellyfish.r)
+        assert (adjacency != adjacency.T).nnz == 0
+        assert adjacency.diagonal().sum() == 0
+        assert adjacency.max() == 1
+        assert all(len(neighbours) == jellyfish.r for neighbours in jellyfish.switches.values())
+
+
+def test_pair_stubs_returns_unique_edges():
+    edges, stubs = graphs.pair_stubs(np.full(50, 6), np.random.default_rng(0))
+    keys = np.min(edges, axis=1) * 50 + np.max(edges, axis=1)
+
+    assert len(np.unique(keys)) == len(edges)
+    assert np.all(edges[:, 0] != edges[:, 1])
+    assert 2 * len(edges) + len(stubs) == 50 * 6
+
+
+def test_hop_histogram_counts_all_servers():
+    jellyfish = Jellyfish(8, 0.000005, 10)
+    jellyfish.build_sparse_structure(np.random.default_rng(1))
+
+    hops, servers = jellyfish.hop_histogram()
+
+    assert hops[0] == 2
+    assert servers.sum() == jellyfish.servers - 1
+    assert jellyfish.hop_histogram() is jellyfish.hop_histogram()
+
+
+def test_allocate_fills_closest_servers_first():
+    jellyfish = Jellyfish(8, 0.000005, 10)
+    jellyfish.build_sparse_structure(np.random.default_rng(1))
+    _, servers = jellyfish.hop_histogram()
+
+    _, counts = jellyfish.allocate([1, servers[0] + 1, jellyfish.servers - 1])
+
+    assert counts.sum(axis=1).tolist() == [1, servers[0] + 1, jellyfish.servers - 1]
+    assert counts[1, :2].tolist() == [servers[0], 1]
+
+
+def test_hop_histogram_keeps_servers_that_do_not_fill_a_switch():
+    # 6 ** 3 // 4 = 54 servers on 36 switches, one per switch and 18 more
+    jellyfish = Jellyfish(6, 0.000005, 10)
+    jellyfish.build_sparse_structure(np.random.default_rng(2))
+
+    _, servers = jellyfish.hop_histogram()
+    _, counts = jellyfish.allocate([jellyfish.servers - 1])
+
+    assert servers.sum() == jellyfish.servers - 1
+    assert counts.sum() == jellyfish.servers - 1
+
+
+def test_allocate_rejects_more_servers_than_reachable():
+    jellyfish = Jellyfish(8, 0.000005, 10)
+    jellyfish.build_sparse_structure(np.random.default_rng(1))
+
+    with pytest.raises(ValueError):
+        jellyfish.allocate([jellyfish.servers])
+
+
+def test_legacy_structure_is_simple_regular_graph():
+    jellyfish = Jellyfish(6, 0.000005, 10)
+    adjacency = jellyfish.build_structure()
+
+    assert np.all(np.diff(adjacency.indptr) == jellyfish.r)
+    assert adjacency.diagonal().sum() == 0
+    assert all(len(set(neighbours)) == jellyfish.r for neighbours in jellyfish.switches.values())
+
+
+def test_sparse_structure_rejects_unrepairable_free_ports(monkeypatch):
+    # both free ports on switch 0, whose only link is the one that would have to be replaced
+    monkeypatch.setattr(graphs, "pair_stubs", lambda degrees, rng: (np.array([[0, 1]]), np.array([0, 0])))
+    jellyfish = Jellyfish(2, 0.000005, 10)
+
+    with pytest.raises(ValueError):
+        jellyfish.build_sparse_structure(np.random.default_rng(0))
@@ -0,0 +1,60 @@
+import networkx as nx
+import numpy as np
+from scipy import sparse
+
+import jellyfish_analysis
+from Jellyfish import Jellyfish
+
+
+def _jellyfish(n=12, seed=1):
+    jellyfish = Jellyfish(n, 0.000005, 10)
+    jellyfish.build_sparse_structure(np.random.default_rng(seed))
+    return jellyfish
+
+
+def test_path_lengths_match_networkx():
+    adjacency = _jellyfish().to_sparse()
+    graph = nx.from_scipy_sparse_array(adjacency)
+
+    lengths = jellyfish_analysis.path_lengths(adjacency, batch_size=7)
+
+    assert np.isclose(lengths.average, nx.average_shortest_path_length(graph))
+    assert lengths.diameter == nx.diameter(graph)
+    assert lengths.pairs.sum() == 144 * 143
+
+
+def test_path_diversity_matches_networkx():
+    adjacency = _jellyfish().to_sparse()
+    graph = nx.from_scipy_sparse_array(adjacency)
+    sources, targets = jellyfish_analysis.sample_pairs(144, 30, np.random.default_rng(2))
+
+    diversity = jellyfish_analysis.path_diversity(adjacency, sources, targets, k=3, batch_size=5)
+
+    for source, target, hops, n_paths, k_hops in zip(sources, targets, diversity.hops, diversity.n_shortest_paths,
+                                                     diversity.k_shortest_hops):
+        shortest_paths = list(nx.all_shortest_paths(graph, source, target))
+        assert hops == len(shortest_paths[0]) - 1
+        assert n_paths == len(shortest_paths)
+        assert k_hops[0] == hops and np.all(np.diff(k_hops) >= 0)
+
+
+def test_disconnected_pairs():
+    ring = sparse.csr_matrix(nx.to_scipy_sparse_array(nx.disjoint_union(nx.cycle_graph(4), nx.cycle_graph(3))))
+
+    lengths = jellyfish_analysis.path_lengths(ring)
+    diversity = jellyfish_analysis.path_diversity(ring, np.array([0, 0]), np.array([2, 5]))
+
+    assert lengths.hops.tolist() == [1, 2] and lengths.pairs.tolist() == [8 + 6, 4]
+    assert diversity.hops.tolist() == [2, -1]
+    assert diversity.n_shortest_paths.tolist() == [2, 0]
+
+
+def test_parallel_analysis_matches_serial():
+    jellyfish = _jellyfish(8, 3)
+
+    serial = jellyfish_analysis.analyse(jellyfish, 20, batch_size=16, rng=np.random.default_rng(4))
+    parallel = jellyfish_analysis.analyse(jellyfish, 20, batch_size=16, workers=2, rng=np.random.default_rng(4))
+
+    assert serial.connected and parallel.connected
+    assert serial.path_lengths.pairs.tolist() == parallel.path_lengths.pairs.tolist()
+    np.testing.assert_array_equal(serial.diversity.n_shortest_paths, parallel.diversity.n_shortest_paths)
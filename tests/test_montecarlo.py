@@ -0,0 +1,41 @@
+import numpy as np
+
+import montecarlo
+
+
+def test_wilson_interval():
+    low, high = montecarlo.wilson_interval(0, 10)
+    assert low == 0 and abs(high - 0.2775) < 1e-3
+
+    low, high = montecarlo.wilson_interval(87, 87)
+    assert high == 1
+
+    low, high = montecarlo.wilson_interval(50, 100)
+    assert abs(low - 0.4038) < 1e-3 and abs(high - 0.5962) < 1e-3
+
+
+def test_parallel_er_connectivity_is_independent_of_workers():
+    arguments = dict(n_nodes=40, edge_probs=[0.01, 0.1, 0.5], half_width=0.05, block_size=40, seed=3)
+
+    serial = montecarlo.parallel_er_connectivity(workers=1, **arguments)
+    parallel = montecarlo.parallel_er_connectivity(workers=2, **arguments)
+
+    assert np.array_equal(serial.probs, parallel.probs)
+    assert np.array_equal(serial.repeats, parallel.repeats)
+    assert np.all((serial.ci_high - serial.ci_low) / 2 <= 0.05)
+    assert serial.probs[0] == 0 and serial.probs[-1] == 1
+
+
+def test_parallel_r_random_connectivity_stops_at_max_repeats():
+    estimate = montecarlo.parallel_r_random_connectivity([20, 40], 2, half_width=0.001, max_repeats=60,
+                                                         block_size=25, seed=4)
+
+    assert estimate.repeats.tolist() == [60, 60]
+    assert np.all((estimate.ci_low <= estimate.probs) & (estimate.probs <= estimate.ci_high))
+
+
+def test_repeats_for_half_width_bounds_the_widest_interval():
+    repeats = montecarlo.repeats_for_half_width(0.05)
+
+    low, high = montecarlo.wilson_interval(repeats / 2, repeats)
+    assert repeats == 385 and (high - low) / 2 <= 0.05
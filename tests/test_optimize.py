@@ -0,0 +1,32 @@
+import numpy as np
+
+import fat_tree
+import optimize
+from response_time import TopologySimulation, expected_fat_tree_response_time
+
+
+def _sim():
+    return TopologySimulation(1, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+
+
+def test_common_random_numbers_match_expected_response_time():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    objective = optimize.CommonRandomNumbers(_sim(), tree, 1000, 4000, seed=0)
+
+    for n_servers in [1, 50, 1000]:
+        values = objective(n_servers)
+        expected = expected_fat_tree_response_time(_sim()._replace(n_servers=n_servers), tree)
+
+        assert abs(np.mean(values) - expected) < 4 * np.std(values) / np.sqrt(len(values))
+
+
+def test_optimal_servers_match_brute_force_search():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    objective = optimize.CommonRandomNumbers(_sim(), tree, 2000, 100, xi=0.1, seed=1)
+
+    result = optimize.find_optimal_servers(objective, 1, 2000)
+    brute_force = 1 + int(np.argmin([np.mean(objective(n_servers)) for n_servers in range(1, 2001)]))
+
+    assert result.n_servers_ci[0] <= brute_force <= result.n_servers_ci[1]
+    assert result.value_ci[0] <= result.value <= result.value_ci[1]
+    assert result.n_evaluations < 2000
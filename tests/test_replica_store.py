@@ -0,0 +1,83 @@
+import functools
+
+import numpy as np
+
+import fat_tree
+import replica_store
+import sweep
+from plot import plot_response_time_percentiles
+from replica_store import ReplicaStore
+from response_time import TopologySimulation
+from sweep_cache import SweepCache
+
+SIM = TopologySimulation(None, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+
+
+def test_store_round_trips_rows_and_metadata(tmp_path):
+    path = tmp_path / "stores" / "sweep.replicas"
+    store = ReplicaStore.create(path, [1, 11, 21], 4, dict(topology="fat-tree", seed=3))
+
+    assert np.isnan(store.replicas).all()
+    assert store.written().tolist() == [False, False, False]
+
+    store.write(1, [1, 2, 3, 4])
+    store.flush()
+    reopened = ReplicaStore(path)
+
+    assert reopened.servers.tolist() == [1, 11, 21]
+    assert reopened.meta == dict(topology="fat-tree", seed=3)
+    assert reopened.written().tolist() == [False, True, False]
+    assert reopened.replicas[1].tolist() == [1, 2, 3, 4]
+    assert reopened.replicas.offset % replica_store.DATA_ALIGNMENT == 0
+
+
+def test_reductions_match_numpy_across_chunks(tmp_path, monkeypatch):
+    # three rows per chunk, so the reductions combine several blocks and a shorter last one
+    monkeypatch.setattr(replica_store, "CHUNK_BYTES", 3 * 4 * 50)
+    values = np.random.default_rng(0).exponential(size=(10, 50)).astype(np.float32)
+    store = ReplicaStore.create(tmp_path / "sweep.replicas", range(10), 50)
+    for row, row_values in enumerate(values):
+        store.write(row, row_values)
+
+    assert np.allclose(store.mean(), values.mean(axis=1, dtype=np.float64))
+    assert np.allclose(store.percentiles([50, 99]), np.percentile(values, [50, 99], axis=1).T)
+
+
+def test_sweep_writes_into_store_for_any_number_of_workers(tmp_path):
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+    simulate = functools.partial(sweep.fat_tree_response_times, tree=tree, n_sims=5)
+    servers = [1, 11, 21, 31]
+    sims = [SIM._replace(n_servers=k) for k in servers]
+
+    expected = np.array(sweep.run_sweep(simulate, sims, seed=42, progress=False), dtype=np.float32)
+    for workers in [1, 2]:
+        store = ReplicaStore.create(tmp_path / f"{workers}.replicas", servers, 5)
+        replicas = sweep.run_sweep(simulate, sims, workers, seed=42, progress=False, store=store)
+
+        assert np.array_equal(replicas, expected)
+        assert np.array_equal(ReplicaStore(store.path).replicas, expected)
+
+
+def test_cached_sweep_copies_cached_results_into_store(tmp_path):
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+    simulate = functools.partial(sweep.fat_tree_response_times, tree=tree)
+    cache = SweepCache(tmp_path / "cache")
+    servers = np.array([1, 11, 21])
+
+    cached = sweep.run_cached_sweep(simulate, SIM, servers, 6, cache, dict(n=16), seed=1)
+    store = ReplicaStore.create(tmp_path / "sweep.replicas", servers, 6)
+    stored = sweep.run_cached_sweep(simulate, SIM, servers, 6, cache, dict(n=16), seed=1, store=store)
+
+    assert np.array_equal(stored, cached.astype(np.float32))
+    assert store.written().all()
+
+
+def test_plot_response_time_percentiles(tmp_path):
+    store = ReplicaStore.create(tmp_path / "sweep.replicas", [1, 11], 3)
+    store.write(0, [1, 2, 3])
+    store.write(1, [2, 4, 6])
+
+    _, ax = plot_response_time_percentiles([store], ["Fat Tree"], percentiles=(50, 90), baseline=2.0)
+
+    assert [line.get_label() for line in ax.get_lines()] == ["Fat Tree p50", "Fat Tree p90"]
+    assert ax.get_lines()[0].get_ydata().tolist() == [1.0, 2.0]
@@ -0,0 +1,228 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import fat_tree
+import response_time
+from Jellyfish import Jellyfish
+from response_time import expected_fat_tree_response_time, expected_jellyfish_response_time, \
+    simulate_fat_tree_job_running_costs, simulate_fat_tree_response_time, simulate_fat_tree_response_times, \
+    simulate_jellyfish_response_times, stream_fat_tree_response_time, TopologySimulation
+
+
+def _sim(n_servers=100):
+    return TopologySimulation(n_servers, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+
+
+def test_batched_response_times_shape():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+
+    times = simulate_fat_tree_response_times(_sim(), tree, [1, 31, 1001], 7, np.random.default_rng(0))
+
+    assert times.shape == (3, 7)
+    assert np.all(times > _sim().fixed_job_time_s)
+
+
+def test_batched_response_times_match_single_simulation():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    np.random.seed(0)
+
+    for n_servers in [1, 40, 500]:
+        sim = _sim(n_servers)
+        single = [simulate_fat_tree_response_time(sim, tree) for _ in range(2000)]
+        batched = simulate_fat_tree_response_times(sim, tree, [n_servers], 2000, np.random.default_rng(1))[0]
+
+        tolerance = 4 * np.std(single) * np.sqrt(2 / 2000)
+        assert abs(np.mean(single) - np.mean(batched)) < tolerance
+
+
+
+def test_expected_response_time_matches_simulation():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+
+    for n_servers in [1, 31, 500]:
+        sim = _sim(n_servers)
+        simulated = simulate_fat_tree_response_times(sim, tree, [n_servers], 5000, np.random.default_rng(3))[0]
+
+        tolerance = 4 * np.std(simulated) / np.sqrt(5000)
+        assert abs(expected_fat_tree_response_time(sim, tree) - np.mean(simulated)) < tolerance
+
+
+def test_expected_response_time_is_deterministic():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+
+    assert expected_fat_tree_response_time(_sim(), tree) == expected_fat_tree_response_time(_sim(), tree)
+
+
+def test_streamed_response_time_matches_expectation():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    sim = _sim(500)
+    rng = np.random.default_rng(4)
+
+    streamed = [stream_fat_tree_response_time(sim, tree, rng, block_size=64) for _ in range(2000)]
+
+    tolerance = 4 * np.std(streamed) / np.sqrt(2000)
+    assert abs(expected_fat_tree_response_time(sim, tree) - np.mean(streamed)) < tolerance
+
+
+def test_streamed_response_time_memory_is_bounded():
+    tree = fat_tree.FatTree(128, 0.000005, 10)
+    sim = _sim(tree.n_servers - 1)
+
+    tracemalloc.start()
+    stream_fat_tree_response_time(sim, tree, np.random.default_rng(5), block_size=4096)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert peak < 1024 * 1024
+
+
+def test_batched_response_times_split_large_points():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    sim = _sim(500)
+    counts, offsets, return_scales = response_time._fat_tree_tier_parameters(sim, tree)
+
+    for block_size in [100, 2000]:
+        times = response_time._sample_max_times(counts[None], np.array([8 * 3600 / 500]), offsets[None],
+                                                return_scales[None], 2000, np.random.default_rng(6), block_size)
+
+        tolerance = 4 * np.std(times) / np.sqrt(2000)
+        assert abs(expected_fat_tree_response_time(sim, tree) - np.mean(times)) < tolerance
+
+
+def test_job_running_costs_match_expectation():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+
+    for n_servers in [1, 500]:
+        sim = _sim(n_servers)
+        costs = simulate_fat_tree_job_running_costs(sim, tree, 4000, 0.1, np.random.default_rng(7))
+
+        expected_theta = sim.expected_job_time_s + n_servers * sim.fixed_job_time_s
+        assert abs(expected_theta - np.mean(costs.theta_s)) < 4 * np.std(costs.theta_s) / np.sqrt(4000)
+        expected_cost = expected_fat_tree_response_time(sim, tree) + 0.1 * expected_theta
+        assert abs(expected_cost - np.mean(costs.cost)) < 4 * np.std(costs.cost) / np.sqrt(4000)
+        np.testing.assert_allclose(costs.cost, costs.response_time_s + 0.1 * costs.theta_s)
+
+
+def test_job_running_costs_share_draws():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    sim = _sim(1)
+
+    costs = simulate_fat_tree_job_running_costs(sim, tree, 100, 0.1, np.random.default_rng(8))
+
+    # with a single server the response time is its execution time plus the network time
+    network_times = costs.response_time_s - costs.theta_s
+    assert np.all(network_times > 0)
+    assert np.ptp(network_times) < np.ptp(costs.theta_s) / 100
+
+
+def test_streamed_exec_sums_match_blocks():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    sim = _sim(500)
+    counts, offsets, return_scales = response_time._fat_tree_tier_parameters(sim, tree)
+
+    _, exec_sums = response_time._sample_max_times(counts[None], np.array([8 * 3600 / 500]), offsets[None],
+                                                   return_scales[None], 500, np.random.default_rng(9), 100,
+                                                   with_exec_sums=True)
+
+    assert abs(np.mean(exec_sums) - 8 * 3600) < 4 * np.std(exec_sums) / np.sqrt(500)
+
+
+def test_jellyfish_response_times_match_expectation():
+    jellyfish = Jellyfish(16, 0.000005, 10)
+    jellyfish.build_sparse_structure(np.random.default_rng(7))
+
+    for n_servers in [1, 100, 1000]:
+        sim = _sim(n_servers)
+        simulated = simulate_jellyfish_response_times(sim, jellyfish, [n_servers], 4000, np.random.default_rng(8))[0]
+
+        tolerance = 4 * np.std(simulated) / np.sqrt(4000)
+        assert abs(expected_jellyfish_response_time(sim, jellyfish) - np.mean(simulated)) < tolerance
+
+
+def test_harmonic_number_matches_sum():
+    assert np.allclose(response_time.harmonic_number([1, 2, 10]), [1, 1.5, np.sum(1 / np.arange(1, 11))])
+
+
+def test_variance_reductions_keep_expectation_and_lower_variance():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    servers = [1, 10, 500]
+    expected = [expected_fat_tree_response_time(_sim(k), tree) for k in servers]
+    rng = np.random.default_rng(5)
+
+    plain_variance = np.var([simulate_fat_tree_response_times(_sim(), tree, servers, 20, rng).mean(axis=1)
+                             for _ in range(200)], axis=0)
+    for variance_reduction in [["antithetic"], ["stratified"], ["control"], response_time.VARIANCE_REDUCTIONS]:
+        means = np.array([simulate_fat_tree_response_times(_sim(), tree, servers, 20, rng, variance_reduction)
+                          .mean(axis=1) for _ in range(200)])
+
+        assert np.all(np.abs(means.mean(axis=0) - expected) < 5 * np.sqrt(means.var(axis=0) / 200) + 1e-9)
+        if "control" in variance_reduction:
+            assert np.all(means.var(axis=0)[:2] < plain_variance[:2] / 10)
+
+
+def test_coupled_replicas_keep_the_distribution():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    rng = np.random.default_rng(6)
+
+    for variance_reduction in [["antithetic"], ["stratified"]]:
+        times = simulate_fat_tree_response_times(_sim(), tree, [40], 4000, rng, variance_reduction)[0]
+        plain = simulate_fat_tree_response_times(_sim(), tree, [40], 4000, rng)[0]
+
+        assert np.allclose(np.percentile(times, [10, 50, 90]), np.percentile(plain, [10, 50, 90]), rtol=0.05)
+
+
+def test_antithetic_replicas_mirror_their_uniforms():
+    uniforms = response_time._replica_uniforms(5, 3, np.random.default_rng(7), antithetic=True, stratified=True)
+
+    assert uniforms.shape == (5, 3)
+    assert np.allclose(uniforms[1::2], 1 - uniforms[0:4:2])
+    # every column of the independently drawn replicas has one value per stratum
+    assert np.all(np.sort(np.floor(uniforms[0::2] * 3), axis=0) == np.arange(3)[:, None])
+
+
+def test_antithetic_pairs_survive_blocks_split_over_replicas():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+    counts, offsets, return_scales = response_time.fat_tree_tier_table(_sim(1), tree, [1])
+
+    # 7 replicas of one server fit into a block, so the 2000 replicas are drawn in blocks of 6
+    times = response_time._sample_max_times(counts, np.array([8 * 3600.0]), offsets, return_scales, 2000,
+                                            np.random.default_rng(8), block_size=7,
+                                            variance_reduction=["antithetic"])[0]
+
+    assert np.corrcoef(times[0::2], times[1::2])[0, 1] < -0.5
+
+
+def test_control_variate_needs_enough_replicas():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+
+    with pytest.raises(ValueError):
+        simulate_fat_tree_response_times(_sim(), tree, [100], 2, variance_reduction=["control"])
+
+    raw = simulate_fat_tree_response_times(_sim(), tree, [100], 2, np.random.default_rng(9), ["control"],
+                                           return_controls=True)
+    assert raw.response_times_s.shape == raw.controls_s.shape == (1, 2)
+    assert raw.response_times_s[0, 0] != raw.response_times_s[0, 1]
+    assert np.all(raw.response_times_s > raw.controls_s)
+
+
+def test_control_variate_estimate_matches_regression():
+    rng = np.random.default_rng(10)
+    controls = rng.exponential(size=(1, 50))
+    response_times = 3 + 2 * controls + rng.normal(0, 0.1, size=(1, 50))
+
+    means, standard_errors = response_time.control_variate_estimate(response_times, controls, np.array([1.0]))
+    slope, intercept = np.polyfit(controls[0], response_times[0], 1)
+    residuals = response_times[0] - intercept - slope * controls[0]
+    leverage = (controls.mean() - 1) ** 2 / np.sum((controls - controls.mean()) ** 2)
+
+    assert np.isclose(means[0], intercept + slope)
+    assert np.isclose(standard_errors[0], np.sqrt(np.sum(residuals ** 2) / 48 * (1 / 50 + leverage)))
+
+
+def test_unknown_variance_reduction_is_rejected():
+    tree = fat_tree.FatTree(64, 0.000005, 10)
+
+    with pytest.raises(ValueError):
+        simulate_fat_tree_response_times(_sim(), tree, [10], 4, variance_reduction=["importance"])
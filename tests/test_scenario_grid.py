@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import fat_tree
+import scenario_grid
+from response_time import expected_fat_tree_response_time, TopologySimulation
+from scenario_grid import scenario_sims, simulate_scenario_grid
+
+
+def _sim(n_servers=100):
+    return TopologySimulation(n_servers, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+
+
+def test_scenario_grid_rows():
+    grid = dict(capacity_gbit=[1, 10, 100], output_file_size_gb=[400, 4000])
+
+    results = simulate_scenario_grid(_sim(), 16, grid, [1, 50], 20, rng=np.random.default_rng(0))
+
+    assert len(results) == 2 * 3 * 2
+    assert list(results.columns) == ["n_servers", "capacity_gbit", "output_file_size_gb", "response_time_s",
+                                     "theta_s", "cost"]
+    assert results.groupby("n_servers").size().to_dict() == {1: 6, 50: 6}
+
+
+def test_scenario_grid_matches_expectation():
+    grid = dict(capacity_gbit=[1, 10], expected_job_time_s=[3600, 8 * 3600])
+
+    results = simulate_scenario_grid(_sim(), 64, grid, [500], 4000, xi=0.1, rng=np.random.default_rng(1))
+
+    for row in results.itertuples():
+        sim = _sim(500)._replace(capacity_gbit=row.capacity_gbit, expected_job_time_s=row.expected_job_time_s)
+        expected = expected_fat_tree_response_time(sim, fat_tree.FatTree(64, sim.tau_s, sim.capacity_gbit))
+        assert abs(row.response_time_s - expected) < 0.02 * expected
+        assert abs(row.theta_s - (sim.expected_job_time_s + 500 * sim.fixed_job_time_s)) < 0.01 * row.theta_s
+        assert row.cost == pytest.approx(row.response_time_s + 0.1 * row.theta_s)
+
+
+def test_scenario_grid_shares_draws():
+    grid = dict(tau_s=[0.000001, 0.000005, 0.00001], input_file_size_gb=[400, 4000])
+
+    results = simulate_scenario_grid(_sim(), 16, grid, [200], 50, rng=np.random.default_rng(2))
+    by_size = results.groupby("input_file_size_gb")["response_time_s"]
+
+    # the throughputs do not depend on the trip time, so the scenarios only differ in their input file size
+    np.testing.assert_allclose(by_size.min(), by_size.max(), rtol=1e-9)
+    assert by_size.mean()[4000] > by_size.mean()[400]
+
+
+def test_shared_max_times_block_size():
+    counts = np.array([7, 56, 400])
+    offsets = np.array([[1.0, 2.0, 3.0], [0.5, 0.5, 0.5]])
+    return_scales = np.array([[1.0, 2.0, 3.0], [10.0, 20.0, 30.0]])
+    times = {}
+
+    for block_size in [500, 1 << 20]:
+        times[block_size], exec_sums = scenario_grid._sample_shared_max_times(
+            counts, np.array([1.0, 2.0]), offsets, return_scales, 2000, np.random.default_rng(3), block_size)
+
+        assert times[block_size].shape == (2, 2000)
+        assert np.all(times[block_size] > offsets.max(axis=1)[:, None])
+        np.testing.assert_allclose(exec_sums[1], 2 * exec_sums[0])
+
+    tolerance = 4 * np.std(times[500], axis=1) * np.sqrt(2 / 2000)
+    assert np.all(np.abs(times[500].mean(axis=1) - times[1 << 20].mean(axis=1)) < tolerance)
+
+
+def test_scenario_sims_rejects_unknown_fields():
+    with pytest.raises(ValueError):
+        scenario_sims(_sim(), dict(bandwidth=[1, 2]))
+    with pytest.raises(ValueError):
+        scenario_sims(_sim(), dict(n_servers=[1, 2]))
@@ -0,0 +1,32 @@
+import functools
+
+import numpy as np
+
+import fat_tree
+import sweep
+from response_time import TopologySimulation
+
+
+def _sims(servers):
+    return [TopologySimulation(n_servers, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+            for n_servers in servers]
+
+
+def test_sweep_is_reproducible_for_any_number_of_workers():
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+    simulate = functools.partial(sweep.fat_tree_response_times, tree=tree, n_sims=5)
+    sims = _sims([1, 11, 21, 31, 41])
+
+    serial = sweep.run_sweep(simulate, sims, workers=1, seed=42, progress=False)
+    parallel = sweep.run_sweep(simulate, sims, workers=2, seed=42, progress=False)
+
+    assert np.array_equal(serial, parallel)
+    assert np.shape(serial) == (5, 5)
+
+
+def test_sweep_point_seeds_depend_on_number_of_servers_only():
+    first = sweep.point_seeds(_sims([1, 11]), seed=7)
+    second = sweep.point_seeds(_sims([11, 1]), seed=7)
+
+    assert first[0].generate_state(4).tolist() == second[1].generate_state(4).tolist()
+    assert first[0].generate_state(4).tolist() != first[1].generate_state(4).tolist()
@@ -0,0 +1,128 @@
+import functools
+
+import numpy as np
+
+import fat_tree
+import sweep
+from replica_store import ReplicaStore
+from response_time import TopologySimulation
+from sweep_cache import SweepCache
+
+
+def _sim():
+    return TopologySimulation(1, 0.000005, 10, 8 * 3600, 30, 4000, 4000, 1 + 48 / 1500)
+
+
+def test_cache_computes_only_missing_cells(tmp_path):
+    cache = SweepCache(tmp_path)
+    calls = []
+
+    def compute(servers, replica_offset, n_replicas):
+        calls.append((list(servers), replica_offset, n_replicas))
+        return np.add.outer(np.asarray(servers) * 1000, np.arange(replica_offset, replica_offset + n_replicas))
+
+    first = cache.get(dict(a=1), [1, 5], 3, compute)
+    second = cache.get(dict(a=1), [5, 9, 1], 4, compute)
+    third = cache.get(dict(a=1), [9, 1], 2, compute)
+
+    assert calls == [([1, 5], 0, 3), ([1, 5], 3, 1), ([9], 0, 4)]
+    assert first.tolist() == [[1000, 1001, 1002], [5000, 5001, 5002]]
+    assert second.tolist() == [[5000, 5001, 5002, 5003], [9000, 9001, 9002, 9003], [1000, 1001, 1002, 1003]]
+    assert third.tolist() == [[9000, 9001], [1000, 1001]]
+
+
+def test_cache_streams_into_store(tmp_path):
+    cache = SweepCache(tmp_path / "cache")
+    calls = []
+
+    def compute(servers, replica_offset, n_replicas, out):
+        calls.append((list(servers), replica_offset, n_replicas))
+        for row, k in enumerate(servers):
+            out.write(row, k * 1000 + np.arange(replica_offset, replica_offset + n_replicas))
+
+    first = ReplicaStore.create(tmp_path / "first.replicas", [5, 1], 3)
+    second = ReplicaStore.create(tmp_path / "second.replicas", [9, 1, 5], 4)
+    cache.get(dict(a=1), [5, 1], 3, compute, first)
+    results = cache.get(dict(a=1), [9, 1, 5], 4, compute, second)
+
+    assert calls == [([1, 5], 0, 3), ([1, 5], 3, 1), ([9], 0, 4)]
+    assert first.replicas.tolist() == [[5000, 5001, 5002], [1000, 1001, 1002]]
+    assert results.tolist() == [[9000, 9001, 9002, 9003], [1000, 1001, 1002, 1003], [5000, 5001, 5002, 5003]]
+    assert cache.get(dict(a=1), [9], 2, compute).tolist() == [[9000, 9001]]
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = SweepCache(tmp_path, max_bytes=3000)
+
+    def compute(servers, replica_offset, n_replicas):
+        return np.zeros((len(servers), n_replicas))
+
+    for key in range(3):
+        cache.get(dict(key=key), range(10), 20, compute)
+
+    assert cache.size() <= 3000
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_cached_sweep_matches_uncached_sweep(tmp_path):
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+    simulate = functools.partial(sweep.fat_tree_response_times, tree=tree)
+    cache = SweepCache(tmp_path)
+
+    uncached = sweep.run_cached_sweep(simulate, _sim(), [1, 11, 21], 5, seed=3)
+    sweep.run_cached_sweep(simulate, _sim(), [1, 21], 5, cache, dict(n=16), seed=3)
+    cached = sweep.run_cached_sweep(simulate, _sim(), [1, 11, 21], 5, cache, dict(n=16), seed=3)
+
+    assert np.array_equal(uncached, cached)
+
+
+def test_extended_cached_sweep_matches_fresh_sweep(tmp_path):
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+    simulate = functools.partial(sweep.fat_tree_response_times, tree=tree)
+    cache = SweepCache(tmp_path)
+
+    sweep.run_cached_sweep(simulate, _sim(), [1, 11], 5, cache, dict(n=16), seed=3)
+    sweep.run_cached_sweep(simulate, _sim(), [1, 11], 15, cache, dict(n=16), seed=3)
+    extended = sweep.run_cached_sweep(simulate, _sim(), [1, 11, 21], 40, cache, dict(n=16), seed=3)
+    fresh = sweep.run_cached_sweep(simulate, _sim(), [1, 11, 21], 40, seed=3)
+
+    assert np.array_equal(extended, fresh)
+    assert np.array_equal(extended[:, :15], sweep.run_cached_sweep(simulate, _sim(), [1, 11, 21], 15, seed=3))
+
+
+def test_extended_control_sweep_fits_all_replicas(tmp_path):
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+    simulate = functools.partial(sweep.fat_tree_response_times, tree=tree, variance_reduction=["control"])
+    cache = SweepCache(tmp_path)
+    params = dict(n=16, variance_reduction=["control"])
+
+    sweep.run_cached_sweep(simulate, _sim(), [1, 11, 101], 20, cache, params, seed=5)
+    # 3 more replicas, fewer than a control variate fit of its own would need
+    extended = sweep.run_cached_sweep(simulate, _sim(), [1, 11, 101], 23, cache, params, seed=5)
+    fresh = sweep.run_cached_sweep(simulate, _sim(), [1, 11, 101], 23, seed=5)
+
+    assert extended.shape == (3, 23, 2)
+    assert np.array_equal(extended, fresh)
+
+    # one slope per point, regressed on all 23 replicas
+    for mean, point in zip(sweep.replica_means(extended), extended):
+        beta = np.polyfit(point[:, 1], point[:, 0], 1)[0]
+        assert np.isclose(mean, point[:, 0].mean() - beta * point[:, 1].mean())
+
+
+def test_cached_sweep_skips_unseeded_sweeps_and_old_samplers(tmp_path, monkeypatch):
+    tree = fat_tree.FatTree(16, 0.000005, 10)
+    simulate = functools.partial(sweep.fat_tree_response_times, tree=tree)
+    cache = SweepCache(tmp_path)
+
+    first = sweep.run_cached_sweep(simulate, _sim(), [1, 11], 5, cache, dict(n=16))
+    second = sweep.run_cached_sweep(simulate, _sim(), [1, 11], 5, cache, dict(n=16))
+
+    assert cache.size() == 0
+    assert not np.array_equal(first, second)
+
+    sweep.run_cached_sweep(simulate, _sim(), [1, 11], 5, cache, dict(n=16), seed=3)
+    monkeypatch.setattr(sweep, "SAMPLER_VERSION", sweep.SAMPLER_VERSION + 1)
+    sweep.run_cached_sweep(simulate, _sim(), [1, 11], 5, cache, dict(n=16), seed=3)
+
+    assert len(list(tmp_path.iterdir())) == 2